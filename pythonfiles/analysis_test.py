@@ -0,0 +1,37 @@
+"""GameAnalysis and the ways of running it that are supposed to give the
+exact same rows, against a made up world served by mockserver."""
+import contextlib
+import io
+
+import main
+
+
+def analyze(analysis_class, games):
+    """analyze_game's dict for every game, or the exception it raised."""
+    ret_lst = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for game in games:
+            try:
+                ret_lst.append(analysis_class('key').analyze_game(game, 5))
+            except Exception as e:
+                ret_lst.append(repr(e))
+    return ret_lst
+
+
+def test_async_matches_classic(mock_world, fresh_main):
+    games = mock_world.games(6)
+    fresh_main('classic')
+    classic = analyze(main.GameAnalysis, games)
+    fresh_main('async')
+    assert analyze(main.AsyncGameAnalysis, games) == classic
+    assert sum(isinstance(row, dict) for row in classic) >= 4
+
+
+
+def test_async_shares_one_thread_pool(mock_world, fresh_main):
+    fresh_main()
+    first = main.AsyncGameAnalysis('key')
+    analyze(main.AsyncGameAnalysis, mock_world.games(2))
+    assert main.AsyncGameAnalysis('key').executor is first.executor
+    # and it's still up for the next one
+    assert not first.executor._shutdown
@@ -0,0 +1,350 @@
+"""Benchmarks. Run from pythonfiles/ like everything else:
+
+    python benchmark.py                 # every scenario but batch_1000
+    python benchmark.py --full          # batch_1000 too
+    python benchmark.py overlap_100 --latency 0.05 --analysis async
+
+import_time: how long `import <module>` takes in a brand new interpreter,
+so we notice if somebody puts network or file I/O back at import time.
+
+The collection scenarios analyze games against a mockserver answering
+from a made up world of players and matches (FakeRiot), so no key or
+network is needed and every run sees the same API:
+
+    single       one analyze_game, nothing cached
+    batch_100    100 games from a big pool of players, like games2.csv
+    batch_1000   the same with 1000 games
+    warm_100     batch_100's games again, with the disk caches it left
+    overlap_100  100 games where everyone keeps playing with each other
+
+Each one runs in its own python (so peak RSS is its own) with its own
+caches, and reports games/minute, requests per game, p50/p95 seconds per
+game and per request, and peak RSS. Results go to BENCHMARK_DIR as JSON,
+so two versions can be compared.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMPORT_SNIPPET = ('import time; t = time.perf_counter(); import {module}; '
+                  'print(time.perf_counter() - t)')
+BENCHMARK_DIR = 'res/benchmarks'
+# what a production key gets. The client starts out at a development key's
+# limits and only speeds up once the headers say it can.
+APP_LIMITS = '500:10,30000:600'
+CHAMPIONS = ['Ahri', 'Annie', 'Ashe', 'Brand', 'Caitlyn', 'Darius', 'Ezreal',
+             'Garen', 'Jinx', 'Lux', 'Malphite', 'Nami', 'Sona', 'Teemo',
+             'Thresh', 'Tristana', 'Vayne', 'Yasuo', 'Zed', 'Zyra']
+# name: (players in the world, matches in it, games analyzed, seed)
+SCENARIOS = {'single': (3000, 8000, 1, 0),
+             'batch_100': (3000, 8000, 100, 0),
+             'batch_1000': (3000, 8000, 1000, 0),
+             'warm_100': (3000, 8000, 100, 0),
+             'overlap_100': (60, 400, 100, 1)}
+# run first, in the same cache directory, without being measured
+WARM_UP = {'warm_100': 'batch_100'}
+
+
+def import_time(module: str, repeat: int = 5) -> Dict:
+    """Imports module repeat times, each in a fresh python, and returns the
+    median/min/max seconds. Raises CalledProcessError if the import fails
+    (like it used to offline)."""
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c',
+                              IMPORT_SNIPPET.format(module=module)],
+                             cwd=HERE, capture_output=True, text=True,
+                             check=True)
+        times.append(float(out.stdout.split()[-1]))
+    return {'module': module, 'median': statistics.median(times),
+            'min': min(times), 'max': max(times)}
+
+
+class FakeRiot:
+    """A world of players and matches that answers mockserver's fixture
+    keys, making each match JSON when it's asked for.
+
+    ===== Public Attributes =====
+    players: every summoner name
+    rosters: match index: the indexes of the ten players in it
+    history: player index: their match indexes, newest first
+    sr_share: chance a match is on summoners rift
+    """
+
+    def __init__(self, players: int, matches: int, seed: int = 0,
+                 sr_share: float = 0.7) -> None:
+        rnd = random.Random(seed)
+        self.seed = seed
+        self.sr_share = sr_share
+        self.players = [f'Player{i}' for i in range(players)]
+        self._index = {name: i for i, name in enumerate(self.players)}
+        self.rosters = [rnd.sample(range(players), 10)
+                        for _ in range(matches)]
+        self.history = [[] for _ in range(players)]
+        for m in range(matches - 1, -1, -1):
+            for i in self.rosters[m]:
+                self.history[i].append(m)
+        self.sr = [rnd.random() < sr_share for _ in range(matches)]
+
+    @staticmethod
+    def match_id(m: int) -> str:
+        return f'NA1_{4000000000 + m}'
+
+    def games(self, count: int) -> List[Tuple[str, str]]:
+        """(gameid, player) for the newest count SR matches, the way
+        they'd be in games2.csv."""
+        ret_lst = []
+        for m in range(len(self.rosters) - 1, -1, -1):
+            if len(ret_lst) == count:
+                break
+            if self.sr[m]:
+                ret_lst.append((self.match_id(m),
+                                self.players[self.rosters[m][0]]))
+        return ret_lst
+
+    def match(self, m: int) -> Dict:
+        rnd = random.Random(self.seed * 1000003 + m)
+        sr = self.sr[m]
+        parts = []
+        for slot, i in enumerate(self.rosters[m]):
+            parts.append({
+                'summonerName': self.players[i], 'puuid': f'puuid-{i}',
+                'summonerId': f'sid-{i}', 'teamId': 100 if slot < 5 else 200,
+                'championName': rnd.choice(CHAMPIONS),
+                'kills': rnd.randint(0, 15), 'deaths': rnd.randint(0, 12),
+                'assists': rnd.randint(0, 20), 'win': (slot < 5) == (m % 2 == 0),
+                'timePlayed': 1800, 'totalTimeSpentDead': rnd.randint(0, 400),
+                # riot sends over a hundred more fields, this keeps the
+                # JSON about as big
+                'filler': {f'stat{k}': rnd.randint(0, 10 ** 6)
+                           for k in range(100)}})
+        return {'metadata': {'matchId': self.match_id(m), 'participants':
+                             [f'puuid-{i}' for i in self.rosters[m]]},
+                'info': {'gameMode': 'CLASSIC' if sr else 'ARAM',
+                         'queueId': 420 if sr else 450,
+                         'gameVersion': '11.11.377.1',
+                         'gameCreation': 1600000000000 + m * 3600000,
+                         'participants': parts}}
+
+    def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        """(status, body) for a mockserver fixture key, None for 404."""
+        path, _, query = key.partition('?')
+        params = dict(parse_qsl(query))
+        last = unquote(path.rsplit('/', 2)[-1])
+        if path.startswith('ddragon'):
+            return 200, json.dumps({'data': {name: {
+                'id': name, 'key': str(i + 1),
+                'info': {'attack': i % 10, 'defense': i * 3 % 10,
+                         'magic': i * 7 % 10, 'difficulty': 5}}
+                for i, name in enumerate(CHAMPIONS)}}).encode()
+        if '/summoners/by-name/' in path:
+            if last not in self._index:
+                return None
+            i = self._index[last]
+            body = {'id': f'sid-{i}', 'puuid': f'puuid-{i}', 'name': last}
+        elif '/entries/by-summoner/' in path:
+            rnd = random.Random(last)
+            body = [{'queueType': 'RANKED_SOLO_5x5', 'tier': 'SILVER',
+                     'wins': rnd.randint(0, 60), 'losses': rnd.randint(1, 60),
+                     'veteran': rnd.random() < 0.3,
+                     'hotStreak': rnd.random() < 0.3}]
+        elif '/champion-masteries/' in path:
+            rnd = random.Random(last)
+            body = [{'championId': i + 1,
+                     'championPoints': rnd.randint(0, 10 ** 5)}
+                    for i in range(len(CHAMPIONS))]
+        elif path.endswith('/ids'):
+            i = int(path.rsplit('/', 2)[-2][len('puuid-'):])
+            ids = self.history[i]
+            if 'queue' in params:
+                ids = [m for m in ids if (420 if self.sr[m] else 450) ==
+                       int(params['queue'])]
+            if 'startTime' in params:
+                first = (int(params['startTime']) * 1000 - 1600000000000) \
+                    / 3600000
+                ids = [m for m in ids if m >= first]
+            start = int(params.get('start', 0))
+            body = [self.match_id(m) for m in
+                    ids[start:start + int(params.get('count', 20))]]
+        else:
+            m = int(last.split('_')[-1]) - 4000000000
+            if not 0 <= m < len(self.rosters):
+                return None
+            body = self.match(m)
+        return 200, json.dumps(body).encode()
+
+
+def peak_rss() -> Optional[int]:
+    """Most memory this process has used, in bytes. None where the
+    resource module doesn't exist (windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on mac
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def quantiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {'p50': None, 'p95': None}
+    ordered = sorted(values)
+    return {'p50': ordered[int(0.5 * (len(ordered) - 1))],
+            'p95': ordered[int(0.95 * (len(ordered) - 1))]}
+
+
+def analyze(games: List[Tuple[str, str]], host: str, ddragon_url: str,
+            workdir: str, analysis: str = 'classic') -> Dict:
+    """Analyzes games through main (caches in workdir, requests to host)
+    the way run.run does, writing rows to a csv. Runs in the scenario's
+    own python, see run_scenario."""
+    import contextlib
+    import io
+    import main
+    import run
+    from sink import RowSink
+    main.API_HOST = host
+    main.DDRAGON_URL = ddragon_url
+    main.DDRAGON_DIR = os.path.join(workdir, 'ddragon')
+    main.MATCH_CACHE_FILE = os.path.join(workdir, 'matches.sqlite')
+    main.LOOKUP_CACHE_FILE = os.path.join(workdir, 'lookups.sqlite')
+    main.HISTORY_FILE = os.path.join(workdir, 'history.sqlite')
+    main.SNAPSHOT_FILE = os.path.join(workdir, 'snapshots.sqlite')
+    analysis_class = {'classic': main.GameAnalysis,
+                      'async': main.AsyncGameAnalysis,
+                      'vector': main.VectorGameAnalysis}[analysis]
+    sink = RowSink(os.path.join(workdir, 'data.csv'), run.VARIABLES)
+    times = []
+    errors = 0
+    started = time.perf_counter()
+    with sink, contextlib.redirect_stdout(io.StringIO()):
+        for game in games:
+            t = time.perf_counter()
+            try:
+                sink.write(run.dict_to_list(
+                    analysis_class('bench').analyze_game(game, 5)))
+            except Exception:
+                errors += 1
+            times.append(time.perf_counter() - t)
+    wall = time.perf_counter() - started
+    requests = 0
+    latency = None
+    for stats in main.get_metrics().endpoints().values():
+        requests += stats.requests
+        latency = stats.latency if latency is None else _merged(latency,
+                                                                stats.latency)
+    return {'games': len(games), 'errors': errors, 'seconds': wall,
+            'games_per_minute': len(games) / wall * 60 if wall else None,
+            'requests': requests,
+            'requests_per_game': requests / len(games) if games else None,
+            'game_seconds': quantiles(times),
+            'request_ms': {'p50': latency and latency.quantile(0.5),
+                           'p95': latency and latency.quantile(0.95)},
+            'peak_rss': peak_rss()}
+
+
+def _merged(a, b):
+    a.counts = [x + y for x, y in zip(a.counts, b.counts)]
+    a.total += b.total
+    return a
+
+
+def run_scenario(name: str, latency: float = 0.0,
+                 app_limits: str = APP_LIMITS,
+                 analysis: str = 'classic') -> Dict:
+    """Serves the scenario's FakeRiot from this process and analyzes its
+    games in a new python, in a new cache directory."""
+    from mockserver import MockRiotServer
+    players, matches, count, seed = SCENARIOS[name]
+    world = FakeRiot(players, matches, seed)
+    with tempfile.TemporaryDirectory() as workdir, \
+            MockRiotServer(world, latency=latency,
+                           app_limits=app_limits) as server:
+        runs = [WARM_UP[name]] if name in WARM_UP else []
+        for scenario in runs + [name]:
+            games_file = os.path.join(workdir, 'games.json')
+            with open(games_file, 'w') as f:
+                json.dump(world.games(SCENARIOS[scenario][2]), f)
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child',
+                 games_file, server.host, server.ddragon_url, workdir,
+                 analysis], cwd=HERE, capture_output=True, text=True,
+                check=True)
+        result = json.loads(out.stdout.splitlines()[-1])
+        result['served_429'] = server.sent_429
+    result.update({'scenario': name, 'latency': latency,
+                   'app_limits': app_limits, 'analysis': analysis})
+    return result
+
+
+def report(result: Dict) -> str:
+    def num(x, fmt):
+        return '-' if x is None else format(x, fmt)
+    rss = result['peak_rss']
+    return (f"{result['scenario']:<12} {result['games']:>5} games  "
+            f"{num(result['games_per_minute'], '.1f'):>8}/min  "
+            f"{num(result['requests_per_game'], '.1f'):>6} req/game  "
+            f"game p50 {num(result['game_seconds']['p50'], '.3f')}s "
+            f"p95 {num(result['game_seconds']['p95'], '.3f')}s  "
+            f"req p50 {num(result['request_ms']['p50'], '')}ms "
+            f"p95 {num(result['request_ms']['p95'], '')}ms  "
+            f"rss {'-' if rss is None else f'{rss / 1024 ** 2:.0f}MB'}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        games_path, host, ddragon_url, workdir, analysis = sys.argv[2:7]
+        with open(games_path) as f:
+            games = [tuple(game) for game in json.load(f)]
+        print(json.dumps(analyze(games, host, ddragon_url, workdir,
+                                 analysis)))
+        sys.exit()
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='*',
+                        help=f'any of {", ".join(SCENARIOS)}')
+    parser.add_argument('--full', action='store_true',
+                        help='include batch_1000')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the fake API takes per response')
+    parser.add_argument('--app-limits', default=APP_LIMITS,
+                        help="rate limits the fake API sends and enforces "
+                             f"(default {APP_LIMITS}, a production key)")
+    parser.add_argument('--analysis', default='classic',
+                        choices=['classic', 'async', 'vector'])
+    parser.add_argument('--out', default=None,
+                        help='results file (default a new one in '
+                             f'{BENCHMARK_DIR})')
+    cmd = parser.parse_args()
+    names = cmd.scenarios or [name for name in SCENARIOS
+                              if cmd.full or name != 'batch_1000']
+    results = {'started': time.time(), 'imports': [], 'scenarios': []}
+    for name in ['main', 'run']:
+        result = import_time(name)
+        results['imports'].append(result)
+        print(f"import {name}: median {result['median'] * 1000:.1f}ms "
+              f"(min {result['min'] * 1000:.1f}ms, "
+              f"max {result['max'] * 1000:.1f}ms)")
+    for name in names:
+        result = run_scenario(name, cmd.latency, cmd.app_limits,
+                              cmd.analysis)
+        results['scenarios'].append(result)
+        print(report(result))
+    out = cmd.out or os.path.join(
+        BENCHMARK_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'saved {out}')
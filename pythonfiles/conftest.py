@@ -0,0 +1,58 @@
+import pytest
+
+import main
+import run
+from benchmark import APP_LIMITS, FakeRiot
+from mockserver import MockRiotServer
+from ttlcache import TTLCache
+
+
+@pytest.fixture
+def fresh_main(monkeypatch, tmp_path):
+    """A function that points main and run's files at a new directory in
+    tmp_path and forgets everything they had (clients, caches, players),
+    so the next game is analyzed from scratch. Point main.API_HOST and
+    main.DDRAGON_URL at a MockRiotServer yourself."""
+    def fresh(name: str = 'main') -> None:
+        path = tmp_path / name
+        path.mkdir()
+        files = {'MATCH_CACHE_FILE': 'matches.sqlite',
+                 'LOOKUP_CACHE_FILE': 'lookups.sqlite',
+                 'HISTORY_FILE': 'history.sqlite',
+                 'SNAPSHOT_FILE': 'snapshots.sqlite',
+                 'METRICS_FILE': 'metrics.jsonl', 'DDRAGON_DIR': 'ddragon'}
+        for attr, file in files.items():
+            monkeypatch.setattr(main, attr, str(path / file))
+        for attr in ('match_cache', 'lookup_caches', 'history', 'metrics',
+                     'snapshot_store', 'static_data'):
+            monkeypatch.setattr(main, attr, None)
+        monkeypatch.setattr(main, 'clients', {})
+        monkeypatch.setattr(main, 'player_objects', TTLCache(
+            main.PLAYER_OBJECTS_MAX, main.LOOKUP_TTLS['league']))
+        monkeypatch.setattr(main, 'bad_players', set())
+        monkeypatch.setattr(run, 'DATA_CSV', str(path / 'data.csv'))
+        monkeypatch.setattr(run, 'DATA_PARQUET', str(path / 'data_parquet'))
+        monkeypatch.setattr(run, 'SEEN_FILE', str(path / 'seen.sqlite'))
+        monkeypatch.setattr(run, 'seen_games', None)
+        monkeypatch.setattr(run, 'data_sink', None)
+        monkeypatch.setattr(run, 'config', {'api_key': 'key'})
+    return fresh
+
+
+@pytest.fixture
+def offline_main(fresh_main):
+    """main and run with every file they write in tmp_path and nothing
+    left over from other tests, see fresh_main."""
+    fresh_main()
+    return main
+
+
+@pytest.fixture
+def mock_world(monkeypatch):
+    """A small FakeRiot (see benchmark) served by a MockRiotServer that
+    main talks to."""
+    world = FakeRiot(60, 400, seed=1)
+    with MockRiotServer(world, app_limits=APP_LIMITS) as server:
+        monkeypatch.setattr(main, 'API_HOST', server.host)
+        monkeypatch.setattr(main, 'DDRAGON_URL', server.ddragon_url)
+        yield world
@@ -0,0 +1,343 @@
+"""Finds new games to analyze by snowballing out from a few players.
+
+Every game we like (right queue, right patch) goes to found, and every
+player in it goes on the frontier. Every player we take off the frontier
+that's in the rank band gets their recent games in those queues put on the
+frontier too. The frontier lives in a SQLite file, so a crawl can be
+stopped and started again, and nobody (player or game) is ever queued
+twice.
+
+    python crawler.py --seed Cibreca --tiers SILVER GOLD --patches 11.11
+    python crawler.py --games 500
+
+New games go to randomclasses.write_games (so GAME_CSV, no duplicates),
+ready for jobs.run_csv.
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, \
+    Tuple, Union
+
+import main
+from riotclient import RiotClient, region_for
+
+FRONTIER_FILE = 'res/frontier.sqlite'
+# (gameid, player)
+Found = Callable[[List[Tuple[str, str]]], None]
+
+
+class CrawlConfig(NamedTuple):
+    """What games the crawl is after.
+
+    ===== Public Attributes =====
+    tiers: solo/duo tiers a player has to be in for us to look at their
+        games ('UNRANKED' for players without one)
+    queues: queueIds of the games we want, the match ids are asked for
+        one queue at a time
+    patches: gameVersion prefixes ('11.11') of the games we want, None for
+        any patch
+    since: only games started after this (epoch seconds), None for any
+    ids_per_player: how many of a player's latest games (per queue) to look
+        at
+    recrawl_after: seconds before a player we already crawled can be
+        crawled again, for their new games. None for never.
+    platform: the platform (na1, euw1...) the players are on
+    """
+    tiers: Tuple[str, ...] = ('SILVER', 'GOLD')
+    queues: Tuple[int, ...] = (420,)
+    patches: Optional[Tuple[str, ...]] = None
+    since: Optional[int] = None
+    ids_per_player: int = 20
+    recrawl_after: Optional[float] = 7 * 24 * 60 * 60
+    platform: str = 'na1'
+
+
+class Frontier:
+    """The players and games a crawl still has to look at, and every one
+    it ever has, in a SQLite file.
+
+    Only max_players players and max_games games can be queued at once.
+    Anything discovered past that is dropped (it'll probably show up again
+    once there's room), so the queue can't run away from us.
+
+    ===== Public Attributes =====
+    path: the SQLite file
+    max_players: most players queued at once
+    max_games: most games queued at once
+    dropped: players and games not queued this session because it was full
+    """
+
+    def __init__(self, path: str = FRONTIER_FILE, max_players: int = 5000,
+                 max_games: int = 5000) -> None:
+        self.path = path
+        self.max_players = max_players
+        self.max_games = max_games
+        self.dropped = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # state is 'queued', 'done' or 'skipped', seq is the order they
+        # get taken off the queue in
+        self._db.execute('CREATE TABLE IF NOT EXISTS players ('
+                         'puuid TEXT PRIMARY KEY, name TEXT, summoner_id TEXT,'
+                         ' state TEXT, seq INTEGER, crawled REAL)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS games ('
+                         'gameid TEXT PRIMARY KEY, player TEXT, state TEXT, '
+                         'seq INTEGER)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS players_queue '
+                         'ON players (state, seq)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS games_queue '
+                         'ON games (state, seq)')
+        self._db.commit()
+        self._seq = self._db.execute(
+            'SELECT MAX(m) FROM (SELECT MAX(seq) AS m FROM players UNION ALL '
+            'SELECT MAX(seq) FROM games)').fetchone()[0] or 0
+
+    def add_players(self, players: Iterable[Tuple[str, str, Optional[str]]],
+                    recrawl_after: Optional[float] = None) -> int:
+        """Queues (puuid, name, summoner id) tuples we've never seen, and
+        ones crawled more than recrawl_after seconds ago. Returns how many
+        got queued."""
+        now = time.time()
+        added = 0
+        with self._lock:
+            queued = self._count('players')
+            for puuid, name, summoner_id in players:
+                row = self._db.execute(
+                    'SELECT state, crawled FROM players WHERE puuid = ?',
+                    (puuid,)).fetchone()
+                if row is not None and (row[0] == 'queued' or
+                                        recrawl_after is None or
+                                        row[1] is None or
+                                        now - row[1] < recrawl_after):
+                    continue
+                if queued >= self.max_players:
+                    self.dropped += 1
+                    continue
+                self._seq += 1
+                self._db.execute(
+                    'INSERT OR REPLACE INTO players VALUES '
+                    '(?, ?, ?, ?, ?, ?)',
+                    (puuid, name, summoner_id, 'queued', self._seq,
+                     None if row is None else row[1]))
+                queued += 1
+                added += 1
+            self._db.commit()
+        return added
+
+    def add_games(self, gameids: Iterable[str],
+                  player: Optional[str] = None) -> int:
+        """Queues the games we've never seen, player being whose point of
+        view they get analyzed from (None for anyone). Returns how many got
+        queued."""
+        added = 0
+        with self._lock:
+            queued = self._count('games')
+            for gameid in gameids:
+                if self._db.execute('SELECT 1 FROM games WHERE gameid = ?',
+                                    (gameid,)).fetchone() is not None:
+                    continue
+                if queued >= self.max_games:
+                    self.dropped += 1
+                    continue
+                self._seq += 1
+                self._db.execute('INSERT INTO games VALUES (?, ?, ?, ?)',
+                                 (gameid, player, 'queued', self._seq))
+                queued += 1
+                added += 1
+            self._db.commit()
+        return added
+
+    def next_player(self) -> Optional[Tuple[str, str, Optional[str]]]:
+        """The (puuid, name, summoner id) queued first, None if there's
+        nobody."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT puuid, name, summoner_id FROM players "
+                "WHERE state = 'queued' ORDER BY seq LIMIT 1").fetchone()
+
+    def next_games(self, limit: int = 100) -> List[Tuple[str, Optional[str]]]:
+        """Up to limit queued (gameid, player)s, first queued first."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT gameid, player FROM games WHERE state = 'queued' "
+                "ORDER BY seq LIMIT ?", (limit,)).fetchall()
+
+    def mark_player(self, puuid: str, state: str) -> None:
+        with self._lock:
+            self._db.execute('UPDATE players SET state = ?, crawled = ? '
+                             'WHERE puuid = ?', (state, time.time(), puuid))
+            self._db.commit()
+
+    def mark_game(self, gameid: str, state: str) -> None:
+        with self._lock:
+            self._db.execute('UPDATE games SET state = ? WHERE gameid = ?',
+                             (state, gameid))
+            self._db.commit()
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """{'players': {state: count}, 'games': {state: count}}"""
+        with self._lock:
+            return {table: dict(self._db.execute(
+                f'SELECT state, COUNT(*) FROM {table} GROUP BY state'
+            ).fetchall()) for table in ('players', 'games')}
+
+    def _count(self, table: str) -> int:
+        return self._db.execute(f"SELECT COUNT(*) FROM {table} "
+                                f"WHERE state = 'queued'").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def solo_tier(entries: Optional[List]) -> Optional[str]:
+    """The solo/duo tier in league entries, 'UNRANKED' if there isn't one,
+    None if we didn't get them."""
+    if entries is None:
+        return None
+    for entry in entries:
+        if entry['queueType'] == 'RANKED_SOLO_5x5':
+            return entry['tier']
+    return 'UNRANKED'
+
+
+def wanted(game: Dict, config: CrawlConfig) -> bool:
+    """Whether game is in config's queues, patches and time window."""
+    info = game['info']
+    if info.get('queueId') not in config.queues:
+        return False
+    if config.patches is not None and not any(
+            (info.get('gameVersion', '') + '.').startswith(patch + '.')
+            for patch in config.patches):
+        return False
+    return config.since is None or \
+        info.get('gameCreation', 0) >= config.since * 1000
+
+
+def crawl_player(client: RiotClient, frontier: Frontier,
+                 config: CrawlConfig,
+                 player: Tuple[str, str, Optional[str]]) -> str:
+    """Queues player's latest games in config's queues if they're in the
+    rank band. Returns the state they end up in."""
+    puuid, name, summoner_id = player
+    if summoner_id is None:
+        summoner = client.summoner_by_name(name, config.platform)
+        summoner_id = None if summoner is None else summoner['id']
+    tier = solo_tier(None if summoner_id is None
+                     else client.league_entries(summoner_id, config.platform))
+    if tier not in config.tiers:
+        return 'skipped'
+    filters = {} if config.since is None else {'startTime': config.since}
+    for queue in config.queues:
+        ids = client.recent_match_ids(puuid, 0, config.ids_per_player,
+                                      region_for(config.platform),
+                                      queue=queue, **filters)
+        frontier.add_games(ids or [], name)
+    return 'done'
+
+
+def crawl_game(client: RiotClient, frontier: Frontier, config: CrawlConfig,
+               gameid: str, player: Optional[str]) \
+        -> Optional[Tuple[str, str]]:
+    """Queues everyone in the game, and returns (gameid, player) if it's a
+    game we want, None otherwise."""
+    game = client.match(gameid)
+    if game is None or not wanted(game, config):
+        return None
+    participants = game['info']['participants']
+    frontier.add_players(((man['puuid'], man['summonerName'],
+                           man.get('summonerId')) for man in participants),
+                         config.recrawl_after)
+    if player is None:
+        player = participants[0]['summonerName']
+    return gameid, player
+
+
+def crawl(frontier: Frontier, config: CrawlConfig = CrawlConfig(),
+          found: Optional[Found] = None,
+          api_key: Optional[Union[str, List[str]]] = None,
+          max_games: Optional[int] = None) -> int:
+    """Crawls until the frontier is empty or max_games new games were
+    found. Games are looked at before players, so every player we take
+    off the frontier was picked from all the lobbies found so far. found
+    gets each game we want as soon as it's found (randomclasses.write_games
+    by default). api_key is every key in the config if it's None.
+    Returns how many games were found."""
+    if found is None:
+        import randomclasses
+        found = randomclasses.write_games
+    if api_key is None:
+        import run
+        api_key = run.get_api_keys()
+    client = main.get_client(api_key)
+    total = 0
+    while max_games is None or total < max_games:
+        games = frontier.next_games(1)
+        if games:
+            gameid, player = games[0]
+            game = crawl_game(client, frontier, config, gameid, player)
+            frontier.mark_game(gameid, 'skipped' if game is None else 'done')
+            if game is not None:
+                found([game])
+                total += 1
+            continue
+        player = frontier.next_player()
+        if player is None:
+            break
+        state = crawl_player(client, frontier, config, player)
+        frontier.mark_player(player[0], state)
+        print(f'[crawler] {player[1]} {state}, {total} games found')
+    print(f'[crawler] found {total} games, frontier: {frontier.counts()}, '
+          f'dropped {frontier.dropped}')
+    return total
+
+
+def seed_names(frontier: Frontier, names: Iterable[str],
+               api_key: Optional[Union[str, List[str]]] = None,
+               platform: Optional[str] = None) -> int:
+    """Queues players by summoner name (on platform, the client's if it's
+    None). Returns how many got queued."""
+    if api_key is None:
+        import run
+        api_key = run.get_api_keys()
+    client = main.get_client(api_key)
+    players = []
+    for name in names:
+        summoner = client.summoner_by_name(name.replace(' ', ''), platform)
+        if summoner is None:
+            print(f'[crawler] no summoner {name}')
+            continue
+        players.append((summoner['puuid'], name, summoner['id']))
+    return frontier.add_players(players)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seed', nargs='*', default=[],
+                        help='summoner names to start from')
+    parser.add_argument('--tiers', nargs='+',
+                        default=list(CrawlConfig._field_defaults['tiers']))
+    parser.add_argument('--queues', nargs='+', type=int,
+                        default=list(CrawlConfig._field_defaults['queues']))
+    parser.add_argument('--patches', nargs='+', default=None)
+    parser.add_argument('--since', type=int, default=None,
+                        help='epoch seconds')
+    parser.add_argument('--games', type=int, default=None,
+                        help='stop after finding this many')
+    parser.add_argument('--platform', default='na1',
+                        help='na1, euw1, kr...')
+    parser.add_argument('--max-players', type=int, default=5000)
+    parser.add_argument('--max-queued-games', type=int, default=5000)
+    cmd = parser.parse_args()
+    frontier = Frontier(FRONTIER_FILE, cmd.max_players, cmd.max_queued_games)
+    seed_names(frontier, cmd.seed, platform=cmd.platform)
+    crawl(frontier, CrawlConfig(tuple(cmd.tiers), tuple(cmd.queues),
+                                None if cmd.patches is None
+                                else tuple(cmd.patches), cmd.since,
+                                platform=cmd.platform),
+          max_games=cmd.games)
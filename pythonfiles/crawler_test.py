@@ -0,0 +1,83 @@
+from crawler import CrawlConfig, Frontier, crawl, wanted
+
+
+def game(gameid, names, queue=420, version='11.11.377.1'):
+    return {'info': {'queueId': queue, 'gameVersion': version,
+                     'gameCreation': 0, 'participants': [
+                         {'puuid': 'p-' + name, 'summonerName': name,
+                          'summonerId': 's-' + name} for name in names]}}
+
+
+class FakeClient:
+    def __init__(self, games, history, tiers):
+        self.games = games
+        self.history = history
+        self.tiers = tiers
+        self.calls = 0
+
+    def league_entries(self, summoner_id, platform=None):
+        self.calls += 1
+        tier = self.tiers.get(summoner_id[2:])
+        return [] if tier is None else [{'queueType': 'RANKED_SOLO_5x5',
+                                         'tier': tier}]
+
+    def recent_match_ids(self, puuid, start=0, count=20, region=None,
+                         **filters):
+        self.calls += 1
+        return [gameid for gameid in self.history.get(puuid[2:], [])
+                if self.games[gameid]['info']['queueId'] == filters['queue']]
+
+    def match(self, gameid):
+        self.calls += 1
+        return self.games.get(gameid)
+
+
+def test_wanted():
+    config = CrawlConfig(queues=(420,), patches=('11.11',))
+    assert wanted(game('1', []), config)
+    assert not wanted(game('1', [], queue=450), config)
+    assert not wanted(game('1', [], version='11.1.2'), config)
+    assert not wanted(game('1', [], version='11.10.2'), config)
+
+
+def test_frontier_dedups_and_caps(tmp_path):
+    path = str(tmp_path / 'frontier.sqlite')
+    frontier = Frontier(path, max_players=2, max_games=10)
+    assert frontier.add_players([('a', 'A', None), ('a', 'A', None),
+                                 ('b', 'B', None), ('c', 'C', None)]) == 2
+    assert frontier.dropped == 1
+    assert frontier.add_games(['1', '2', '1'], 'A') == 2
+    frontier.mark_player('a', 'done')
+    frontier.close()
+    frontier = Frontier(path, max_players=2)
+    assert frontier.next_player() == ('b', 'B', None)
+    # crawled already, room or not
+    assert frontier.add_players([('a', 'A', None)]) == 0
+    assert frontier.add_players([('a', 'A', None)], recrawl_after=0) == 1
+    assert frontier.add_games(['2', '3']) == 1
+    assert frontier.next_games() == [('1', 'A'), ('2', 'A'), ('3', None)]
+
+
+def test_crawl_stays_in_the_band(tmp_path):
+    games = {'1': game('1', ['a', 'b', 'c']), '2': game('2', ['b', 'd']),
+             '3': game('3', ['c', 'e']), '4': game('4', ['d'], queue=450),
+             '5': game('5', ['e', 'a'])}
+    history = {'a': ['1', '5'], 'b': ['1', '2'], 'c': ['1', '3'],
+               'd': ['2', '4'], 'e': ['3', '5']}
+    client = FakeClient(games, history, {'a': 'GOLD', 'b': 'SILVER',
+                                         'c': 'DIAMOND', 'd': 'GOLD'})
+    import main
+    main.clients['crawler test'] = client
+    frontier = Frontier(str(tmp_path / 'frontier.sqlite'))
+    frontier.add_players([('p-a', 'a', 's-a')])
+    found = []
+    try:
+        assert crawl(frontier, found=found.extend,
+                     api_key='crawler test') == 3
+    finally:
+        del main.clients['crawler test']
+    # c is diamond and e is unranked, so 3 is never found, and 4 isn't
+    # solo/duo
+    assert found == [('1', 'a'), ('5', 'a'), ('2', 'b')]
+    assert frontier.counts() == {'players': {'done': 3, 'skipped': 2},
+                                 'games': {'done': 3}}
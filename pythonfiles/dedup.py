@@ -0,0 +1,126 @@
+"""Remembers which game ids we've already seen, so nothing gets analyzed
+(or written to the games csv) twice.
+
+A SeenIndex is a set in memory with a SQLite table behind it, so it
+survives restarts. For histories too big to hold as a set, give it a
+bloom_capacity: then only a BloomFilter lives in memory and SQLite is only
+asked when the filter says 'maybe'.
+"""
+import csv
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+from typing import Iterable, Optional
+
+SEEN_FILE = 'res/seen.sqlite'
+
+
+class BloomFilter:
+    """Says an item is definitely new, or probably seen before.
+    Wrong 'probably' answers happen about error_rate of the time once
+    capacity items are in."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.size = max(8, int(-capacity * math.log(error_rate)
+                               / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos // 8] |= 1 << (pos % 8)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos // 8] & (1 << (pos % 8))
+                   for pos in self._positions(item))
+
+
+class SeenIndex:
+    """Game ids in the table of a SQLite file (or only in memory if path is
+    None).
+
+    ===== Public Attributes =====
+    path: the SQLite file
+    table: which list of ids this is, e.g. 'analyzed' or 'discovered'
+    """
+
+    def __init__(self, path: Optional[str] = SEEN_FILE, table: str = 'seen',
+                 bloom_capacity: Optional[int] = None) -> None:
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._db = None
+        self._ids = set()
+        self._bloom = None
+        if path is not None:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=30,
+                                       check_same_thread=False)
+            self._db.execute(f'CREATE TABLE IF NOT EXISTS {table} '
+                             f'(id TEXT PRIMARY KEY)')
+            self._db.commit()
+            rows = self._db.execute(f'SELECT id FROM {table}')
+            if bloom_capacity is not None:
+                self._bloom = BloomFilter(bloom_capacity)
+                for row in rows:
+                    self._bloom.add(row[0])
+            else:
+                self._ids = {row[0] for row in rows}
+
+    def __contains__(self, game_id: str) -> bool:
+        with self._lock:
+            if self._bloom is None:
+                return game_id in self._ids
+            if game_id not in self._bloom:
+                return False
+            return self._db.execute(f'SELECT 1 FROM {self.table} WHERE id = ?',
+                                    (game_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._bloom is None:
+                return len(self._ids)
+            return self._db.execute(
+                f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+    def add(self, game_id: str) -> bool:
+        """Remembers game_id. Returns True if it wasn't there before."""
+        return self.add_many([game_id]) == 1
+
+    def add_many(self, game_ids: Iterable[str]) -> int:
+        """Remembers all of game_ids, returns how many were new."""
+        # dict so repeats inside game_ids only count once
+        game_ids = list(dict.fromkeys(game_id for game_id in game_ids
+                                      if game_id not in self))
+        with self._lock:
+            for game_id in game_ids:
+                if self._bloom is None:
+                    self._ids.add(game_id)
+                else:
+                    self._bloom.add(game_id)
+            if self._db is not None and game_ids:
+                self._db.executemany(f'INSERT OR IGNORE INTO {self.table} '
+                                     f'VALUES (?)', ((g,) for g in game_ids))
+                self._db.commit()
+        return len(game_ids)
+
+    def seed_from_csv(self, csv_path: str, column: str = 'gameid') -> int:
+        """Adds the column of a csv we wrote before there was an index.
+        Returns how many ids were new. Missing files are fine."""
+        if not os.path.exists(csv_path):
+            return 0
+        # only the ids matter, and those are ascii whatever the file is in
+        with open(csv_path, 'r', newline='', encoding='UTF-8',
+                  errors='replace') as file:
+            return self.add_many(row[column] for row in csv.DictReader(file)
+                                 if row.get(column))
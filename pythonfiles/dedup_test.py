@@ -0,0 +1,36 @@
+from dedup import BloomFilter, SeenIndex
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(1000)
+    for i in range(1000):
+        bloom.add(f'NA1_{i}')
+    assert all(f'NA1_{i}' in bloom for i in range(1000))
+    false_positives = sum(f'EUW1_{i}' in bloom for i in range(1000))
+    assert false_positives < 20
+
+
+def test_seen_index_persists(tmp_path):
+    path = str(tmp_path / 'seen.sqlite')
+    index = SeenIndex(path, 'analyzed')
+    assert index.add('NA1_1')
+    assert not index.add('NA1_1')
+    assert index.add_many(['NA1_2', 'NA1_2', 'NA1_1']) == 1
+    assert 'NA1_2' in SeenIndex(path, 'analyzed')
+    assert 'NA1_2' not in SeenIndex(path, 'discovered')
+
+
+def test_bloom_backed_index(tmp_path):
+    path = str(tmp_path / 'seen.sqlite')
+    SeenIndex(path).add_many(['NA1_1', 'NA1_2'])
+    index = SeenIndex(path, bloom_capacity=100)
+    assert 'NA1_1' in index and 'NA1_3' not in index
+    assert len(index) == 2
+
+
+def test_seed_from_csv(tmp_path):
+    games = tmp_path / 'games.csv'
+    games.write_text('gameid,player\nNA1_1,a\nNA1_1,b\nNA1_2,a\n')
+    index = SeenIndex(None)
+    assert index.seed_from_csv(str(games)) == 2
+    assert index.seed_from_csv(str(tmp_path / 'missing.csv')) == 0
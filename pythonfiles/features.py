@@ -0,0 +1,283 @@
+"""Works out the GameAnalysis columns with numpy, for one game or a batch
+of thousands at once.
+
+GameAnalysis.get_stats loops over players and matches in python, which is
+fine while we're waiting on the API anyway, but not when re-deriving the
+features for every game we've got cached. Here every game in a batch is
+packed into (games x players x matches) arrays and each column is a
+handful of array reductions.
+
+    inputs = [from_game(a, (gameid, name)) for ...]
+    rows = compute_rows(inputs, get_static_data().name_to_info)
+    # same dicts analyze_game returns, None where it would have raised
+
+Players are in Game order: slots 0-4 are Game.ally, 5-9 are Game.enemy.
+"""
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import warnings
+
+import numpy as np
+
+from matchstats import MatchStats
+
+TEAM = 5
+ALLY = slice(0, TEAM)
+ENEMY = slice(TEAM, 2 * TEAM)
+
+
+class Thresholds(NamedTuple):
+    """The cutoffs the features are defined with."""
+    # median kda above this is a smurf
+    smurf_kda: float = 4.5
+    # recent SR winrate below this is a binter
+    binter_wr: float = 0.35
+    # more than this share of recent SR games on one champ is an otp
+    otp_share: float = 0.6
+    # more than this share of recent games not on SR is playing 4fun
+    fun_share: float = 0.6
+
+
+class PlayerInput(NamedTuple):
+    """What the features need to know about one player."""
+    sr_stats: Optional[List[MatchStats]]
+    all_stats: Optional[List[MatchStats]]
+    ranked_wr: Optional[float]
+    veteran: Optional[bool]
+    hotstreak: Optional[bool]
+
+
+class GameInput(NamedTuple):
+    """What the features need to know about one game."""
+    gameid: str
+    player: str
+    # the main player's champion this game
+    champion: str
+    ally_win: bool
+    # index of the main player in ally
+    main_index: int
+    ally: List[PlayerInput]
+    enemy: List[PlayerInput]
+    # championName each player in ally/enemy is on this game
+    ally_champs: List[str]
+    enemy_champs: List[str]
+    mastery_points: int
+
+
+def player_input(player) -> PlayerInput:
+    """The PlayerInput of a main.Player."""
+    return PlayerInput(player.sr_stats, player.all_stats,
+                       player.get_ranked_wr(), player.is_veteran(),
+                       player.is_hotstreak())
+
+
+def from_game(a, game: Tuple[str, str]) -> GameInput:
+    """The GameInput of a loaded main.Game. game is the (gameid, summoner
+    name) tuple it was loaded for. Asks for the main player's mastery if
+    it isn't loaded yet."""
+    champion = a.get_main_namedict()[1]
+    return GameInput(game[0], game[1], champion, a.get_win('ally'),
+                     a.ally.index(a.man),
+                     [player_input(x) for x in a.ally],
+                     [player_input(x) for x in a.enemy],
+                     [x[1] for x in a.namedict['ally']],
+                     [x[1] for x in a.namedict['enemy']],
+                     a.man.get_mastery(champion))
+
+
+def pack(games: List[GameInput],
+         champ_info: Dict[str, Dict]) -> Dict[str, np.ndarray]:
+    """Packs games into arrays. Per-match ones are (games, 10, matches),
+    padded with nan (or False/-1); per-player ones are (games, 10).
+    champ_info is championName: {'attack', 'defense', 'magic', ...}
+    (StaticData.name_to_info)."""
+    g = len(games)
+    players = [game.ally + game.enemy for game in games]
+    m_sr = max([len(p.sr_stats or []) for ps in players for p in ps] + [1])
+    champ_codes = {}
+
+    def code(name: str) -> int:
+        return champ_codes.setdefault(name, len(champ_codes))
+
+    shape = (g, 2 * TEAM)
+    arrays = {
+        'kda': np.full(shape + (m_sr,), np.nan),
+        'win': np.full(shape + (m_sr,), np.nan),
+        'dead': np.full(shape + (m_sr,), np.nan),
+        'creation': np.full(shape + (m_sr,), np.nan),
+        'champ': np.full(shape + (m_sr,), -1),
+        'sr_count': np.zeros(shape, dtype=int),
+        'sr_none': np.zeros(shape, dtype=bool),
+        'all_count': np.zeros(shape, dtype=int),
+        'all_fun': np.zeros(shape, dtype=int),
+        'all_none': np.zeros(shape, dtype=bool),
+        'wr': np.full(shape, np.nan),
+        'veteran': np.zeros(shape, dtype=bool),
+        'hotstreak': np.zeros(shape, dtype=bool),
+        'attack': np.full(shape, np.nan),
+        'defense': np.full(shape, np.nan),
+        'magic': np.full(shape, np.nan),
+        'main': np.array([game.main_index for game in games], dtype=int),
+        'main_champ': np.array([code(game.champion) for game in games]),
+        'mastery': np.array([game.mastery_points for game in games],
+                            dtype=float),
+        'ally_win': np.array([bool(game.ally_win) for game in games]),
+    }
+    for i, game in enumerate(games):
+        champs = game.ally_champs + game.enemy_champs
+        for j, p in enumerate(players[i]):
+            if p.sr_stats is None:
+                arrays['sr_none'][i, j] = True
+            else:
+                arrays['sr_count'][i, j] = len(p.sr_stats)
+                for k, s in enumerate(p.sr_stats):
+                    arrays['kda'][i, j, k] = s.kda_ratio()
+                    arrays['win'][i, j, k] = s.win
+                    arrays['dead'][i, j, k] = s.time_spent_dead / s.time_played
+                    arrays['creation'][i, j, k] = s.game_creation / 1000
+                    arrays['champ'][i, j, k] = code(s.champion)
+            if p.all_stats is None:
+                arrays['all_none'][i, j] = True
+            else:
+                arrays['all_count'][i, j] = len(p.all_stats)
+                arrays['all_fun'][i, j] = sum(s.game_mode != 'CLASSIC'
+                                              for s in p.all_stats)
+            if p.ranked_wr is not None:
+                arrays['wr'][i, j] = p.ranked_wr
+            arrays['veteran'][i, j] = bool(p.veteran)
+            arrays['hotstreak'][i, j] = bool(p.hotstreak)
+            if j < len(champs) and champs[j] in champ_info:
+                for what in ['attack', 'defense', 'magic']:
+                    arrays[what][i, j] = champ_info[champs[j]][what]
+    arrays['gameid'] = np.array([game.gameid for game in games], dtype=object)
+    arrays['player'] = np.array([game.player for game in games], dtype=object)
+    arrays['champion'] = np.array([game.champion for game in games],
+                                  dtype=object)
+    return arrays
+
+
+def longest_break(creation: np.ndarray) -> np.ndarray:
+    """Game.count_break for one team, (games, 5, matches) -> (games,).
+    Goes player by player like Game does: a player's first gap between
+    consecutive games that beats the team's best so far becomes the best.
+    Only the 5 players are looped over, games are done all at once."""
+    best = np.zeros(creation.shape[0])
+    gaps = creation[:, :, :-1] - creation[:, :, 1:]
+    if gaps.shape[-1] == 0:
+        return best
+    for j in range(creation.shape[1]):
+        beats = gaps[:, j, :] > best[:, None]
+        first = beats.argmax(axis=1)
+        found = beats.any(axis=1)
+        best = np.where(found, gaps[np.arange(len(best)), j, first], best)
+    return best
+
+
+def team_stats(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                            np.ndarray]:
+    """nan-ignoring median, min, max along the last axis, nan when there's
+    nothing to take them of."""
+    empty = np.isnan(values).all(axis=-1)
+    filled = np.where(empty[..., None], 0, values)
+    med = np.where(empty, np.nan, np.nanmedian(filled, axis=-1))
+    low = np.where(empty, np.nan, np.nanmin(filled, axis=-1))
+    high = np.where(empty, np.nan, np.nanmax(filled, axis=-1))
+    return med, low, high
+
+
+def compute(arrays: Dict[str, np.ndarray],
+            thresholds: Thresholds = Thresholds()) -> Dict[str, np.ndarray]:
+    """Every GameAnalysis column for every packed game, plus 'valid':
+    False where GameAnalysis would have raised instead (a player with no
+    SR games). Missing values are nan."""
+    g = len(arrays['main'])
+    rows = np.arange(g)
+    cols = {'gameid': arrays['gameid'], 'player': arrays['player'],
+            'champion': arrays['champion'], 'ally_win': arrays['ally_win']}
+    cols['valid'] = ~(arrays['sr_none'] | (arrays['sr_count'] == 0)).any(1)
+
+    # main player
+    main = arrays['main']
+    cols['player_wr'] = arrays['wr'][rows, main]
+    # players without games give 0/0s and all-nan medians, they come out
+    # as nan (or invalid) which is what we want
+    with np.errstate(invalid='ignore', divide='ignore'), \
+            warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        count = arrays['sr_count'][rows, main]
+        cols['t_bint'] = np.nansum(arrays['dead'][rows, main], axis=-1) / count
+        on_champ = (arrays['champ'][rows, main]
+                    == arrays['main_champ'][:, None]).sum(axis=-1)
+        cols['is_main_h'] = (count != 0) & (on_champ / np.maximum(count, 1)
+                                            > thresholds.otp_share)
+        cols['mastery_points'] = arrays['mastery']
+
+        # per player
+        fun = (arrays['all_count'] > 0) & (
+            arrays['all_fun'] / np.maximum(arrays['all_count'], 1)
+            > thresholds.fun_share)
+        cols['4fun'] = np.where(arrays['all_none'][rows, main], np.nan,
+                                fun[rows, main])
+        win_share = np.nansum(arrays['win'], axis=-1) / arrays['sr_count']
+        binter = win_share < thresholds.binter_wr
+        median_kda = np.nanmedian(arrays['kda'], axis=-1)
+
+    for side, team in [('a', ALLY), ('e', ENEMY)]:
+        # Game only ever looks at the last player of each team for these two
+        last = team.stop - 1
+        cols['smurf_count_' + side] = (median_kda[:, last]
+                                       > thresholds.smurf_kda).astype(int)
+        cols['max_med_kd_' + side] = np.maximum(median_kda[:, last], 0)
+        cols['hotstreak_count_' + side] = arrays['hotstreak'][:, team].sum(1)
+        cols['veteran_count_' + side] = arrays['veteran'][:, team].sum(1)
+        cols['inters_count_' + side] = binter[:, team].sum(1)
+        cols['break_count_' + side] = longest_break(arrays['creation'][:, team])
+        for what, name in [('attack', 'a_sum_'), ('defense', 'd_sum_'),
+                           ('magic', 'm_sum_')]:
+            values = arrays[what][:, team]
+            cols[name + side] = np.where(np.isnan(values).all(1), np.nan,
+                                         np.nansum(values, axis=1))
+        med, low, high = team_stats(arrays['wr'][:, team])
+        cols['wr_med_' + side] = med
+        cols['wr_min_' + side] = low
+        cols['wr_max_' + side] = high
+        cols['4fun_' + side] = fun[:, team].sum(1)
+    return cols
+
+
+# how each column comes out in a row, same types GameAnalysis gives
+ROW_TYPES = {'gameid': str, 'player': str, 'champion': str, 'ally_win': bool,
+             'is_main_h': bool, '4fun': bool, 'mastery_points': int,
+             'smurf_count_a': int, 'smurf_count_e': int,
+             'hotstreak_count_a': int, 'hotstreak_count_e': int,
+             'veteran_count_a': int, 'veteran_count_e': int,
+             'inters_count_a': int, 'inters_count_e': int,
+             'a_sum_a': int, 'a_sum_e': int, 'd_sum_a': int, 'd_sum_e': int,
+             'm_sum_a': int, 'm_sum_e': int, '4fun_a': int, '4fun_e': int}
+
+
+def to_rows(cols: Dict[str, np.ndarray]) -> List[Optional[Dict]]:
+    """compute's columns as one dict per game, like analyze_game returns.
+    Invalid games are None."""
+    ret_lst = []
+    for i in range(len(cols['valid'])):
+        if not cols['valid'][i]:
+            ret_lst.append(None)
+            continue
+        row = {}
+        for name, values in cols.items():
+            if name == 'valid':
+                continue
+            value = values[i]
+            if isinstance(value, float) and np.isnan(value):
+                row[name] = None
+            else:
+                row[name] = ROW_TYPES.get(name, float)(value)
+        ret_lst.append(row)
+    return ret_lst
+
+
+def compute_rows(games: List[GameInput], champ_info: Dict[str, Dict],
+                 thresholds: Thresholds = Thresholds()) -> List[Optional[Dict]]:
+    """pack, compute and to_rows in one go."""
+    return to_rows(compute(pack(games, champ_info), thresholds))
@@ -0,0 +1,73 @@
+import features
+from features import GameInput, PlayerInput, Thresholds
+from matchstats import MatchStats
+
+CHAMPS = {'Ahri': {'attack': 3, 'defense': 4, 'magic': 8},
+          'Garen': {'attack': 7, 'defense': 7, 'magic': 1}}
+
+
+def stats(kills, deaths, assists, win, creation, champion='Ahri',
+          mode='CLASSIC'):
+    return MatchStats('NA1_1', kills, deaths, assists, win, 1000, 100,
+                      champion, creation * 1000, mode)
+
+
+def player(sr=None, wr=0.5, veteran=False, hotstreak=False, all_stats=None):
+    sr = sr if sr is not None else [stats(1, 1, 1, True, 100)]
+    return PlayerInput(sr, all_stats if all_stats is not None else sr, wr,
+                       veteran, hotstreak)
+
+
+def game(ally=None, enemy=None, champs=('Ahri',) * 5):
+    return GameInput('NA1_9', 'me', 'Ahri', True, 0,
+                     ally or [player() for _ in range(5)],
+                     enemy or [player() for _ in range(5)],
+                     list(champs), ['Garen'] * 5, 1234)
+
+
+def test_plain_game():
+    row = features.compute_rows([game()], CHAMPS)[0]
+    assert row['gameid'] == 'NA1_9' and row['ally_win'] is True
+    assert row['mastery_points'] == 1234
+    assert row['a_sum_a'] == 15 and row['a_sum_e'] == 35
+    assert row['wr_med_a'] == 0.5
+    assert row['smurf_count_a'] == 0 and row['inters_count_a'] == 0
+    assert row['is_main_h'] is True and row['4fun'] is False
+    assert row['t_bint'] == 0.1
+
+
+def test_only_last_player_counts_for_smurfs():
+    smurf = player([stats(10, 1, 10, True, 100)])
+    ally = [smurf] + [player() for _ in range(4)]
+    assert features.compute_rows([game(ally)], CHAMPS)[0]['smurf_count_a'] \
+        == 0
+    ally = [player() for _ in range(4)] + [smurf]
+    row = features.compute_rows([game(ally)], CHAMPS)[0]
+    assert row['smurf_count_a'] == 1 and row['max_med_kd_a'] == 20
+
+
+def test_thresholds():
+    ally = [player([stats(1, 1, 1, False, 100)]) for _ in range(5)]
+    assert features.compute_rows([game(ally)], CHAMPS)[0][
+        'inters_count_a'] == 5
+    assert features.compute_rows([game(ally)], CHAMPS, Thresholds(
+        binter_wr=0))[0]['inters_count_a'] == 0
+
+
+def test_break_takes_first_bigger_gap():
+    # gaps 10 then 50: stops at 10, like Game.count_break
+    first = player([stats(1, 1, 1, True, c) for c in [100, 90, 40]])
+    second = player([stats(1, 1, 1, True, c) for c in [100, 95, 60]])
+    ally = [first, second] + [player() for _ in range(3)]
+    assert features.compute_rows([game(ally)], CHAMPS)[0][
+        'break_count_a'] == 35
+
+
+def test_missing_values_and_invalid_games():
+    ally = [player(wr=None) for _ in range(5)]
+    row = features.compute_rows([game(ally, champs=['Nobody'] * 5)],
+                                CHAMPS)[0]
+    assert row['wr_med_a'] is None and row['wr_max_a'] is None
+    assert row['a_sum_a'] is None and row['player_wr'] is None
+    empty = [player([])] + [player() for _ in range(4)]
+    assert features.compute_rows([game(), game(empty)], CHAMPS)[1] is None
@@ -0,0 +1,149 @@
+"""Every player's match id list, kept between runs, so we only ever ask
+riot for the matches they played since we last looked.
+
+A player that shows up in ten of our lobbies used to cost ten full
+/ids?start=1&count=20 requests. Now the first one fills their history and
+the rest either use it as is (if it's fresh enough) or ask for just the
+games started since, with startTime.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+HISTORY_FILE = 'res/history.sqlite'
+# most match ids a page of match-v5 ids hands out
+PAGE_SIZE = 100
+# (start, count, startTime or None): newest first ids, None if riot said no
+Fetch = Callable[[int, int, Optional[int]], Optional[List[str]]]
+
+
+class MatchHistory:
+    """Match ids per key (a puuid, or a puuid plus whatever filters the ids
+    were asked for with), newest first, in a SQLite file.
+
+    ===== Public Attributes =====
+    path: the SQLite file
+    fresh_for: seconds after a sync where we don't even ask for new games
+    overlap: how far before the last sync the next one asks from. startTime
+        is when a game started, so a game that was still going last time
+        only shows up if we look back at least a game's length.
+    keep: most ids kept per key, the oldest ones get dropped
+    requests: number of id pages fetched
+    hits: number of syncs that didn't need to fetch anything
+    """
+
+    def __init__(self, path: str = HISTORY_FILE, fresh_for: float = 5 * 60,
+                 overlap: float = 60 * 60, keep: int = 200) -> None:
+        self.path = path
+        self.fresh_for = fresh_for
+        self.overlap = overlap
+        self.keep = keep
+        self.requests = 0
+        self.hits = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # newest match = biggest seq
+        self._db.execute('CREATE TABLE IF NOT EXISTS history ('
+                         'key TEXT, match_id TEXT, seq INTEGER, '
+                         'PRIMARY KEY (key, match_id))')
+        self._db.execute('CREATE TABLE IF NOT EXISTS synced ('
+                         'key TEXT PRIMARY KEY, synced REAL)')
+        self._db.commit()
+
+    def ids(self, key: str) -> Optional[List[str]]:
+        """Every id we know for key, newest first. None if it was never
+        synced."""
+        with self._lock:
+            if self._synced(key) is None:
+                return None
+            return self._ids(key)
+
+    def sync(self, key: str, fetch: Fetch,
+             depth: int = 20) -> Optional[List[str]]:
+        """Gets key's ids up to date with fetch and returns them, newest
+        first. The first time it asks for depth of them; after that, the
+        ones started since the last sync (minus overlap), a page at a time
+        until it gets to one it knows. If fetch fails, returns what we had,
+        or None if that's nothing."""
+        now = time.time()
+        with self._lock:
+            synced = self._synced(key)
+            known = self._ids(key) if synced is not None else []
+        if synced is not None and now - synced < self.fresh_for \
+                and len(known) >= depth:
+            self.hits += 1
+            return known
+        if synced is None or len(known) < depth:
+            # nothing to go on (or not enough), just ask for depth
+            new = fetch(0, depth, None)
+            self.requests += 1
+        else:
+            new = self._fetch_since(fetch, set(known),
+                                    int(synced - self.overlap))
+        if new is None:
+            return known if synced is not None else None
+        with self._lock:
+            self._add(key, new, now)
+            return self._ids(key)
+
+    def _fetch_since(self, fetch: Fetch, known: set,
+                     start_time: int) -> Optional[List[str]]:
+        """Every id started after start_time that isn't in known, newest
+        first."""
+        ret_lst = []
+        start = 0
+        while True:
+            page = fetch(start, PAGE_SIZE, start_time)
+            self.requests += 1
+            if page is None:
+                # a gap in the middle would never get filled in, so all or
+                # nothing
+                return None
+            for match_id in page:
+                if match_id in known:
+                    return ret_lst
+                ret_lst.append(match_id)
+            if len(page) < PAGE_SIZE:
+                return ret_lst
+            start += PAGE_SIZE
+
+    # HELPERS, self._lock is held for all of these
+    def _synced(self, key: str) -> Optional[float]:
+        row = self._db.execute('SELECT synced FROM synced WHERE key = ?',
+                               (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _ids(self, key: str) -> List[str]:
+        return [row[0] for row in self._db.execute(
+            'SELECT match_id FROM history WHERE key = ? ORDER BY seq DESC',
+            (key,))]
+
+    def _add(self, key: str, new: List[str], now: float) -> None:
+        """Merges new (newest first) into key's ids. The ones before the
+        first id we already know are newer than everything we have, the
+        ones after it are older. Keeps the newest keep of them."""
+        known = self._ids(key)
+        known_set = set(known)
+        first = next((i for i, match_id in enumerate(new)
+                      if match_id in known_set), len(new))
+        older = [match_id for match_id in new[first:]
+                 if match_id not in known_set]
+        ids = (new[:first] + known + older)[:self.keep]
+        self._db.execute('DELETE FROM history WHERE key = ?', (key,))
+        self._db.executemany('INSERT INTO history VALUES (?, ?, ?)',
+                             [(key, match_id, len(ids) - i)
+                              for i, match_id in enumerate(ids)])
+        self._db.execute('INSERT OR REPLACE INTO synced VALUES (?, ?)',
+                         (key, now))
+        self._db.commit()
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'requests': self.requests}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
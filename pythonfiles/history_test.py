@@ -0,0 +1,63 @@
+from history import MatchHistory
+
+
+class FakeRiot:
+    """A player's match ids newest first, with when each one started."""
+
+    def __init__(self, count):
+        self.games = [(f'NA1_{i}', i * 100) for i in range(count, 0, -1)]
+        self.calls = []
+
+    def play(self, count):
+        top = int(self.games[0][0][4:])
+        self.games = [(f'NA1_{i}', i * 100)
+                      for i in range(top + count, top, -1)] + self.games
+
+    def fetch(self, start, count, start_time):
+        self.calls.append((start, count, start_time))
+        games = [g for g in self.games
+                 if start_time is None or g[1] >= start_time]
+        return [g[0] for g in games[start:start + count]]
+
+
+def test_first_sync_then_fresh(tmp_path):
+    riot = FakeRiot(50)
+    history = MatchHistory(str(tmp_path / 'h.sqlite'))
+    ids = history.sync('puuid', riot.fetch, 20)
+    assert ids == [f'NA1_{i}' for i in range(50, 30, -1)]
+    assert history.sync('puuid', riot.fetch, 20) == ids
+    assert len(riot.calls) == 1
+    assert history.stats() == {'hits': 1, 'requests': 1}
+
+
+def test_only_asks_for_new_games(tmp_path):
+    riot = FakeRiot(30)
+    path = str(tmp_path / 'h.sqlite')
+    MatchHistory(path).sync('puuid', riot.fetch, 20)
+    riot.play(3)
+    # startTime from the game times, the sync time doesn't matter here
+    history = MatchHistory(path, fresh_for=0, overlap=10 ** 12)
+    ids = history.sync('puuid', riot.fetch, 20)
+    assert ids[:4] == ['NA1_33', 'NA1_32', 'NA1_31', 'NA1_30']
+    assert len(ids) == 23
+    assert riot.calls[-1][2] is not None
+
+
+def test_pages_through_lots_of_new_games(tmp_path):
+    riot = FakeRiot(20)
+    history = MatchHistory(str(tmp_path / 'h.sqlite'), fresh_for=0,
+                           overlap=10 ** 12, keep=1000)
+    history.sync('puuid', riot.fetch, 20)
+    riot.play(250)
+    ids = history.sync('puuid', riot.fetch, 20)
+    assert len(ids) == 270 and ids[0] == 'NA1_270' and ids[-1] == 'NA1_1'
+    assert [call[0] for call in riot.calls[1:]] == [0, 100, 200]
+
+
+def test_failed_fetch_keeps_what_we_had(tmp_path):
+    riot = FakeRiot(20)
+    history = MatchHistory(str(tmp_path / 'h.sqlite'), fresh_for=0, keep=5)
+    assert history.sync('puuid', lambda *args: None) is None
+    ids = history.sync('puuid', riot.fetch, 5)
+    assert len(ids) == 5
+    assert history.sync('puuid', lambda *args: None, 5) == ids
@@ -0,0 +1,345 @@
+"""A collection run you can stop (or crash) and pick back up.
+
+Every (gameid, player) we're asked to analyze goes into a manifest with a
+state:
+
+    pending   not done yet (or waiting out a retry)
+    fetched   the game and all ten players are loaded and saved
+    analyzed  its row is in the data file
+    failed    gave up, reason says why
+
+Every player gets saved the moment they're loaded (their summoner/league
+JSONs, match ids and masteries, the match JSONs are in the match cache),
+so a game that dies halfway only has to load the players it didn't get
+to, and a game that was fetched doesn't load anything again.
+
+Network trouble is retried later with exponential backoff, everything
+else (summoner doesn't exist, bad player...) fails right away.
+
+    python jobs.py games2.csv
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import requests
+
+import main
+import run
+from riotclient import platform_of
+from snapshots import player_snapshot
+
+JOBS_FILE = 'res/jobs.sqlite'
+STATES = ('pending', 'fetched', 'analyzed', 'failed')
+
+
+class JobManifest:
+    """Games and players and how far along they are, in a SQLite file.
+
+    ===== Public Attributes =====
+    path: the SQLite file
+    max_attempts: how many times a game gets tried before it's failed
+    backoff: seconds before the first retry, doubling every time after
+    player_ttl: how long a saved (or failed) player is good for. After that
+        they get loaded again. None, the default, keeps them forever so a
+        resumed run never loads anyone twice; set it if fresh ranks matter
+        more than the requests.
+    """
+
+    def __init__(self, path: str = JOBS_FILE, max_attempts: int = 5,
+                 backoff: float = 60,
+                 player_ttl: Optional[float] = None) -> None:
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.player_ttl = player_ttl
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # seq is the order games get run in
+        self._db.execute('CREATE TABLE IF NOT EXISTS games ('
+                         'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'gameid TEXT UNIQUE, player TEXT, state TEXT, '
+                         'attempts INTEGER, reason TEXT, next_try REAL, '
+                         'updated REAL)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS players ('
+                         'name TEXT PRIMARY KEY, n INTEGER, state TEXT, '
+                         'reason TEXT, data BLOB, updated REAL)')
+        self._db.commit()
+
+    # GAMES
+    def add_games(self, games: Iterable[Tuple[str, str]]) -> int:
+        """Adds (gameid, player) tuples as pending, in order. Ones already
+        in the manifest are left alone. Returns how many were new."""
+        now = time.time()
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                'INSERT OR IGNORE INTO games (gameid, player, state, '
+                'attempts, next_try, updated) VALUES (?, ?, ?, 0, 0, ?)',
+                ((str(g[0]), str(g[1]), 'pending', now) for g in games))
+            self._db.commit()
+            return self._db.total_changes - before
+
+    def next_games(self, limit: int = 100,
+                   now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Up to limit games that are due: fetched ones first (they're
+        cheap to finish), then pending ones whose retry time has come."""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT gameid, player FROM games WHERE state = 'fetched' OR "
+                "(state = 'pending' AND next_try <= ?) "
+                "ORDER BY state = 'pending', seq LIMIT ?",
+                (now, limit)).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def next_retry(self) -> Optional[float]:
+        """When the next pending game is due, None if there aren't any."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT MIN(next_try) FROM games WHERE state = 'pending'"
+            ).fetchone()[0]
+
+    def state(self, gameid: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute('SELECT state FROM games WHERE gameid = ?',
+                                   (gameid,)).fetchone()
+        return None if row is None else row[0]
+
+    def mark(self, gameids: Iterable[str], state: str,
+             reason: Optional[str] = None) -> None:
+        with self._lock:
+            self._db.executemany(
+                'UPDATE games SET state = ?, reason = ?, updated = ? '
+                'WHERE gameid = ?',
+                ((state, reason, time.time(), gameid) for gameid in gameids))
+            self._db.commit()
+
+    def fail(self, gameid: str, reason: str, transient: bool,
+             now: Optional[float] = None) -> str:
+        """Records a failed attempt. Transient ones go back to pending for
+        a retry after the backoff, until max_attempts. Returns the state
+        the game ends up in."""
+        now = time.time() if now is None else now
+        with self._lock:
+            attempts = self._db.execute(
+                'SELECT attempts FROM games WHERE gameid = ?',
+                (gameid,)).fetchone()[0] + 1
+            state = 'pending' if transient and attempts < self.max_attempts \
+                else 'failed'
+            self._db.execute(
+                'UPDATE games SET state = ?, attempts = ?, reason = ?, '
+                'next_try = ?, updated = ? WHERE gameid = ?',
+                (state, attempts, reason,
+                 now + self.backoff * 2 ** (attempts - 1), now, gameid))
+            self._db.commit()
+        return state
+
+    def counts(self) -> Dict[str, int]:
+        """How many games are in each state."""
+        ret_dict = dict.fromkeys(STATES, 0)
+        with self._lock:
+            for state, count in self._db.execute(
+                    'SELECT state, COUNT(*) FROM games GROUP BY state'):
+                ret_dict[state] = count
+        return ret_dict
+
+    def failures(self) -> Dict[str, int]:
+        """reason: how many failed games gave it."""
+        with self._lock:
+            return dict(self._db.execute(
+                "SELECT reason, COUNT(*) FROM games WHERE state = 'failed' "
+                "GROUP BY reason").fetchall())
+
+    # PLAYERS
+    def save_player(self, player: main.Player) -> None:
+        data = zlib.compress(json.dumps(player_snapshot(player),
+                                        separators=(',', ':')).encode())
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO players VALUES '
+                             '(?, ?, ?, NULL, ?, ?)',
+                             (player.name, player.n, 'fetched', data,
+                              time.time()))
+            self._db.commit()
+
+    def fail_player(self, name: str, reason: str) -> None:
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO players VALUES '
+                             '(?, NULL, ?, ?, NULL, ?)',
+                             (name, 'failed', reason, time.time()))
+            self._db.commit()
+
+    def failed_player(self, name: str) -> Optional[str]:
+        """Why name failed to load, if they did and it isn't older than
+        player_ttl. Otherwise None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT reason, updated FROM players WHERE name = ? "
+                "AND state = 'failed'", (name,)).fetchone()
+        if row is None or (self.player_ttl is not None and
+                           time.time() - row[1] > self.player_ttl):
+            return None
+        return row[0]
+
+    def load_player(self, api_key: str, name: str, n: int,
+                    platform: Optional[str] = None) -> Optional[main.Player]:
+        """The saved player, if they were loaded for the same n (and
+        platform, if it's given) and aren't older than player_ttl.
+        Otherwise None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, updated FROM players WHERE name = ? AND n = ? "
+                "AND state = 'fetched'", (name, n)).fetchone()
+        if row is None or (self.player_ttl is not None and
+                           time.time() - row[1] > self.player_ttl):
+            return None
+        info = json.loads(zlib.decompress(row[0]))
+        if platform is not None and \
+                info.get('platform', platform) != platform:
+            return None
+        return main.Player.from_snapshot(api_key, name, n, info)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def is_transient(e: Exception) -> bool:
+    """Whether trying again later might work: the network, or riot still
+    saying 429/5xx after the client's retries (RiotTransientError), not the
+    game."""
+    return isinstance(e, (requests.RequestException, OSError)) and \
+        not isinstance(e, PermissionError)
+
+
+def fetch_game(manifest: JobManifest, api_key: str, game: Tuple[str, str],
+               n: int) -> main.Game:
+    """Loads game, taking every player the manifest has and saving every
+    player it has to load. Raises whatever Game raises, or the network
+    error that stopped a player from loading."""
+    client = main.get_client(api_key)
+    platform = platform_of(game[0]) or client.platform
+    game_data = client.match(game[0])
+    if game_data is None:
+        raise main.YouAreDumbOrSomethingError(f'match {game[0]} not found')
+    players = {}
+    for man in game_data['info']['participants']:
+        name = man['summonerName'].replace(' ', '')
+        if name in main.bad_players:
+            # Game raises BadPlayerError before loading anyone
+            break
+        guy = main.player_objects.get(name)
+        if guy is None or guy.n != n or guy.platform != platform:
+            guy = manifest.load_player(api_key, name, n, platform)
+        if guy is None:
+            reason = manifest.failed_player(name)
+            if reason is not None:
+                # failed last run too, no point asking riot again
+                guy = main.YouAreDumbOrSomethingError(reason)
+        if guy is None:
+            try:
+                guy = main.Player(api_key, name, n, platform)
+                manifest.save_player(guy)
+            except Exception as e:
+                if is_transient(e):
+                    raise
+                manifest.fail_player(name, repr(e))
+                # Game turns it into a BadPlayerError, like it always has
+                guy = e
+        players[name] = guy
+    return main.Game(api_key, game[0], game[1], n, game_data, players)
+
+
+def run_jobs(manifest: JobManifest,
+             api_key: Optional[Union[str, List[str]]] = None,
+             n: int = 5, analysis_class: type = main.GameAnalysis,
+             batch: int = 100, wait_for_retries: bool = True) -> Dict[str, int]:
+    """Works through the manifest until every game is analyzed or failed
+    (or, if wait_for_retries is False, until only retries that aren't due
+    yet are left). Games only count as analyzed once their row has been
+    flushed to run's data file. Returns manifest.counts(). api_key is
+    every key in the config if it's None."""
+    api_key = api_key if api_key is not None else run.get_api_keys()
+    analysis = analysis_class(api_key)
+    seen = run.get_seen()
+
+    def flushed(rows: List[List]) -> None:
+        run.mark_seen(rows)
+        manifest.mark((row[0] for row in rows), 'analyzed')
+
+    try:
+        sink = run.make_data_sink(flushed)
+    except PermissionError:
+        print("bruh close the csv what's wrong with you")
+        return manifest.counts()
+    print(f'[jobs] {manifest.counts()}')
+    # a locked data file (PermissionError) stops the run. It's nothing to
+    # do with the games, so they stay fetched and get written next time.
+    with sink:
+        try:
+            while True:
+                games = manifest.next_games(batch)
+                if not games:
+                    due = manifest.next_retry()
+                    if due is None or not wait_for_retries:
+                        break
+                    # only retries left, sleep until the first one
+                    sink.flush()
+                    time.sleep(max(0.0, due - time.time()))
+                    continue
+                for game in games:
+                    if game[0] in seen:
+                        manifest.mark([game[0]], 'analyzed')
+                        continue
+                    try:
+                        a = fetch_game(manifest, api_key, game, n)
+                        manifest.mark([game[0]], 'fetched')
+                        dic = analysis.get_stats(a, game)
+                        analysis.save_snapshot(a, game)
+                    except Exception as e:
+                        state = manifest.fail(game[0], repr(e),
+                                              is_transient(e))
+                        print(f'[jobs] {game[0]} {state}: {e!r}')
+                        continue
+                    sink.write(run.dict_to_list(dic))
+                # the rows of fetched games we just wrote aren't flushed
+                # yet and would come straight back from next_games
+                sink.flush()
+        except PermissionError:
+            print("bruh close the csv what's wrong with you")
+    counts = manifest.counts()
+    print(f'[jobs] done: {counts}')
+    for reason, count in manifest.failures().items():
+        print(f'    {count} failed with {reason}')
+    run.report_metrics(**counts)
+    return counts
+
+
+def run_csv(csv_path: str, manifest: Optional[JobManifest] = None,
+            schedule: bool = True) -> Dict[str, int]:
+    """Adds every game in one of our games csvs to the manifest (JOBS_FILE
+    if it's None) and runs it. With schedule, new games go in in
+    scheduler.plan's order instead of the csv's."""
+    import pandas as pd
+    manifest = manifest if manifest is not None else JobManifest()
+    a = pd.read_csv(csv_path)
+    games = [(str(row['gameid']), str(row['player']))
+             for index, row in a.iterrows()]
+    if schedule:
+        import scheduler
+        games = scheduler.plan([game for game in games
+                                if manifest.state(game[0]) is None])
+    added = manifest.add_games(games)
+    print(f'Added {added} new games from {csv_path}')
+    return run_jobs(manifest)
+
+
+if __name__ == '__main__':
+    import sys
+    run_csv(sys.argv[1] if len(sys.argv) > 1 else 'games2.csv')
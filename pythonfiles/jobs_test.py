@@ -0,0 +1,109 @@
+from benchmark import FakeRiot
+from jobs import JobManifest, is_transient, run_jobs
+from mockserver import MockRiotServer
+from riotclient import RiotTransientError
+
+import requests
+
+
+def test_add_and_order(tmp_path):
+    jobs = JobManifest(str(tmp_path / 'jobs.sqlite'))
+    assert jobs.add_games([('NA1_1', 'a'), ('NA1_2', 'b')]) == 2
+    assert jobs.add_games([('NA1_2', 'b'), ('NA1_3', 'c')]) == 1
+    jobs.mark(['NA1_3'], 'fetched')
+    # fetched games get finished first
+    assert jobs.next_games() == [('NA1_3', 'c'), ('NA1_1', 'a'),
+                                 ('NA1_2', 'b')]
+    jobs.mark(['NA1_1', 'NA1_3'], 'analyzed')
+    assert jobs.counts() == {'pending': 1, 'fetched': 0, 'analyzed': 2,
+                             'failed': 0}
+
+
+def test_retries_back_off_then_fail(tmp_path):
+    jobs = JobManifest(str(tmp_path / 'jobs.sqlite'), max_attempts=3,
+                       backoff=10)
+    jobs.add_games([('NA1_1', 'a')])
+    assert jobs.fail('NA1_1', 'timeout', True, now=0) == 'pending'
+    assert jobs.next_games(now=9) == []
+    assert jobs.next_games(now=10) == [('NA1_1', 'a')]
+    assert jobs.fail('NA1_1', 'timeout', True, now=10) == 'pending'
+    assert jobs.next_retry() == 30
+    assert jobs.fail('NA1_1', 'timeout', True, now=30) == 'failed'
+    assert jobs.next_games(now=10 ** 10) == []
+    assert jobs.failures() == {'timeout': 1}
+
+
+def test_permanent_failures_and_resume(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite')
+    jobs = JobManifest(path)
+    jobs.add_games([('NA1_1', 'a'), ('NA1_2', 'b')])
+    assert jobs.fail('NA1_1', 'BadPlayerError', False) == 'failed'
+    jobs.close()
+    jobs = JobManifest(path)
+    assert jobs.state('NA1_1') == 'failed'
+    assert jobs.next_games() == [('NA1_2', 'b')]
+
+
+def test_failed_players_are_not_loaded_again(offline_main, mock_world,
+                                             monkeypatch, tmp_path):
+    game = mock_world.games(1)[0]
+    match = offline_main.get_client('key').match(game[0])
+    name = match['info']['participants'][3]['summonerName'].replace(' ', '')
+    manifest = JobManifest(str(tmp_path / 'jobs.sqlite'))
+    manifest.fail_player(name, "YouAreDumbOrSomethingError('gone')")
+    manifest.add_games([game])
+    loaded = []
+    player = offline_main.Player
+    monkeypatch.setattr(offline_main, 'Player', lambda key, who, *args: (
+        loaded.append(who), player(key, who, *args))[1])
+    assert run_jobs(manifest, 'key')['failed'] == 1
+    assert name not in loaded
+    assert 'BadPlayerError' in manifest._db.execute(
+        'SELECT reason FROM games').fetchone()[0]
+
+
+def test_is_transient():
+    assert is_transient(requests.ConnectionError())
+    assert not is_transient(PermissionError())
+    assert is_transient(RiotTransientError())
+    assert not is_transient(ValueError())
+
+
+def test_rate_limited_games_stay_pending(offline_main, monkeypatch,
+                                         tmp_path):
+    world = FakeRiot(30, 60)
+    games = world.games(2)
+    # the matches are cached, so it's the players that get the 429s
+    for gameid, player in games:
+        offline_main.get_match_cache().put(
+            gameid, world.match(int(gameid.split('_')[1]) - 4000000000))
+    manifest = JobManifest(str(tmp_path / 'jobs.sqlite'))
+    manifest.add_games(games)
+    with MockRiotServer(world, app_limits=None, inject_429=1.0,
+                        retry_after=0) as server:
+        monkeypatch.setattr(offline_main, 'API_HOST', server.host)
+        counts = run_jobs(manifest, 'key', wait_for_retries=False)
+    assert counts['pending'] == 2 and counts['failed'] == 0
+    assert server.sent_429 > 0
+    assert not offline_main.bad_players
+    assert manifest._db.execute("SELECT COUNT(*) FROM players WHERE "
+                                "state = 'failed'").fetchone()[0] == 0
+
+
+def test_locked_csv_stops_the_run(offline_main, mock_world, monkeypatch,
+                                  tmp_path):
+    import run
+    from sink import RowSink
+
+    class LockedSink(RowSink):
+        def _write_rows(self, rows):
+            raise PermissionError('locked')
+
+    monkeypatch.setattr(run, 'make_data_sink', lambda on_flush: LockedSink(
+        str(tmp_path / 'data.csv'), run.VARIABLES, on_flush=on_flush))
+    manifest = JobManifest(str(tmp_path / 'jobs.sqlite'))
+    manifest.add_games(mock_world.games(3))
+    counts = run_jobs(manifest, 'key', batch=2)
+    # stopped after the first batch, nothing failed
+    assert counts['failed'] == 0 and counts['fetched'] == 2
+    assert counts['pending'] == 1
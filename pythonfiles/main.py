@@ -1,10 +1,17 @@
 import statistics
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, \
+    Sequence, Tuple, Union
 
-import time
-import requests
 import json
-import randomclasses
+from history import HISTORY_FILE, MatchHistory
+from matchcache import MatchCache
+from matchstats import MatchStats, all_player_stats, player_stats
+from metrics import Metrics
+from riotclient import HOST, RiotClient, RiotTransientError, \
+    mastery_map, platform_of, region_for
+from snapshots import SNAPSHOT_FILE, SnapshotStore, take_snapshot
+from staticdata import DDRAGON, StaticData
+from ttlcache import TTLCache
 
 
 class YouAreDumbOrSomethingError(Exception):
@@ -18,38 +25,113 @@ class BadPlayerError(Exception):
 
 
 # CONSTANTS
-# name: Player.
-player_objects = {}
-bad_players = []
+# endpoint: seconds before a cached response is too old to use.
+# None never goes stale (a summoner's puuid and id don't change).
+LOOKUP_TTLS = {'summoner': None, 'league': 6 * 60 * 60,
+               'mastery_points': 24 * 60 * 60}
+# name: Player. Only the most recent ones, and only while their ranked info
+# is still fresh.
+PLAYER_OBJECTS_MAX = 100
+player_objects = TTLCache(PLAYER_OBJECTS_MAX, LOOKUP_TTLS['league'])
+# api key (or tuple of them): RiotClient. Everything using the same keys
+# shares the rate limits.
+clients = {}
+# where requests go, with {routing} in it (mockserver points this at itself)
+API_HOST = HOST
+# every match json we've downloaded, shared by all the clients
+MATCH_CACHE_FILE = 'res/matches.sqlite'
+match_cache = None
+# summoner/league/mastery responses, shared by all the clients
+LOOKUP_CACHE_FILE = 'res/lookups.sqlite'
+LOOKUP_CACHE_MAX = 20000
+lookup_caches = None
+# every player's match ids, so we only ask for the new ones
+history = None
+# what every request cost, shared by all the clients. run.report_metrics
+# adds it to METRICS_FILE.
+METRICS_FILE = 'res/metrics.jsonl'
+metrics = None
+# every analyzed game's league/mastery/match ids, so refeaturize.py can
+# work the stats out again without the API
+SAVE_SNAPSHOTS = True
+snapshot_store = None
+# the thread pool every AsyncGameAnalysis runs its client calls on, one
+# per process however many of them get made
+ASYNC_WORKERS = 32
+executor = None
+bad_players = set()
+# queues that are played on summoners rift (gameMode CLASSIC): draft,
+# solo/duo, blind, flex, clash
+SR_QUEUES = [400, 420, 430, 440, 700]
 VERSION = '11.11.1'
+# ddragon files get saved here, so each VERSION is only downloaded once
+DDRAGON_DIR = 'res/ddragon'
+DDRAGON_URL = DDRAGON
+# set to a champion.json on disk to never go to ddragon at all
+CHAMPION_FILE = None
+static_data = None
+
+
+def get_static_data() -> StaticData:
+    """The ddragon data for VERSION, from CHAMPION_FILE if it's set."""
+    global static_data
+    if static_data is None:
+        if CHAMPION_FILE is not None:
+            static_data = StaticData.from_file(VERSION, CHAMPION_FILE)
+        else:
+            static_data = StaticData(VERSION, DDRAGON_DIR, DDRAGON_URL)
+    return static_data
 
 
 def name_id_dict() -> Dict:
     """Returns a dictionary of championName: ChampionID pairs"""
-    ddragon = requests.get('http://ddragon.leagueoflegends.com/cdn/' + VERSION + '/data/en_US/champion.json')
-    champData = ddragon.json()
-    NameToId = {}
-    for champ in champData['data']:
-        a_key = champData['data'][champ]['key']
-        a_id = champData['data'][champ]['id']
-        NameToId[a_id] = int(a_key)
-    return NameToId
+    return get_static_data().name_to_id
+
+
+def is_sr(match: Dict) -> bool:
+    """Whether match (a match json) is a summoners rift game in one of
+    SR_QUEUES. Bots and customs are CLASSIC too but don't count, since
+    Player.plan_matches can't find them through the queue lists."""
+    return match['info']['gameMode'] == 'CLASSIC' and \
+        match['info']['queueId'] in SR_QUEUES
+
 
+def match_number(match_id: str) -> int:
+    """The number in a match id like NA1_3938838278. They go up over time,
+    so newer games have bigger numbers."""
+    return int(match_id.rsplit('_', 1)[-1])
 
-nameid = name_id_dict()
+
+def __getattr__(name: str) -> Any:
+    """main.nameid used to be loaded on import, which meant importing main
+    needed the internet. Now it only gets loaded if somebody asks for it."""
+    if name == 'nameid':
+        return name_id_dict()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 class Player:
     """A League player and his JSONs.
 
     ===== Public Attributes =====
-    api_key: your api key. Give it to me.
+    api_key: your api key. Give it to me. (Or a list of them, see
+        get_client.)
     name: the summoner name(string)
+    platform: the platform they play on (na1, euw1...)
+    region: the regional routing value their matches are under
     n: number of games you want data for
     sum_info: basic summoner info(json)
     ranked_info: ranked information such as winrate, games played(json)
-    match_info: list of game jsons for the past n SR matches.
-    match_info_all: list of all game jsons for the past n matches
+    match_info: list of game jsons for the past n SR matches. Only their
+        MatchStats are kept, the jsons come out of the match cache again
+        every time this is asked for.
+    match_info_all: list of all game jsons for the past n matches, same
+        deal
+    sr_stats: this player's MatchStats for each game in match_info
+    all_stats: this player's MatchStats for each game in match_info_all
+    match_requests: how many match jsons loading this player asked for
+    mastery_points: championId: mastery points, loaded the first time
+        get_mastery needs it
 
     === Useful Methods ===
     get_ranked_wr: float
@@ -62,11 +144,16 @@ class Player:
     win: finds if a player won a game from the json
     """
 
-    def __init__(self, api_key: str, name: str, n: int) -> None:
+    def __init__(self, api_key: str, name: str, n: int,
+                 platform: Optional[str] = None) -> None:
         """Creates a new player and gets all the JSONs set up.
         name is the summoner name of the player
-        n is the number of games you want to look back at."""
+        n is the number of games you want to look back at.
+        platform is where they play, the client's (na1) if it's None."""
         self.api_key = api_key
+        self.client = get_client(api_key)
+        self.platform = platform or self.client.platform
+        self.region = region_for(self.platform)
 
         # Andrew says if there's a space in the name we just delete it
         self.name = name.replace(' ', '')
@@ -77,11 +164,86 @@ class Player:
             raise YouAreDumbOrSomethingError(f'Summoner info not found for '
                                              f'{self.name}')
         self.ranked_info = self.get_ranked_info(self.sum_info['id'])
+        self.mastery_points = None
+        self.match_requests = 0
+        self._queue_ids = {}
         self.match_info, self.match_info_all = \
             self.get_match_infos(self.sum_info['puuid'])
-        if self.match_info is None or self.ranked_info is None:
+        if self.sr_stats is None or self.ranked_info is None:
             print("Warning, match info OR ranked info was not found.")
 
+    @classmethod
+    def from_data(cls, api_key: str, name: str, n: int, sum_info: Dict,
+                  ranked_info: Optional[List],
+                  mastery_points: Optional[Dict[int, int]] = None,
+                  platform: Optional[str] = None) -> 'Player':
+        """Makes a player out of JSONs somebody else already fetched,
+        without sending any requests. match_info and match_info_all are left
+        empty, fill them in with sort_matches."""
+        self = cls.__new__(cls)
+        self.api_key = api_key
+        self.client = get_client(api_key)
+        self.platform = platform or self.client.platform
+        self.region = region_for(self.platform)
+        self.name = name.replace(' ', '')
+        self.n = n
+        self.sum_info = sum_info
+        self.ranked_info = ranked_info
+        self.mastery_points = mastery_points
+        self.match_requests = 0
+        self._queue_ids = {}
+        self.match_info, self.match_info_all = None, []
+        return self
+
+    @classmethod
+    def from_snapshot(cls, api_key: str, name: str, n: int, info: Dict,
+                      get_match: Optional[Callable[[str], Dict]] = None,
+                      platform: Optional[str] = None) -> 'Player':
+        """Makes a player back out of snapshots.player_snapshot's dict.
+        The match JSONs come from get_match, the client's match (so the
+        match cache, normally) if it's None. The only requests it can
+        send are for matches that aren't cached anymore. platform is the
+        snapshot's if it's None (older snapshots don't have one, they're
+        the client's platform)."""
+        self = cls.from_data(api_key, name, n, info['sum_info'],
+                             info['ranked_info'], mastery_map(
+                                 info.get('mastery_points')),
+                             platform or info.get('platform'))
+        get_match = get_match if get_match is not None else self.client.match
+        self.match_info = None if info['sr_ids'] is None \
+            else [get_match(x) for x in info['sr_ids']]
+        self.match_info_all = None if info['all_ids'] is None \
+            else [get_match(x) for x in info['all_ids']]
+        return self
+
+    # every metric reads sr_stats/all_stats, so each game gets parsed once,
+    # right when it's assigned. The jsons themselves aren't kept: 2n of
+    # them per player, with all ten participants in each, were most of
+    # what a long run held on to.
+    @property
+    def match_info(self) -> Optional[List[Dict]]:
+        return self.load_matches(self.sr_stats)
+
+    @match_info.setter
+    def match_info(self, games: Optional[List[Dict]]) -> None:
+        self.sr_stats = all_player_stats(games, self.sum_info['puuid'])
+
+    @property
+    def match_info_all(self) -> Optional[List[Dict]]:
+        return self.load_matches(self.all_stats)
+
+    @match_info_all.setter
+    def match_info_all(self, games: Optional[List[Dict]]) -> None:
+        self.all_stats = all_player_stats(games, self.sum_info['puuid'])
+
+    def load_matches(self, stats: Optional[List[MatchStats]]) \
+            -> Optional[List[Dict]]:
+        """The game jsons stats were taken from, from the match cache (or
+        riot, if they've been evicted since)."""
+        if stats is None:
+            return None
+        return [self.client.match(s.match_id) for s in stats]
+
     # DEFINITELY USEFUL METHODS
     def get_ranked_wr(self) -> Optional[float]:
         """Gets a summoner's ranked winrate from their json.
@@ -109,12 +271,12 @@ class Player:
     def get_win_score(self) -> Optional[int]:
         """Gets the players win or loss streak over all game modes.
         Returns a number representing the streak. + for win, - for loss."""
-        if not self.match_info_all:
+        if not self.all_stats:
             return None
         score = 0
-        initial_condition = self.win(self.match_info_all[0])
-        for match in self.match_info_all:
-            if self.win(match) == initial_condition:
+        initial_condition = self.all_stats[0].win
+        for match in self.all_stats:
+            if match.win == initial_condition:
                 score += 1
         return score if initial_condition else -score
 
@@ -144,13 +306,10 @@ class Player:
         """
         total = 0
         count = 0
-        if self.match_info is None:
+        if self.sr_stats is None:
             return None
-        for game in self.match_info:
-            index = game['metadata']['participants'] \
-                .index(self.sum_info['puuid'])
-            sum_stats = game['info']['participants'][index]
-            total += sum_stats['totalTimeSpentDead'] / sum_stats['timePlayed']
+        for game in self.sr_stats:
+            total += game.time_spent_dead / game.time_played
             count += 1
         return total / count if count != 0 else None
 
@@ -160,13 +319,10 @@ class Player:
         """
         count = 0
         total = 0
-        if self.match_info is None:
+        if self.sr_stats is None:
             return False
-        for game in self.match_info:
-            index = game['metadata']['participants'] \
-                .index(self.sum_info['puuid'])
-            sum_stats = game['info']['participants'][index]
-            if sum_stats['championName'] == champ:
+        for game in self.sr_stats:
+            if game.champion == champ:
                 count += 1
             total += 1
         print(f'[{self.name}.isOTP] played {champ} {count} times in the last'
@@ -178,73 +334,48 @@ class Player:
         Summoners rift games."""
         counter = 0
         total = 0
-        if self.match_info_all is None:
+        if self.all_stats is None:
             return None
-        for match in self.match_info_all:
-            if match['info']['gameMode'] != 'CLASSIC':
+        for match in self.all_stats:
+            if match.game_mode != 'CLASSIC':
                 counter += 1
             total += 1
         return True if total > 0 and counter / total > 0.6 else False
 
     def get_mastery(self, champion: str) -> int:
-        sum_id = self.sum_info['id']
-        mastery = requests.get('https://na1.api.riotgames.com/lol/champion-mastery/v4/champion-masteries/by-summoner/'
-                               + sum_id + '?api_key=' + self.api_key)
-        time.sleep(0.5)
-        mscores = mastery.json()
-        champ_id = nameid[champion]
-        for a in mscores:
-            if a['championId'] == champ_id:
-                return a['championPoints']
-        return 0
+        """Mastery points on champion (a championName), 0 if they've never
+        played it or riot wouldn't tell us."""
+        if self.mastery_points is None:
+            self.mastery_points = \
+                self.client.mastery_points(self.sum_info['id'],
+                                           self.platform) or {}
+        return self.mastery_points.get(name_id_dict()[champion], 0)
 
     # POTENTIALLY USEFUL METHODS
     def kda(self, game: Dict) -> Tuple[int, int, int]:
         """Get's the KDA of the player, based on their puuid, for one game.
         The game should be from self.match_infos.
         """
-        puuid = self.sum_info['puuid']
-        for i in range(0, len(game['metadata']['participants'])):
-            if game['metadata']['participants'][i] == puuid:
-                c = i
-        b = game['info']['participants'][c]
-        k = b['kills']
-        d = b['deaths']
-        a = b['assists']
-        return k, d, a
+        b = player_stats(game, self.sum_info['puuid'])
+        return b.kills, b.deaths, b.assists
 
     def win(self, game: Dict) -> bool:
         """Returns true or false based on whether or not the player
         won a game. Games should be from self.match_info"""
-        puuid = self.sum_info['puuid']
-        for i in range(0, len(game['metadata']['participants'])):
-            if game['metadata']['participants'][i] == puuid:
-                c = i
-        b = game['info']['participants'][c]
-        w = b['win']
-        return w
+        return player_stats(game, self.sum_info['puuid']).win
 
     # LOADING JSON METHODS
     def get_sum_info(self, summoner_name: str) -> Optional[Dict]:
         """Gets basic summoner info, such as id, account id, puuid
         For a summoner name.
         Returns None if it got an error code."""
-
-        lonk = 'https://na1.api.riotgames.com/lol/summoner/v4/summoners' \
-               + '/by-name/' \
-               + summoner_name + '?api_key=' + self.api_key
-        sum_info = requests.get(lonk)
-        return error_or_json(sum_info)
+        return self.client.summoner_by_name(summoner_name, self.platform)
 
     def get_ranked_info(self, sum_id: str) -> Optional[Dict]:
         """Gets ranked info, such as queue type, wins/losses
         using the 'id' from get_sum_info output.
         Returns None if not code 200."""
-        rank_info = requests. \
-            get('https://na1.api.riotgames.com/'
-                'lol/league/v4/entries/by-summoner/' + sum_id + '?api_key=' +
-                self.api_key)
-        return error_or_json(rank_info)
+        return self.client.league_entries(sum_id, self.platform)
 
     def get_match_infos(self, puuid: str) -> Optional[Tuple[List, List]]:
         """Gets match information for the past n SR matches and past n matches.
@@ -257,39 +388,111 @@ class Player:
         matchdata['metadata']['participants][index] is the player's stats.
         """
         # how far back should we check??
-        how_far = '20'
+        how_far = 20
         # hmga is 1 for now to avoid issues with getting data from the
         # current game that a player is in. We just won't deal with that ever.
-        hmga = '1'
+        hmga = 1
 
         # List of game ids to look at
-        game_ids = requests.get('https://americas.api.riotgames.com/lol/match'
-                                '/v5/matches/by-puuid/' + puuid + '/ids' +
-                                '?api_key=' + self.api_key + '&start=' +
-                                hmga + '&count=' + how_far)
         # So it starts at hmga ago and goes back n games.
-
-        game_ids = error_or_json(game_ids)
+        game_ids = self.client.recent_match_ids(puuid, hmga, how_far,
+                                                self.region)
+        if game_ids is None:
+            return None
+        # generator, so we stop downloading once sort_matches has enough
+        return self.sort_matches(self.iter_matches(puuid, game_ids))
+
+    def iter_matches(self, puuid: str, game_ids: List[str]) \
+            -> Iterable[Tuple[str, Optional[Dict]]]:
+        """(gameid, game json) pairs for sort_matches, downloaded only as
+        they're asked for, in whatever order plan_matches picks."""
+        fetched = []
+        while True:
+            batch = self.plan_matches(puuid, game_ids, fetched)
+            if not batch:
+                return
+            for gameid in batch:
+                a = self.client.match(gameid)
+                self.match_requests += 1
+                fetched.append((gameid, a))
+                yield gameid, a
+
+    def plan_matches(self, puuid: str, game_ids: List[str],
+                     fetched: List[Tuple[str, Optional[Dict]]]) -> List[str]:
+        """Which match ids to download next, given game_ids (newest first)
+        and the (gameid, json) pairs fetched so far. [] once we have n SR
+        games or there's nothing left to try.
+
+        The first n games of any mode always come from game_ids. After
+        that, if SR games have been rare enough that going on down game_ids
+        would waste more downloads than asking for SR_QUEUES filtered id
+        lists costs, the SR games come from those lists instead, paged
+        deeper while they're short. Either way only games in the same
+        window as game_ids are used, and SR games only count if is_sr, so
+        the result is the same, just cheaper.
+        """
+        done = {gameid for gameid, a in fetched}
+        games = [a for gameid, a in fetched if a is not None]
+        sr = sum(1 for a in games if is_sr(a))
+        rest = [gameid for gameid in game_ids if gameid not in done]
+        left = self.n - sr
+        if left <= 0 or not rest:
+            return []
+        if len(games) < self.n:
+            return rest[:self.n - len(games)]
+        # downloads to find left more SR games going down game_ids, if
+        # they keep showing up as often as they have
+        guess = len(rest) if sr == 0 else left * len(games) / sr
+        if guess - left <= len(SR_QUEUES):
+            return rest[:left]
+        newest = match_number(game_ids[0])
+        oldest = match_number(game_ids[-1])
+        depth = min(2 * left, len(game_ids))
+        while True:
+            lists = [self.queue_match_ids(puuid, queue, depth)
+                     for queue in SR_QUEUES]
+            ids = {gameid for ids in lists if ids is not None for gameid in ids
+                   if oldest <= match_number(gameid) <= newest}
+            ids = sorted(ids - done, key=match_number, reverse=True)
+            if ids:
+                return ids[:left]
+            # every list ran out, or went past the window
+            if depth >= len(game_ids) or all(
+                    x is None or len(x) < depth or
+                    match_number(x[-1]) < oldest for x in lists):
+                return []
+            depth = min(2 * depth, len(game_ids))
+
+    def queue_match_ids(self, puuid: str, queue: int,
+                        depth: int) -> Optional[List[str]]:
+        """The newest depth match ids in queue. Only asks riot again if it
+        wants more than last time and last time's list wasn't all of them.
+        """
+        if queue in self._queue_ids:
+            asked, ids = self._queue_ids[queue]
+            if asked >= depth or ids is None or len(ids) < asked:
+                return ids
+        ids = self.client.recent_match_ids(puuid, 0, depth, self.region,
+                                           queue=queue)
+        self._queue_ids[queue] = depth, ids
+        return ids
+
+    def sort_matches(self, matches: Iterable[Tuple[str, Optional[Dict]]]) \
+            -> Tuple[Optional[List], List]:
+        """Goes through (gameid, game json) pairs newest first and picks out
+        the past n SR matches and past n matches, like get_match_infos says.
+        Stops pulling from matches once it has n SR games.
+        """
         counterc = 0
         # this is some dumb shit
         match_data = []
         all_match_data = []
-        sr_games = []
-        if game_ids is None:
-            return None
-        for gameid in game_ids:
-            time.sleep(1)
-            dada = requests.get('https://americas.api.riotgames.com/lol/'
-                                'match/v5/matches/' +
-                                gameid + '?api_key=' + self.api_key)
-            a = error_or_json(dada)
-            print(a)
-            if a is not None and a['info']['gameMode'] == 'CLASSIC':
+        for gameid, a in matches:
+            if a is not None and is_sr(a):
                 match_data.append(a)
                 counterc += 1
                 print(f"[{self.name}]Found {counterc} games total: "
                       f"({a['info']['gameMode']}), ('{gameid}', '{self.name}')")
-                sr_games.append((gameid, self.name))
             else:
                 b = a['info']['gameMode'] if a is not None else 'None'
                 print(f'[{self.name}]{gameid} was not a summoners rift game,'
@@ -301,8 +504,9 @@ class Player:
         if counterc < self.n:
             print(f'[Player]Warning: {self.n} games requested, only found '
                   f'{counterc} games for {self.name}')
-        print(sr_games)
-        randomclasses.write_games(sr_games)
+        print(f'[{self.name}] asked for {self.match_requests} match jsons')
+        # only needed while the matches were loading
+        self._queue_ids = {}
         return None if len(match_data) == 0 else match_data, all_match_data
 
     # NOT IN USE METHODS
@@ -313,22 +517,15 @@ class Player:
         a = 0
         b = 0
         match_data = []
-        lg = requests.get('https://americas.api.riotgames.com/lol/match'
-                          '/v5/matches/by-puuid/' + puuid + '/ids' +
-                          '?api_key=' + self.api_key + '&start=' +
-                          str(b) + '&count=50')
+        lg = self.client.match_ids(puuid, b, 50, self.region)
 
         while a < n and b < 50:
-            lg = error_or_json(lg)
             if lg is None or len(lg) == 0:
                 b += 1
                 continue
             else:
                 lg = lg[0]
-            md = requests.get('https://americas.api.riotgames.com/lol/'
-                              'match/v5/matches/' +
-                              lg + '?api_key=' + self.api_key)
-            md = error_or_json(md)
+            md = self.client.match(lg)
             if md is None:
                 b += 1
                 continue
@@ -353,6 +550,7 @@ class Game:
     namedict: dict with names and champions and info for players of each team.
     all_data: all the game data.
     game_id: The game id.
+    platform: the platform it was played on, from game_id (na1, euw1...)
     api_key: gimme dat api key
 
     ===== Useful Methods =====
@@ -372,14 +570,23 @@ class Game:
     # 'teamId' 100 is blue, 200 is red
     # this class will go down the list of players, put each player object
     # in either the blue or red team
-    def __init__(self, api_key: str, game_id: str, name: str, n: int) -> None:
+    def __init__(self, api_key: str, game_id: str, name: str, n: int,
+                 game_data: Optional[Dict] = None,
+                 players: Optional[Dict[str, Any]] = None) -> None:
         """Initializes a Game object.
-        Name is the 'main' player you wanna look at in the game."""
+        Name is the 'main' player you wanna look at in the game.
+        game_data and players are for when the game json and some Players
+        (or the exception loading them raised) were fetched ahead of time,
+        see AsyncGameAnalysis."""
         self.api_key = api_key
+        self.client = get_client(api_key)
         self.game_id = game_id
+        self.platform = platform_of(game_id) or self.client.platform
+        self.preloaded = players if players is not None else {}
         # for now it's just the name, we'll assign the player object later.
         self.man = name.replace(' ', '')
-        self.all_data = self.get_game_data()
+        self.all_data = game_data if game_data is not None \
+            else self.get_game_data()
         self.namedict = self.get_name_list(self.all_data)
         self.ally = []
         self.enemy = []
@@ -400,16 +607,21 @@ class Game:
                 else:
                     print(f'[Game] done checking {a[0]}, was not {self.man}')
                 self.ally.append(bal)
+            except RiotTransientError:
+                # riot's fault, not the player's
+                raise
             except:
-                bad_players.append(a[0])
+                bad_players.add(a[0])
                 raise BadPlayerError('error getting player lol')
         for c in self.namedict['enemy']:
             try:
                 print(f'[Game]getting enemy {c[0]}')
                 print('############################')
                 self.enemy.append(self.get_player(c[0], n))
+            except RiotTransientError:
+                raise
             except:
-                bad_players.append(c[0])
+                bad_players.add(c[0])
                 raise BadPlayerError('error getting player lol')
         if len(self.ally) == len(self.enemy) == 5 and \
                 isinstance(self.man, Player):
@@ -421,6 +633,26 @@ class Game:
             print('length of self.enemy is', len(self.enemy))
             raise YouAreDumbOrSomethingError('error loading game')
 
+    @classmethod
+    def from_data(cls, api_key: str, game_data: Dict, name: str,
+                  players: Dict[str, Player]) -> 'Game':
+        """Makes a game out of its JSON and all ten of its Players (by
+        summoner name, no spaces), without sending any requests or
+        touching player_objects. Raises KeyError if one is missing."""
+        self = cls.__new__(cls)
+        self.api_key = api_key
+        self.client = get_client(api_key)
+        self.game_id = game_data['metadata']['matchId']
+        self.platform = platform_of(self.game_id) or self.client.platform
+        self.preloaded = players
+        self.man = name.replace(' ', '')
+        self.all_data = game_data
+        self.namedict = self.get_name_list(game_data)
+        self.ally = [players[a[0]] for a in self.namedict['ally']]
+        self.enemy = [players[c[0]] for c in self.namedict['enemy']]
+        self.man = players[self.man]
+        return self
+
     # TOOLS
     def get_kda(self, name: str) -> Optional[Tuple]:
         """Returns (kills, death's, assists) or None for a person in the
@@ -452,14 +684,12 @@ class Game:
 
     def get_admd(self, team: str) -> List[Dict]:
         """Gets list of tuples for 'attack', 'defense', 'magic', 'difficulty'"""
-        # inefficient to send request every time but requests won't be
-        # frequent, it's whatever.
-        champ_data = get_champ_info()['data']
+        champ_info = get_static_data().name_to_info
         ret_lst = []
         for player in self.namedict[team]:
             champ_played = player[1]
-            if champ_played in champ_data:
-                ret_lst.append(champ_data[champ_played]['info'])
+            if champ_played in champ_info:
+                ret_lst.append(champ_info[champ_played])
         return ret_lst
 
     def get_sum_from_admd(self, what: str) -> \
@@ -508,19 +738,15 @@ class Game:
         enemy = 0
         for x in self.ally:
             b = []
-        for i in range(0, len(x.match_info)):
-            k, d, a = x.kda(x.match_info[i])
-            d = max(d, 1)
-            b.append((k + a) / d)
+        for game in x.sr_stats:
+            b.append(game.kda_ratio())
         if statistics.median(b) > 4.5:
             ally += 1
             print('[Game.SmurfCount] Ally Smurf: ' + x.name)
         for x in self.enemy:
             b = []
-        for i in range(0, len(x.match_info)):
-            k, d, a = x.kda(x.match_info[i])
-            d = max(d, 1)
-            b.append((k + a) / d)
+        for game in x.sr_stats:
+            b.append(game.kda_ratio())
         if statistics.median(b) > 4.5:
             enemy += 1
             print('[Game.SmurfCount] Enemy Smurf: ' + x.name)
@@ -533,18 +759,14 @@ class Game:
         enemy = 0
         for x in self.ally:
             b = []
-        for i in range(0, len(x.match_info)):
-            k, d, a = x.kda(x.match_info[i])
-            d = max(d, 1)
-            b.append((k + a) / d)
+        for game in x.sr_stats:
+            b.append(game.kda_ratio())
         if statistics.median(b) > ally:
             ally = statistics.median(b)
         for x in self.enemy:
             b = []
-        for i in range(0, len(x.match_info)):
-            k, d, a = x.kda(x.match_info[i])
-            d = max(d, 1)
-            b.append((k + a) / d)
+        for game in x.sr_stats:
+            b.append(game.kda_ratio())
         if statistics.median(b) > enemy:
             enemy = statistics.median(b)
         return ally, enemy
@@ -558,8 +780,8 @@ class Game:
         for x in self.ally:
             win = 0
             total = 0
-            for i in range(0, len(x.match_info)):
-                if x.win(x.match_info[i]):
+            for game in x.sr_stats:
+                if game.win:
                     win += 1
                 total += 1
             if win / total < 0.35:
@@ -568,8 +790,8 @@ class Game:
         for x in self.enemy:
             win = 0
             total = 0
-            for i in range(0, len(x.match_info)):
-                if x.win(x.match_info[i]):
+            for game in x.sr_stats:
+                if game.win:
                     win += 1
                 total += 1
             if win / total < 0.35:
@@ -586,8 +808,8 @@ class Game:
         enemy = 0
         for x in self.ally:
             last = None
-            for mach in x.match_info:
-                curr = mach['info']['gameCreation'] / 1000
+            for mach in x.sr_stats:
+                curr = mach.game_creation / 1000
                 if last is not None and last - curr > ally:
                     ally = last - curr
                     # print(f'[Game.breakCount]: found ally {x.name}')
@@ -595,8 +817,8 @@ class Game:
                 last = curr
         for x in self.enemy:
             last = None
-            for mach in x.match_info:
-                curr = mach['info']['gameCreation'] / 1000
+            for mach in x.sr_stats:
+                curr = mach.game_creation / 1000
                 if last is not None and last - curr > enemy:
                     enemy = last - curr
                     # print(f'[Game.breakCount]: found enemy {x.name}')
@@ -654,10 +876,7 @@ class Game:
         """Gets json data for a game, based on the Game ID.
         returns none if no game is found.
         """
-        game = requests.get('https://americas.api.riotgames.com/lol/match/v5/'
-                            'matches/' + self.game_id +
-                            '?api_key=' + self.api_key)
-        return error_or_json(game)
+        return self.client.match(self.game_id)
 
     def get_name_list(self, game_data: Dict) -> Dict:
         """Returns a dictionary where:
@@ -701,10 +920,15 @@ class Game:
 
     def get_player(self, summoner_name: str, n: int) -> Player:
         """Gets a player object based on their summoner name"""
-        if summoner_name in player_objects and \
-                player_objects[summoner_name].n == n:
-            return player_objects[summoner_name]
-        guy = Player(self.api_key, summoner_name, n)
+        guy = player_objects.get(summoner_name)
+        if guy is not None and guy.n == n and guy.platform == self.platform:
+            return guy
+        if summoner_name in self.preloaded:
+            guy = self.preloaded[summoner_name]
+            if isinstance(guy, Exception):
+                raise guy
+        else:
+            guy = Player(self.api_key, summoner_name, n, self.platform)
         player_objects[summoner_name] = guy
         return guy
 
@@ -723,8 +947,21 @@ class GameAnalysis:
         """Analyzes game. Pass in a tuple gameid, summoner name
         This is pretty messy now that I look back at it...
         """
-        ret_dict = {}
         a = Game(self.api_key, game[0], game[1], n)
+        ret_dict = self.get_stats(a, game)
+        self.save_snapshot(a, game)
+        return ret_dict
+
+    def save_snapshot(self, a: Game, game: Tuple[str, str]) -> None:
+        """Keeps what a looked like, if SAVE_SNAPSHOTS. Call after
+        get_stats, so the main player's mastery is loaded."""
+        if SAVE_SNAPSHOTS:
+            get_snapshot_store().put(take_snapshot(a, game))
+
+    def get_stats(self, a: Game, game: Tuple[str, str]) -> Dict:
+        """Works out every stat for a loaded Game. game is the same
+        (gameid, summoner name) tuple analyze_game got."""
+        ret_dict = {}
         # analyze game here
         # I'M LISTING OFF A LOT OF THINGS THAT WILL GIVE US THE STATS.
         # I'LL PUT EM IN A DICTIONARY
@@ -762,7 +999,7 @@ class GameAnalysis:
             ret_dict['wr_max_a'] = max(wr_a)
         else:
             ret_dict['wr_med_a'], ret_dict['wr_min_a'], ret_dict['wr_max_a'] = \
-                None, None,
+                None, None, None
         if wr_e:
             ret_dict['wr_med_e'] = statistics.median(wr_e)
             ret_dict['wr_min_e'] = min(wr_e)
@@ -778,25 +1015,193 @@ class GameAnalysis:
         return ret_dict
 
 
-# GOOD METHODS
-def error_or_json(thing: requests.Response) -> Optional[Union[Dict, List]]:
+class VectorGameAnalysis(GameAnalysis):
+    """GameAnalysis, except the stats come out of features.py's numpy
+    engine instead of the Game.count_* loops. Same columns, same values.
     """
-    Returns none if the response code to the request was not 200, otherwise returns json from the riot games API
-    :param thing:
-    :return:
+
+    def get_stats(self, a: Game, game: Tuple[str, str]) -> Dict:
+        # numpy takes a while to import, only pay for it if we're used
+        import features
+        ret_dict = features.compute_rows([features.from_game(a, game)],
+                                         get_static_data().name_to_info)[0]
+        if ret_dict is None:
+            raise ValueError(f'a player in {game[0]} has no SR games')
+        return ret_dict
+
+
+class AsyncGameAnalysis(GameAnalysis):
+    """GameAnalysis, except the summoner, league and match requests for all
+    ten players go out at the same time instead of one after another.
+    The RiotClient's rate limits still decide how fast they actually leave,
+    so a game takes as long as the rate budget says, not the sum of every
+    request's latency. The stats are worked out the exact same way.
+
+    The blocking client calls run on get_executor()'s thread pool, which
+    every AsyncGameAnalysis shares, so making one per game is fine.
     """
-    if not thing.ok:
-        print('Resource not found, code {code}'
-              .format(code=thing.status_code))
-        return None
-    return thing.json()
+
+    def __init__(self, api_key: str) -> None:
+        super().__init__(api_key)
+        self.client = get_client(api_key)
+        self.executor = get_executor()
+
+    def analyze_game(self, game: Tuple[str, str], n: int) -> Dict:
+        import asyncio
+        return asyncio.run(self.analyze_game_async(game, n))
+
+    async def analyze_game_async(self, game: Tuple[str, str], n: int) -> Dict:
+        """analyze_game, but awaitable so a few games can share a loop."""
+        import asyncio
+        game_data = await self._call(self.client.match, game[0])
+        platform = platform_of(game[0]) or self.client.platform
+        players = {}
+        if game_data is not None:
+            main_name = game[1].replace(' ', '')
+            names = [man['summonerName'].replace(' ', '')
+                     for man in game_data['info']['participants']]
+            # bad players make Game give up before loading anyone, and
+            # player_objects already has the ones we've seen
+            to_load = [x for x in names if x not in bad_players and
+                       (getattr(player_objects.get(x), 'n', None),
+                        getattr(player_objects.get(x), 'platform', None))
+                       != (n, platform)]
+            loaded = await asyncio.gather(
+                *(self.load_player(x, n, x == main_name, platform)
+                  for x in to_load),
+                return_exceptions=True)
+            players = dict(zip(to_load, loaded))
+        a = Game(self.api_key, game[0], game[1], n, game_data, players)
+        ret_dict = self.get_stats(a, game)
+        self.save_snapshot(a, game)
+        return ret_dict
+
+    async def load_player(self, name: str, n: int, main: bool,
+                          platform: Optional[str] = None) -> Player:
+        """Same requests as Player.__init__, with league, match ids (and
+        mastery for the main player) sent together once we have the ids.
+        Match details go out a batch at a time, whatever
+        Player.plan_matches says to get next, so we download the same
+        games Player.get_match_infos would."""
+        import asyncio
+        platform = platform or self.client.platform
+        sum_info = await self._call(self.client.summoner_by_name, name,
+                                    platform)
+        if sum_info is None:
+            raise YouAreDumbOrSomethingError(f'Summoner info not found for '
+                                             f'{name}')
+        jobs = [self._call(self.client.league_entries, sum_info['id'],
+                           platform),
+                self._call(self.client.recent_match_ids, sum_info['puuid'],
+                           1, 20, region_for(platform))]
+        if main:
+            jobs.append(self._call(self.client.mastery_points,
+                                   sum_info['id'], platform))
+        results = await asyncio.gather(*jobs)
+        guy = Player.from_data(self.api_key, name, n, sum_info, results[0],
+                               results[2] if main else None, platform)
+        game_ids = results[1]
+        if game_ids is None:
+            # Player.__init__ can't unpack the None either, Game turns both
+            # into a BadPlayerError
+            raise YouAreDumbOrSomethingError(f'Match ids not found for {name}')
+        fetched = []
+        while True:
+            batch = await self._call(guy.plan_matches, sum_info['puuid'],
+                                     game_ids, fetched)
+            if not batch:
+                break
+            jsons = await asyncio.gather(
+                *(self._call(self.client.match, gameid) for gameid in batch))
+            guy.match_requests += len(batch)
+            fetched.extend(zip(batch, jsons))
+        guy.match_info, guy.match_info_all = guy.sort_matches(fetched)
+        if guy.sr_stats is None or guy.ranked_info is None:
+            print("Warning, match info OR ranked info was not found.")
+        return guy
+
+    async def _call(self, func, *args):
+        """Runs a blocking client call on our thread pool."""
+        import asyncio
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args)
+
+
+# GOOD METHODS
+def get_client(api_key: Union[str, Sequence[str]]) -> RiotClient:
+    """Gets the RiotClient for this api key, making it the first time.
+    api_key can also be a list of keys (from the same app), and the
+    client spreads its requests over all of them."""
+    if not isinstance(api_key, str) and len(api_key) == 1:
+        api_key = api_key[0]
+    key = api_key if isinstance(api_key, str) else tuple(api_key)
+    if key not in clients:
+        clients[key] = RiotClient(api_key, host=API_HOST,
+                                  match_cache=get_match_cache(),
+                                  lookup_caches=get_lookup_caches(),
+                                  history=get_history(),
+                                  metrics=get_metrics())
+    return clients[key]
+
+
+def get_executor():
+    """A ThreadPoolExecutor of ASYNC_WORKERS threads, made the first time
+    it's needed."""
+    global executor
+    if executor is None:
+        # takes a while to import and only AsyncGameAnalysis uses it, so
+        # everybody else doesn't pay for it
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(ASYNC_WORKERS)
+    return executor
+
+
+def get_lookup_caches() -> Dict[str, TTLCache]:
+    """A TTLCache per endpoint in LOOKUP_TTLS, all kept in
+    LOOKUP_CACHE_FILE. Made the first time it's needed."""
+    global lookup_caches
+    if lookup_caches is None:
+        lookup_caches = {endpoint: TTLCache(LOOKUP_CACHE_MAX, ttl,
+                                            LOOKUP_CACHE_FILE, endpoint)
+                         for endpoint, ttl in LOOKUP_TTLS.items()}
+    return lookup_caches
+
+
+def get_history() -> MatchHistory:
+    """Opens HISTORY_FILE the first time it's needed."""
+    global history
+    if history is None:
+        history = MatchHistory(HISTORY_FILE)
+    return history
+
+
+def get_metrics() -> Metrics:
+    """Made the first time it's needed."""
+    global metrics
+    if metrics is None:
+        metrics = Metrics()
+    return metrics
+
+
+def get_match_cache() -> MatchCache:
+    """Opens MATCH_CACHE_FILE the first time it's needed."""
+    global match_cache
+    if match_cache is None:
+        match_cache = MatchCache(MATCH_CACHE_FILE)
+    return match_cache
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """Opens SNAPSHOT_FILE the first time it's needed."""
+    global snapshot_store
+    if snapshot_store is None:
+        snapshot_store = SnapshotStore(SNAPSHOT_FILE)
+    return snapshot_store
 
 
 def get_champ_info() -> Dict:
     # TODO REMEMBER TO CHANGE VERSION NUMBER
-    a = requests.get('http://ddragon.leagueoflegends.com/cd'
-                     'n/' + VERSION + '/data/en_US/champion.json')
-    return a.json()
+    return get_static_data().get_file('champion.json')
 
 
 def load_config(config_file) -> Dict:
@@ -0,0 +1,115 @@
+"""Keeps every match-v5 JSON we download on disk, so we never download it
+again. A finished match never changes, so the match id is all the key we
+need, and the same game shows up for every teammate that played it.
+
+What's kept is the whole response riot sent (put_raw), not whatever part
+of it we read today, so new columns can still come out of it later.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+
+class MatchCache:
+    """Match JSONs in a SQLite file, zlib compressed, keyed by match id.
+
+    ===== Public Attributes =====
+    path: the SQLite file
+    max_bytes: once the compressed matches add up to more than this, the
+        least recently used ones get deleted
+    hits: number of get calls that found the match
+    misses: number of get calls that didn't
+    evictions: number of matches deleted to stay under max_bytes
+    """
+
+    def __init__(self, path: str, max_bytes: int = 2 * 1024 ** 3) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # the async loader calls us from a bunch of threads
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS matches ('
+                         'match_id TEXT PRIMARY KEY, data BLOB, '
+                         'size INTEGER, last_used REAL)')
+        self._db.commit()
+        self.total_bytes = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM matches').fetchone()[0]
+
+    def __contains__(self, match_id: str) -> bool:
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM matches WHERE match_id = ?',
+                                    (match_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+
+    def get(self, match_id: str) -> Optional[Dict]:
+        """The match JSON, or None if we don't have it."""
+        data = self.get_raw(match_id)
+        return None if data is None else json.loads(data)
+
+    def get_raw(self, match_id: str) -> Optional[bytes]:
+        """The match JSON still encoded, or None if we don't have it."""
+        with self._lock:
+            row = self._db.execute('SELECT data FROM matches WHERE match_id = ?',
+                                   (match_id,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute('UPDATE matches SET last_used = ? '
+                             'WHERE match_id = ?', (time.time(), match_id))
+            self._db.commit()
+        return zlib.decompress(row[0])
+
+    def put(self, match_id: str, game: Dict) -> None:
+        self.put_raw(match_id, json.dumps(game, separators=(',', ':'))
+                     .encode())
+
+    def put_raw(self, match_id: str, data: bytes) -> None:
+        """Keeps data, a match JSON exactly as riot sent it."""
+        data = zlib.compress(data)
+        with self._lock:
+            old = self._db.execute('SELECT size FROM matches WHERE match_id = ?',
+                                   (match_id,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?)',
+                             (match_id, data, len(data), time.time()))
+            self.total_bytes += len(data) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        """Deletes least recently used matches until we're at 90% of
+        max_bytes, so we aren't evicting on every single put.
+        Precondition: self._lock is held."""
+        target = self.max_bytes * 0.9
+        rows = self._db.execute('SELECT match_id, size FROM matches '
+                                'ORDER BY last_used')
+        doomed = []
+        for match_id, size in rows:
+            if self.total_bytes <= target:
+                break
+            doomed.append((match_id,))
+            self.total_bytes -= size
+        rows.close()
+        self._db.executemany('DELETE FROM matches WHERE match_id = ?', doomed)
+        self.evictions += len(doomed)
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'bytes': self.total_bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,35 @@
+from matchcache import MatchCache
+
+GAME = {'metadata': {'matchId': 'NA1_1', 'participants': ['a', 'b']},
+        'info': {'gameMode': 'CLASSIC', 'gameCreation': 1}}
+
+
+def test_hit_and_miss(tmp_path):
+    cache = MatchCache(str(tmp_path / 'matches.sqlite'))
+    assert cache.get('NA1_1') is None
+    cache.put('NA1_1', GAME)
+    assert cache.get('NA1_1') == GAME
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_survives_reopening(tmp_path):
+    path = str(tmp_path / 'matches.sqlite')
+    cache = MatchCache(path)
+    cache.put('NA1_1', GAME)
+    cache.close()
+    cache = MatchCache(path)
+    assert 'NA1_1' in cache
+    assert cache.total_bytes > 0
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = MatchCache(str(tmp_path / 'matches.sqlite'))
+    cache.put('NA1_1', GAME)
+    cache.max_bytes = cache.total_bytes * 2.5
+    cache.put('NA1_2', GAME)
+    cache.get('NA1_1')
+    cache.put('NA1_3', GAME)
+    assert 'NA1_2' not in cache
+    assert 'NA1_1' in cache and 'NA1_3' in cache
+    assert cache.evictions == 1
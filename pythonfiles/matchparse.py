@@ -0,0 +1,89 @@
+"""Turns a match-v5 response into just the parts of it we use.
+
+A match JSON is mostly challenges, perks, pings and a hundred other
+per-participant stats nobody here reads. parse_match keeps the fields in
+INFO_FIELDS and PARTICIPANT_FIELDS (and metadata), in the same shape riot
+sends them, so everything that reads match JSONs works on the slim ones
+too. They're what RiotClient.match hands out, the match cache keeps the
+whole response.
+
+If ijson is installed with its C backend (pip install ijson), the
+response is streamed and nothing else is ever built. Otherwise it's
+parsed whole (with orjson if that's installed) and slimmed right after.
+"""
+import json
+from typing import Dict
+
+try:
+    import ijson
+    # the pure python backend is a lot slower than json.loads
+    if ijson.backend not in ('yajl2_c', 'yajl2_cffi'):
+        ijson = None
+except ImportError:
+    ijson = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+INFO_FIELDS = ('gameMode', 'gameCreation', 'gameDuration', 'gameVersion',
+               'queueId')
+PARTICIPANT_FIELDS = ('puuid', 'summonerName', 'summonerId', 'teamId',
+                      'championName', 'kills', 'deaths', 'assists', 'win',
+                      'timePlayed', 'totalTimeSpentDead')
+PARSER = 'ijson' if ijson is not None else \
+    'orjson' if orjson is not None else 'json'
+
+
+def slim_match(game: Dict) -> Dict:
+    """game with only metadata, INFO_FIELDS and the participants'
+    PARTICIPANT_FIELDS left. Slimming a slim game changes nothing."""
+    metadata = game.get('metadata', {})
+    info = game.get('info', {})
+    ret_dict = {'metadata': {'matchId': metadata.get('matchId'),
+                             'participants': metadata.get('participants',
+                                                          [])},
+                'info': {field: info[field] for field in INFO_FIELDS
+                         if field in info}}
+    ret_dict['info']['participants'] = [
+        {field: man[field] for field in PARTICIPANT_FIELDS if field in man}
+        for man in info.get('participants', [])]
+    return ret_dict
+
+
+def _stream_match(data: bytes) -> Dict:
+    """slim_match(json.loads(data)), but only building what it keeps."""
+    metadata = {'matchId': None, 'participants': []}
+    info = {'participants': []}
+    man = None
+    for prefix, event, value in ijson.parse(data):
+        if prefix == 'info.participants.item':
+            if event == 'start_map':
+                man = {}
+            elif event == 'end_map':
+                info['participants'].append(man)
+            continue
+        if event in ('start_map', 'end_map', 'start_array', 'end_array',
+                     'map_key'):
+            continue
+        if prefix.startswith('info.participants.item.'):
+            field = prefix[len('info.participants.item.'):]
+            if field in PARTICIPANT_FIELDS:
+                man[field] = value
+        elif prefix.startswith('info.'):
+            if prefix[len('info.'):] in INFO_FIELDS:
+                info[prefix[len('info.'):]] = value
+        elif prefix == 'metadata.participants.item':
+            metadata['participants'].append(value)
+        elif prefix == 'metadata.matchId':
+            metadata['matchId'] = value
+    # ijson gives decimals for floats, match-v5 only has ints where we look
+    return {'metadata': metadata, 'info': info}
+
+
+def parse_match(data: bytes) -> Dict:
+    """The slim match out of a match-v5 response body."""
+    if ijson is not None:
+        return _stream_match(data)
+    return slim_match(orjson.loads(data) if orjson is not None
+                      else json.loads(data))
@@ -0,0 +1,71 @@
+import json
+
+import matchparse
+from matchparse import parse_match, slim_match
+
+GAME = {'metadata': {'dataVersion': '2', 'matchId': 'NA1_1',
+                     'participants': ['p1', 'p2']},
+        'info': {'gameMode': 'CLASSIC', 'gameCreation': 1622, 'queueId': 420,
+                 'gameVersion': '11.11.377.1', 'mapId': 11,
+                 'teams': [{'teamId': 100, 'win': True,
+                            'bans': [{'championId': 1}]}],
+                 'participants': [
+                     {'puuid': 'p1', 'summonerName': 'A', 'teamId': 100,
+                      'championName': 'Brand', 'kills': 3, 'deaths': 1,
+                      'assists': 7, 'win': True, 'timePlayed': 1800,
+                      'totalTimeSpentDead': 60, 'goldEarned': 9000,
+                      'challenges': {'kda': 10.0, 'teamDamagePercentage': 0.3},
+                      'perks': {'styles': [{'selections': [{'perk': 8112}]}]}},
+                     {'puuid': 'p2', 'summonerName': 'B', 'teamId': 200,
+                      'championName': 'Lux', 'kills': 0, 'deaths': 5,
+                      'assists': 1, 'win': False, 'timePlayed': 1800,
+                      'totalTimeSpentDead': 200, 'challenges': {}}]}}
+SLIM = {'metadata': {'matchId': 'NA1_1', 'participants': ['p1', 'p2']},
+        'info': {'gameMode': 'CLASSIC', 'gameCreation': 1622, 'queueId': 420,
+                 'gameVersion': '11.11.377.1', 'participants': [
+                     {'puuid': 'p1', 'summonerName': 'A', 'teamId': 100,
+                      'championName': 'Brand', 'kills': 3, 'deaths': 1,
+                      'assists': 7, 'win': True, 'timePlayed': 1800,
+                      'totalTimeSpentDead': 60},
+                     {'puuid': 'p2', 'summonerName': 'B', 'teamId': 200,
+                      'championName': 'Lux', 'kills': 0, 'deaths': 5,
+                      'assists': 1, 'win': False, 'timePlayed': 1800,
+                      'totalTimeSpentDead': 200}]}}
+
+
+def events(value, prefix=''):
+    """What ijson.parse yields for value."""
+    if isinstance(value, dict):
+        yield prefix, 'start_map', None
+        for key, item in value.items():
+            yield prefix, 'map_key', key
+            yield from events(item, f'{prefix}.{key}' if prefix else key)
+        yield prefix, 'end_map', None
+    elif isinstance(value, list):
+        yield prefix, 'start_array', None
+        for item in value:
+            yield from events(item, f'{prefix}.item' if prefix else 'item')
+        yield prefix, 'end_array', None
+    else:
+        yield prefix, 'number' if isinstance(value, (int, float)) and \
+            not isinstance(value, bool) else 'string', value
+
+
+class FakeIjson:
+    @staticmethod
+    def parse(data):
+        return events(json.loads(data))
+
+
+def test_slim_match():
+    assert slim_match(GAME) == SLIM
+    assert slim_match(SLIM) == SLIM
+
+
+def test_parse_match():
+    assert parse_match(json.dumps(GAME).encode()) == SLIM
+
+
+def test_streamed_like_slimmed(monkeypatch):
+    monkeypatch.setattr(matchparse, 'ijson', FakeIjson)
+    assert parse_match(json.dumps(GAME).encode()) == SLIM
@@ -0,0 +1,50 @@
+"""One player's line out of one match-v5 JSON.
+
+A Player's metrics (kda, wins, time dead, champions, breaks, game modes)
+only ever look at their own participant entry, so each match is parsed
+into a MatchStats once and everything reads from that instead of finding
+the player in the JSON again for every metric.
+"""
+import sys
+from typing import Dict, List, NamedTuple, Optional
+
+
+class MatchStats(NamedTuple):
+    """Everything Player and Game use from one of a player's matches."""
+    match_id: str
+    kills: int
+    deaths: int
+    assists: int
+    win: bool
+    time_played: int
+    time_spent_dead: int
+    champion: str
+    game_creation: int
+    game_mode: str
+
+    def kda_ratio(self) -> float:
+        """(kills + assists) / deaths, deaths counted as at least 1."""
+        return (self.kills + self.assists) / max(self.deaths, 1)
+
+
+def player_stats(game: Dict, puuid: str) -> MatchStats:
+    """The MatchStats of puuid in game. Raises ValueError if they weren't
+    in it."""
+    index = game['metadata']['participants'].index(puuid)
+    info = game['info']
+    me = info['participants'][index]
+    # a couple hundred distinct champions and modes, one copy of each
+    # instead of one per game
+    return MatchStats(game['metadata'].get('matchId'), me['kills'],
+                      me['deaths'], me['assists'], me['win'],
+                      me['timePlayed'], me['totalTimeSpentDead'],
+                      sys.intern(me['championName']), info['gameCreation'],
+                      sys.intern(info['gameMode']))
+
+
+def all_player_stats(games: Optional[List[Dict]],
+                     puuid: str) -> Optional[List[MatchStats]]:
+    """player_stats for every game, None stays None."""
+    if games is None:
+        return None
+    return [player_stats(game, puuid) for game in games]
@@ -0,0 +1,37 @@
+import pytest
+
+from matchstats import MatchStats, all_player_stats, player_stats
+
+GAME = {'metadata': {'matchId': 'NA1_1', 'participants': ['p1', 'p2']},
+        'info': {'gameMode': 'CLASSIC', 'gameCreation': 1622,
+                 'participants': [
+                     {'puuid': 'p1', 'championName': 'Brand', 'kills': 3,
+                      'deaths': 0, 'assists': 7, 'win': True,
+                      'timePlayed': 1800, 'totalTimeSpentDead': 0},
+                     {'puuid': 'p2', 'championName': 'Lux', 'kills': 0,
+                      'deaths': 5, 'assists': 1, 'win': False,
+                      'timePlayed': 1800, 'totalTimeSpentDead': 200}]}}
+
+
+def test_player_stats():
+    assert player_stats(GAME, 'p2') == MatchStats(
+        'NA1_1', 0, 5, 1, False, 1800, 200, 'Lux', 1622, 'CLASSIC')
+    # no deaths counts as one
+    assert player_stats(GAME, 'p1').kda_ratio() == 10
+
+
+def test_not_in_game():
+    with pytest.raises(ValueError):
+        player_stats(GAME, 'p3')
+
+
+def test_modes_are_interned():
+    other = {'metadata': dict(GAME['metadata']),
+             'info': dict(GAME['info'], gameMode=''.join(['CLA', 'SSIC']))}
+    first, second = all_player_stats([GAME, other], 'p1')
+    assert first.game_mode is second.game_mode
+
+
+def test_none_stays_none():
+    assert all_player_stats(None, 'p1') is None
+    assert all_player_stats([], 'p1') == []
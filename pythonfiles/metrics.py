@@ -0,0 +1,196 @@
+"""Counts what every request to riot cost us, per endpoint: how long it
+took, how long we waited on the rate limiter for it, 429s and 5xxs, bytes
+downloaded, and requests the caches saved.
+
+RiotClient fills one of these in (main.get_metrics() is shared by every
+client), run.report_metrics() prints it and adds it to METRICS_FILE.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+METRICS_FILE = 'res/metrics.jsonl'
+# upper bounds (ms) of the latency buckets, the last one is everything over
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Counts of values per bucket, plus their sum. Quantiles come out as
+    the upper bound of the bucket they fall in, which is plenty to tell
+    50ms from 500ms.
+
+    ===== Public Attributes =====
+    bounds: the buckets' upper bounds
+    counts: how many values fell in each bucket, one more than bounds
+    total: sum of every value
+    """
+
+    def __init__(self, bounds=BUCKETS_MS) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket the q quantile is in (inf for the
+        last one), None if there's nothing in it."""
+        n = self.count()
+        if n == 0:
+            return None
+        rank = q * n
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[i] if i < len(self.bounds) \
+                    else float('inf')
+        return float('inf')
+
+    def to_dict(self) -> Dict:
+        return {'bounds': list(self.bounds), 'counts': list(self.counts),
+                'total': self.total}
+
+
+class EndpointStats:
+    """Everything counted for one endpoint (RiotClient's method names,
+    like 'match-v5.match').
+
+    ===== Public Attributes =====
+    requests: responses we got back, retries included
+    statuses: status code: how many responses had it
+    errors: requests that didn't get a response at all (timeouts...)
+    latency: Histogram of ms per request
+    wait: seconds spent waiting on the rate limiter
+    bytes: response body bytes downloaded
+    cache_hits: calls answered by a cache without a request
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.statuses = {}
+        self.errors = 0
+        self.latency = Histogram()
+        self.wait = 0.0
+        self.bytes = 0
+        self.cache_hits = 0
+
+    def count_status(self, low: int, high: int) -> int:
+        return sum(count for status, count in self.statuses.items()
+                   if low <= status < high)
+
+    def to_dict(self) -> Dict:
+        return {'requests': self.requests,
+                'statuses': {str(status): count
+                             for status, count in self.statuses.items()},
+                'errors': self.errors, 'latency_ms': self.latency.to_dict(),
+                'wait_s': self.wait, 'bytes': self.bytes,
+                'cache_hits': self.cache_hits}
+
+
+class Metrics:
+    """EndpointStats for every endpoint, safe to fill in from several
+    threads.
+
+    ===== Public Attributes =====
+    started: when counting started (time.time())
+    """
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _get(self, endpoint: str) -> EndpointStats:
+        """Precondition: self._lock is held."""
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = EndpointStats()
+        return self._endpoints[endpoint]
+
+    def request(self, endpoint: str, status: int, seconds: float,
+                nbytes: int) -> None:
+        """One response came back."""
+        with self._lock:
+            stats = self._get(endpoint)
+            stats.requests += 1
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.latency.add(seconds * 1000)
+            stats.bytes += nbytes
+
+    def error(self, endpoint: str) -> None:
+        """One request raised instead of getting a response."""
+        with self._lock:
+            self._get(endpoint).errors += 1
+
+    def waited(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self._get(endpoint).wait += seconds
+
+    def cache_hit(self, endpoint: str) -> None:
+        with self._lock:
+            self._get(endpoint).cache_hits += 1
+
+    def endpoints(self) -> Dict[str, EndpointStats]:
+        with self._lock:
+            return dict(self._endpoints)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {'started': self.started, 'ended': time.time(),
+                    'endpoints': {endpoint: stats.to_dict() for endpoint,
+                                  stats in self._endpoints.items()}}
+
+    def write(self, path: str = METRICS_FILE, **extra) -> None:
+        """Adds a line with everything (and extra) to path."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        line = self.to_dict()
+        line.update(extra)
+        with open(path, 'a') as f:
+            f.write(json.dumps(line) + '\n')
+
+    def summary(self) -> List[str]:
+        """A line per endpoint and one for the total, for printing."""
+        ret_lst = [f'{"endpoint":<34}{"reqs":>7}{"p50ms":>8}{"p95ms":>8}'
+                   f'{"429":>6}{"5xx":>6}{"err":>5}{"wait s":>9}'
+                   f'{"req s":>9}{"hits":>7}{"MB":>8}']
+        total = EndpointStats()
+        for endpoint, stats in sorted(self.endpoints().items()):
+            ret_lst.append(_summary_line(endpoint, stats))
+            total.requests += stats.requests
+            for status, count in stats.statuses.items():
+                total.statuses[status] = total.statuses.get(status, 0) + count
+            total.errors += stats.errors
+            total.latency.counts = [a + b for a, b in zip(
+                total.latency.counts, stats.latency.counts)]
+            total.latency.total += stats.latency.total
+            total.wait += stats.wait
+            total.bytes += stats.bytes
+            total.cache_hits += stats.cache_hits
+        ret_lst.append(_summary_line('total', total))
+        ret_lst.append(f'{time.time() - self.started:.1f}s since we started '
+                       f'counting, {total.latency.total / 1000:.1f}s of it '
+                       f'waiting on responses and {total.wait:.1f}s on the '
+                       f'rate limiter')
+        return ret_lst
+
+
+def _summary_line(endpoint: str, stats: EndpointStats) -> str:
+    def ms(q: float) -> str:
+        value = stats.latency.quantile(q)
+        return '-' if value is None else \
+            ('>' + str(stats.latency.bounds[-1]) if value == float('inf')
+             else str(value))
+    return (f'{endpoint:<34}{stats.requests:>7}{ms(0.5):>8}{ms(0.95):>8}'
+            f'{stats.statuses.get(429, 0):>6}{stats.count_status(500, 600):>6}'
+            f'{stats.errors:>5}{stats.wait:>9.1f}'
+            f'{stats.latency.total / 1000:>9.1f}{stats.cache_hits:>7}'
+            f'{stats.bytes / 1024 ** 2:>8.2f}')
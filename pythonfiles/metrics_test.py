@@ -0,0 +1,36 @@
+import json
+
+from metrics import Histogram, Metrics
+
+
+def test_histogram_quantiles():
+    histogram = Histogram((10, 100))
+    assert histogram.quantile(0.5) is None
+    for value in [1, 2, 3, 50, 5000]:
+        histogram.add(value)
+    assert histogram.counts == [3, 1, 1]
+    assert histogram.quantile(0.5) == 10
+    assert histogram.quantile(0.8) == 100
+    assert histogram.quantile(0.95) == float('inf')
+
+
+def test_write_and_summary(tmp_path):
+    metrics = Metrics()
+    metrics.request('match-v5.by-id', 200, 0.04, 2048)
+    metrics.request('match-v5.by-id', 503, 0.3, 0)
+    metrics.waited('match-v5.by-id', 1.5)
+    metrics.cache_hit('match-v5.by-id')
+    metrics.error('league-v4.by-summoner')
+    path = str(tmp_path / 'metrics.jsonl')
+    metrics.write(path, run='test')
+    metrics.write(path)
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 2 and lines[0]['run'] == 'test'
+    match = lines[0]['endpoints']['match-v5.by-id']
+    assert match['statuses'] == {'200': 1, '503': 1}
+    assert match['wait_s'] == 1.5 and match['cache_hits'] == 1
+    summary = metrics.summary()
+    # header, 2 endpoints, total, wall time
+    assert len(summary) == 5
+    assert summary[3].split()[:4] == ['total', '2', '50', '500']
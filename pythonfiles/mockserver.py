@@ -0,0 +1,375 @@
+"""A stand-in for api.riotgames.com and ddragon that runs on localhost,
+answering from recorded responses, so the fetching code can be timed (and
+tested) without a key, a network or riot's mood.
+
+Record the real responses once, by doing whatever you want to replay with
+a RecordingClient in main.clients:
+
+    fixtures = Fixtures('res/fixtures.sqlite')
+    record(fixtures, api_key)
+    main.Game(api_key, 'NA1_3918716287', 'HeyYouNotYouYou1', 7)
+
+then serve them and point main at the server:
+
+    with MockRiotServer(fixtures, latency=0.05, inject_429=0.01) as server:
+        server.install()
+        main.Game('anything', 'NA1_3918716287', 'HeyYouNotYouYou1', 7)
+
+Responses are keyed by routing value, path and query (the api key isn't
+part of it). Anything that wasn't recorded is a 404, like riot.
+
+The server sends X-App-Rate-Limit/X-Method-Rate-Limit headers with counts
+and enforces them like riot does (every api key counted on its own), and
+can add latency and random 429s.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+import main
+from riotclient import RateLimit, RiotClient
+from staticdata import StaticData
+
+FIXTURES_FILE = 'res/fixtures.sqlite'
+# routing value ddragon files are kept under
+DDRAGON_ROUTING = 'ddragon'
+DDRAGON_PATH = '/cdn/{version}/data/en_US/{name}'
+# path pattern: the method name RiotClient uses for it
+METHODS = [
+    (re.compile(r'/lol/summoner/v4/summoners/by-name/'),
+     'summoner-v4.by-name'),
+    (re.compile(r'/lol/league/v4/entries/by-summoner/'),
+     'league-v4.by-summoner'),
+    (re.compile(r'/lol/champion-mastery/v4/champion-masteries/by-summoner/'),
+     'champion-mastery-v4.by-summoner'),
+    (re.compile(r'/lol/match/v5/matches/by-puuid/[^/]+/ids'),
+     'match-v5.ids-by-puuid'),
+    (re.compile(r'/lol/match/v5/matches/'), 'match-v5.by-id'),
+]
+NOT_FOUND = json.dumps({'status': {'message': 'Data not found',
+                                   'status_code': 404}}).encode()
+
+
+def fixture_key(routing: str, path: str,
+                params: Optional[Dict] = None) -> str:
+    """routing + path + the query, sorted, so the same request always has
+    the same key."""
+    query = urlencode(sorted((str(k), str(v))
+                             for k, v in (params or {}).items()))
+    return routing + path + ('?' + query if query else '')
+
+
+def method_name(path: str) -> str:
+    """The RiotClient method name for path, the path itself if it isn't
+    one of METHODS."""
+    for pattern, name in METHODS:
+        if pattern.match(path):
+            return name
+    return path
+
+
+class Fixtures:
+    """Recorded responses in a SQLite file, zlib compressed.
+
+    ===== Public Attributes =====
+    path: the SQLite file
+    """
+
+    def __init__(self, path: str = FIXTURES_FILE) -> None:
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                         'key TEXT PRIMARY KEY, status INTEGER, data BLOB)')
+        self._db.commit()
+
+    def put(self, routing: str, path: str, params: Optional[Dict],
+            status: int, body: bytes) -> None:
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES '
+                             '(?, ?, ?)',
+                             (fixture_key(routing, path, params), status,
+                              zlib.compress(body)))
+            self._db.commit()
+
+    def put_json(self, routing: str, path: str, params: Optional[Dict],
+                 body, status: int = 200) -> None:
+        self.put(routing, path, params, status,
+                 json.dumps(body, separators=(',', ':')).encode())
+
+    def get(self, key: str) -> Optional[Tuple[int, bytes]]:
+        """(status, body) recorded for key (see fixture_key), None if
+        there's nothing."""
+        with self._lock:
+            row = self._db.execute('SELECT status, data FROM responses '
+                                   'WHERE key = ?', (key,)).fetchone()
+        return None if row is None else (row[0], zlib.decompress(row[1]))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class RecordingClient(RiotClient):
+    """A RiotClient that puts every final response it gets into fixtures.
+    """
+
+    def __init__(self, api_key: str, fixtures: Fixtures, **kwargs) -> None:
+        super().__init__(api_key, **kwargs)
+        self.fixtures = fixtures
+
+    def get(self, routing: str, path: str, method: str,
+            params: Optional[Dict] = None) -> requests.Response:
+        response = super().get(routing, path, method, params)
+        if response.status_code not in (429, 500, 502, 503, 504):
+            self.fixtures.put(routing, path, params, response.status_code,
+                              response.content)
+        return response
+
+
+class RecordingStaticData(StaticData):
+    """StaticData that puts every file it downloads into fixtures."""
+
+    def __init__(self, version: str, fixtures: Fixtures) -> None:
+        super().__init__(version, None)
+        self.fixtures = fixtures
+
+    def get_file(self, name: str = 'champion.json') -> Dict:
+        downloaded = name not in self._files
+        ret = super().get_file(name)
+        if downloaded:
+            self.fixtures.put_json(DDRAGON_ROUTING, DDRAGON_PATH.format(
+                version=self.version, name=name), None, ret)
+        return ret
+
+
+def record(fixtures: Fixtures, api_key: str) -> RecordingClient:
+    """Makes main record everything it downloads with api_key from now on.
+    The caches are left out, so everything really gets downloaded (and
+    recorded)."""
+    client = RecordingClient(api_key, fixtures, metrics=main.get_metrics())
+    main.clients[api_key] = client
+    main.static_data = RecordingStaticData(main.VERSION, fixtures)
+    return client
+
+
+class MockRiotServer:
+    """Serves fixtures on localhost:port (a free one if it's 0) from a
+    background thread. Paths are /<routing value><riot path>, so a
+    RiotClient with host=server.host talks to it like it's riot.
+
+    ===== Public Attributes =====
+    fixtures: where the responses come from
+    latency: seconds every response is held back
+    jitter: up to this many more seconds, at random
+    app_limits: X-App-Rate-Limit to send and enforce, per api key and
+        routing value
+    method_limits: method name: X-Method-Rate-Limit, per api key and
+        routing value
+    inject_429: chance of a 429 on any request, on top of real ones
+    retry_after: Retry-After on the injected 429s, None to leave it out
+        (like a 429 from riot's underlying services)
+    requests: method name: requests served, 429s included
+    key_requests: api key: requests served, 429s included
+    sent_429: number of 429s sent (injected or not)
+    """
+
+    def __init__(self, fixtures: Fixtures, port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0,
+                 app_limits: Optional[str] = '20:1,100:120',
+                 method_limits: Optional[Dict[str, str]] = None,
+                 inject_429: float = 0.0,
+                 retry_after: Optional[float] = 1,
+                 seed: Optional[int] = None) -> None:
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.app_limits = app_limits
+        self.method_limits = method_limits or {}
+        self.inject_429 = inject_429
+        self.retry_after = retry_after
+        self.requests = {}
+        self.key_requests = {}
+        self.sent_429 = 0
+        self._random = random.Random(seed)
+        # (key, routing): RateLimit, (key, routing, method): RateLimit
+        self._app = {}
+        self._method = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port),
+                                           self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def host(self) -> str:
+        """What to give RiotClient as host."""
+        return f'http://127.0.0.1:{self.port}/{{routing}}'
+
+    @property
+    def ddragon_url(self) -> str:
+        """What to give StaticData as url."""
+        return f'http://127.0.0.1:{self.port}/{DDRAGON_ROUTING}' + \
+            DDRAGON_PATH
+
+    def start(self) -> 'MockRiotServer':
+        if self._thread is None:
+            # shutdown() waits for a poll, don't make it wait long
+            self._thread = threading.Thread(target=self._server.serve_forever,
+                                            args=(0.05,), daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'MockRiotServer':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def install(self) -> None:
+        """Points main at this server: new clients (main.clients is
+        emptied) and ddragon downloads go here."""
+        main.API_HOST = self.host
+        main.DDRAGON_URL = self.ddragon_url
+        main.clients.clear()
+        main.static_data = None
+
+    def respond(self, routing: str, path: str, query: str,
+                api_key: str = '') -> Tuple[int, Dict[str, str], bytes]:
+        """(status, headers, body) for a request."""
+        method = method_name(path)
+        key = fixture_key(routing, path, dict(parse_qsl(query)))
+        delay = self.latency + self._random.random() * self.jitter
+        if delay:
+            time.sleep(delay)
+        if routing == DDRAGON_ROUTING:
+            found = self.fixtures.get(key)
+            return (404, {}, NOT_FOUND) if found is None \
+                else (found[0], {}, found[1])
+        headers = {}
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            self.key_requests[api_key] = \
+                self.key_requests.get(api_key, 0) + 1
+            now = time.monotonic()
+            limits = []
+            if self.app_limits is not None:
+                limits.append(('application', 'X-App-Rate-Limit',
+                               self._limit(self._app, (api_key, routing),
+                                           self.app_limits)))
+            if method in self.method_limits:
+                limits.append(('method', 'X-Method-Rate-Limit',
+                               self._limit(self._method,
+                                           (api_key, routing, method),
+                                           self.method_limits[method])))
+            over = None
+            for kind, header, limit in limits:
+                wait = limit.wait_time(now)
+                if wait > 0 and over is None:
+                    over = kind, wait
+            if over is None:
+                for kind, header, limit in limits:
+                    limit.take(now)
+            for kind, header, limit in limits:
+                headers[header] = limit.spec
+                headers[header + '-Count'] = ','.join(
+                    f'{len(bucket.spent)}:{per}'
+                    for per, bucket in limit.buckets.items())
+            injected = over is None and self.inject_429 and \
+                self._random.random() < self.inject_429
+            if over is not None or injected:
+                self.sent_429 += 1
+        if over is not None:
+            headers['Retry-After'] = str(max(1, round(over[1])))
+            headers['X-Rate-Limit-Type'] = over[0]
+            return 429, headers, b''
+        if injected:
+            if self.retry_after is not None:
+                headers['Retry-After'] = str(self.retry_after)
+                headers['X-Rate-Limit-Type'] = 'method'
+            return 429, headers, b''
+        found = self.fixtures.get(key)
+        if found is None:
+            return 404, headers, NOT_FOUND
+        return found[0], headers, found[1]
+
+    @staticmethod
+    def _limit(limits: Dict, key, spec: str) -> RateLimit:
+        """Precondition: self._lock is held."""
+        if key not in limits:
+            limits[key] = RateLimit(spec)
+        return limits[key]
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body go out in two writes, without this every
+            # response waits out a delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                routing, _, path = url.path.lstrip('/').partition('/')
+                status, headers, body = server.respond(
+                    routing, '/' + path, url.query,
+                    self.headers.get('X-Riot-Token', ''))
+                self.send_response(status)
+                headers['Content-Type'] = 'application/json;charset=utf-8'
+                headers['Content-Length'] = str(len(body))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('fixtures', nargs='?', default=FIXTURES_FILE)
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--app-limits', default='20:1,100:120')
+    parser.add_argument('--inject-429', type=float, default=0.0)
+    cmd = parser.parse_args()
+    mock = MockRiotServer(Fixtures(cmd.fixtures), cmd.port, cmd.latency,
+                          cmd.jitter, cmd.app_limits,
+                          inject_429=cmd.inject_429)
+    print(f'[mockserver] serving {len(mock.fixtures)} responses on '
+          f'{mock.host} (ddragon: {mock.ddragon_url})')
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        mock.close()
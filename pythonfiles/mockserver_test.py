@@ -0,0 +1,77 @@
+import pytest
+import requests
+
+from metrics import Metrics
+from mockserver import Fixtures, MockRiotServer, RecordingClient, \
+    fixture_key, method_name
+from riotclient import RiotClient, RiotTransientError
+
+
+def fixtures(tmp_path, name='fixtures.sqlite'):
+    store = Fixtures(str(tmp_path / name))
+    store.put_json('na1', '/lol/summoner/v4/summoners/by-name/TL%20DaBaby',
+                   None, {'id': 'sid', 'puuid': 'pid'})
+    store.put_json('americas', '/lol/match/v5/matches/by-puuid/pid/ids',
+                   {'start': 1, 'count': 2}, ['NA1_2', 'NA1_1'])
+    return store
+
+
+def test_keys_and_methods():
+    assert fixture_key('na1', '/a', {'count': 2, 'start': 1}) == \
+        fixture_key('na1', '/a', {'start': '1', 'count': '2'}) == \
+        'na1/a?count=2&start=1'
+    assert method_name('/lol/match/v5/matches/by-puuid/x/ids') == \
+        'match-v5.ids-by-puuid'
+    assert method_name('/lol/match/v5/matches/NA1_1') == 'match-v5.by-id'
+
+
+def test_serves_fixtures(tmp_path):
+    with MockRiotServer(fixtures(tmp_path)) as server:
+        client = RiotClient('key', host=server.host)
+        assert client.summoner_by_name('TL DaBaby') == {'id': 'sid',
+                                                         'puuid': 'pid'}
+        assert client.match_ids('pid', 1, 2) == ['NA1_2', 'NA1_1']
+        assert client.match_ids('pid', 0, 2) is None
+        assert client.match('NA1_404') is None
+        assert server.requests == {'summoner-v4.by-name': 1,
+                                   'match-v5.ids-by-puuid': 2,
+                                   'match-v5.by-id': 1}
+
+
+def test_rate_limits_and_injected_429s(tmp_path):
+    store = fixtures(tmp_path)
+    url = '/na1/lol/summoner/v4/summoners/by-name/TL%20DaBaby'
+    with MockRiotServer(store, app_limits='2:10') as server:
+        base = f'http://127.0.0.1:{server.port}'
+        first = requests.get(base + url)
+        assert first.headers['X-App-Rate-Limit'] == '2:10'
+        assert first.headers['X-App-Rate-Limit-Count'] == '1:10'
+        assert requests.get(base + url).status_code == 200
+        over = requests.get(base + url)
+        assert over.status_code == 429
+        assert over.headers['X-Rate-Limit-Type'] == 'application'
+        assert int(over.headers['Retry-After']) >= 1
+    with MockRiotServer(store, app_limits=None, inject_429=1.0,
+                        retry_after=0) as server:
+        client = RiotClient('key', host=server.host, max_retries=2,
+                            metrics=Metrics())
+        with pytest.raises(RiotTransientError):
+            client.summoner_by_name('TL DaBaby')
+        assert server.sent_429 == 3
+        stats = client.metrics.endpoints()['summoner-v4.by-name']
+        assert stats.statuses == {429: 3}
+
+
+def test_record_then_replay(tmp_path):
+    with MockRiotServer(fixtures(tmp_path), app_limits=None) as riot:
+        recorded = Fixtures(str(tmp_path / 'recorded.sqlite'))
+        client = RecordingClient('key', recorded, host=riot.host)
+        client.summoner_by_name('TL DaBaby')
+        client.match_ids('pid', 1, 2)
+        client.match('NA1_404')
+    assert len(recorded) == 3
+    with MockRiotServer(recorded, app_limits=None) as replay:
+        client = RiotClient('key', host=replay.host)
+        assert client.summoner_by_name('TL DaBaby')['puuid'] == 'pid'
+        assert client.match_ids('pid', 1, 2) == ['NA1_2', 'NA1_1']
+        assert client.match('NA1_404') is None
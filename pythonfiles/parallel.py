@@ -0,0 +1,156 @@
+"""run.run, but spread over a bunch of processes.
+
+The (gameid, player) list is split into one shard per worker process, and
+every worker gets one of the api keys (each key has its own rate limits,
+so more keys = more games a minute). Workers send their rows to a single
+writer process, so data.csv only ever has one process appending to it.
+
+Ctrl+C stops handing out games; the games already being analyzed finish
+and get written before everything exits.
+
+    python parallel.py
+"""
+import multiprocessing
+import queue
+import signal
+from typing import Dict, List, Optional, Tuple
+
+import main
+import run
+from dedup import SEEN_FILE, SeenIndex
+
+COUNTS = ('recorded', 'YouAreDumbOrSomethingError', 'BadPlayerError',
+          'other')
+
+
+def worker(api_key: str, games: List[Tuple[str, str]], n: int,
+           analysis_class: type, rows: multiprocessing.Queue,
+           results: multiprocessing.Queue, stop) -> None:
+    """Analyzes games one after another, putting each row on rows, and
+    finally its error counts on results. Checks stop between games."""
+    # the parent deals with Ctrl+C, we just notice stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    counts = dict.fromkeys(COUNTS, 0)
+    for game in games:
+        if stop.is_set():
+            break
+        try:
+            dic = analysis_class(api_key).analyze_game(game, n)
+            rows.put(run.dict_to_list(dic))
+            counts['recorded'] += 1
+        except main.YouAreDumbOrSomethingError:
+            counts['YouAreDumbOrSomethingError'] += 1
+        except main.BadPlayerError:
+            counts['BadPlayerError'] += 1
+        except Exception as e:
+            counts['other'] += 1
+            print(f'[parallel.worker] Something went wrong on {game}: {e!r}')
+    results.put(counts)
+
+
+def writer(rows: multiprocessing.Queue, stop) -> None:
+    """Writes every row that comes in to run's data sink until it gets a
+    None."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # our own connection, not one inherited from the parent
+    seen = SeenIndex(SEEN_FILE, run.SEEN_TABLE)
+    try:
+        sink = run.make_data_sink(lambda done: seen.add_many(
+            row[0] for row in done))
+    except PermissionError:
+        print("bruh close the csv what's wrong with you")
+        stop.set()
+        return
+    with sink:
+        while True:
+            row = rows.get()
+            if row is None:
+                break
+            sink.write(row)
+
+
+def run_parallel(game_list: List[Tuple[str, str]],
+                 api_keys: Optional[List[str]] = None, n: int = 5,
+                 workers_per_key: int = 1,
+                 analysis_class: type = main.GameAnalysis) -> Dict[str, int]:
+    """Runs the entire thing over len(api_keys) * workers_per_key processes.
+    game_list is a list of (gameid, player) tuples, games already in
+    data.csv (or listed twice) are skipped like in run.run.
+    Returns the recorded/error counts added up over every worker, and
+    'died': how many workers died without finishing. If one does, the rest
+    are stopped like with Ctrl+C.
+
+    More than one worker per key works, but they each think they have the
+    key's whole rate limit to themselves until riot's headers say otherwise.
+    """
+    api_keys = api_keys if api_keys is not None else run.get_api_keys()
+    seen = run.get_seen()
+    queued = set()
+    to_run = []
+    for game in game_list:
+        if game[0] not in seen and game[0] not in queued:
+            queued.add(game[0])
+            to_run.append(game)
+    print(f'about to check {len(to_run)} games, '
+          f'skipped {len(game_list) - len(to_run)} already seen')
+
+    keys = [key for key in api_keys for _ in range(workers_per_key)]
+    rows = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    write_proc = multiprocessing.Process(target=writer, args=(rows, stop))
+    write_proc.start()
+    procs = []
+    for i, key in enumerate(keys):
+        proc = multiprocessing.Process(
+            target=worker, args=(key, to_run[i::len(keys)], n,
+                                 analysis_class, rows, results, stop))
+        proc.start()
+        procs.append(proc)
+
+    totals = dict.fromkeys(COUNTS, 0)
+    totals['died'] = 0
+    finished = 0
+    while finished + totals['died'] < len(procs):
+        try:
+            counts = results.get(timeout=1)
+        except KeyboardInterrupt:
+            print('[parallel] stopping, letting the games in progress finish')
+            stop.set()
+            continue
+        except queue.Empty:
+            # a worker that puts its counts exits with 0 right after, so
+            # anything else never will (killed, out of memory...)
+            died = sum(1 for proc in procs
+                       if proc.exitcode not in (None, 0))
+            if died > totals['died']:
+                print(f'[parallel] {died} worker(s) died, stopping, their '
+                      f'games are left for next time')
+                stop.set()
+                totals['died'] = died
+            continue
+        for name in COUNTS:
+            totals[name] += counts[name]
+        finished += 1
+    for proc in procs:
+        proc.join()
+    rows.put(None)
+    write_proc.join()
+
+    print(f'Entered {len(game_list)} games, recorded {totals["recorded"]}.')
+    print(f'Random errors: {totals["other"]}')
+    print(f'Loading YouAreDumbOrSomethingError: '
+          f'{totals["YouAreDumbOrSomethingError"]}')
+    print(f'Bad Player Errors: {totals["BadPlayerError"]}')
+    if totals['died']:
+        print(f'Workers that died: {totals["died"]}')
+    return totals
+
+
+if __name__ == '__main__':
+    import pandas as pd
+    a = pd.read_csv('games2.csv')
+    to_run = [(str(row['gameid']), str(row['player']))
+              for index, row in a.iterrows()]
+    print(f'Loaded {len(to_run)} games')
+    run_parallel(to_run)
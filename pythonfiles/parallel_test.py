@@ -0,0 +1,62 @@
+"""parallel.run_parallel has to write the same rows as one GameAnalysis
+after another, against a made up world served by mockserver."""
+import contextlib
+import csv
+import io
+import os
+
+import main
+import parallel
+import run
+from dedup import SeenIndex
+from sink import RowSink
+
+
+def rows(path):
+    with open(path, newline='') as f:
+        return sorted(list(csv.reader(f))[1:])
+
+
+def test_parallel_matches_classic(mock_world, fresh_main, monkeypatch,
+                                  tmp_path):
+    games = mock_world.games(6)
+    fresh_main('classic')
+    with RowSink(str(tmp_path / 'classic.csv'), run.VARIABLES) as sink, \
+            contextlib.redirect_stdout(io.StringIO()):
+        for game in games:
+            try:
+                sink.write(run.dict_to_list(
+                    main.GameAnalysis('key').analyze_game(game, 5)))
+            except Exception:
+                pass
+    fresh_main('parallel')
+    monkeypatch.setattr(parallel, 'SEEN_FILE', run.SEEN_FILE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        totals = parallel.run_parallel(games, ['key1', 'key2'])
+    classic = rows(tmp_path / 'classic.csv')
+    assert len(classic) >= 4
+    assert totals['recorded'] == len(classic)
+    assert rows(run.DATA_CSV) == classic
+    # the writer marked them seen, so they're skipped next time
+    seen = SeenIndex(run.SEEN_FILE, run.SEEN_TABLE)
+    assert all(row[0] in seen for row in classic)
+
+
+class DyingAnalysis(main.GameAnalysis):
+    """key1's worker dies on its first game like it got killed."""
+
+    def analyze_game(self, game, n):
+        if self.api_key == 'key1':
+            os._exit(1)
+        return super().analyze_game(game, n)
+
+
+def test_dead_worker_stops_the_run(mock_world, fresh_main, monkeypatch):
+    fresh_main('parallel')
+    monkeypatch.setattr(parallel, 'SEEN_FILE', run.SEEN_FILE)
+    with contextlib.redirect_stdout(io.StringIO()):
+        totals = parallel.run_parallel(mock_world.games(6), ['key1', 'key2'],
+                                       analysis_class=DyingAnalysis)
+    assert totals['died'] == 1
+    # key2's games that got done before stop still got written
+    assert len(rows(run.DATA_CSV)) == totals['recorded']
@@ -0,0 +1,166 @@
+"""Typed Parquet output for the dataset, instead of csv.
+
+In the csvs every value is text: booleans show up as TRUE and True,
+floats are written at full width, and pandas has to guess every column's
+type again on every read. Here every column in run.VARIABLES has a real
+type, and reading a few columns doesn't touch the rest.
+
+A dataset is a directory of part files, one per flush, since a parquet
+file can't be appended to once it's closed. pandas reads the directory as
+one table:
+
+    load('data_parquet', columns=['ally_win', 'smurf_count_a'])
+
+Needs pyarrow (pip install pyarrow). Everything else works without it.
+"""
+import csv
+import locale
+import os
+import time
+from typing import Iterable, List, Optional
+
+from sink import RowSink
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# column: type, for everything in run.VARIABLES. Columns not in here
+# (like games.csv's) are strings.
+COLUMN_TYPES = {
+    'gameid': 'str', 'player': 'str', 'champion': 'str', 'ally_win': 'bool',
+    'player_wr': 'float', 't_bint': 'float', 'is_main_h': 'bool',
+    'mastery_points': 'int', 'smurf_count_a': 'int', 'smurf_count_e': 'int',
+    'hotstreak_count_a': 'int', 'hotstreak_count_e': 'int', '4fun': 'bool',
+    'veteran_count_a': 'int', 'veteran_count_e': 'int',
+    'inters_count_a': 'int', 'inters_count_e': 'int',
+    'break_count_a': 'float', 'break_count_e': 'float',
+    'a_sum_a': 'int', 'a_sum_e': 'int', 'd_sum_a': 'int', 'd_sum_e': 'int',
+    'm_sum_a': 'int', 'm_sum_e': 'int',
+    'wr_med_a': 'float', 'wr_min_a': 'float', 'wr_max_a': 'float',
+    'wr_med_e': 'float', 'wr_min_e': 'float', 'wr_max_e': 'float',
+    'max_med_kd_a': 'float', 'max_med_kd_e': 'float',
+    '4fun_a': 'int', '4fun_e': 'int'}
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError('Parquet output needs pyarrow: pip install pyarrow')
+
+
+def get_schema(columns: List[str]):
+    require_pyarrow()
+    arrow_types = {'str': pa.string(), 'bool': pa.bool_(),
+                   'int': pa.int64(), 'float': pa.float64()}
+    return pa.schema([(column, arrow_types[COLUMN_TYPES.get(column, 'str')])
+                      for column in columns])
+
+
+def to_type(value, kind: str):
+    """One value from a csv or a ret_dict as kind. Empty is None."""
+    if value is None or value == '':
+        return None
+    if kind == 'bool':
+        if isinstance(value, str):
+            return value.strip().lower() == 'true'
+        return bool(value)
+    if kind == 'int':
+        return int(float(value))
+    if kind == 'float':
+        return float(value)
+    return str(value)
+
+
+class ParquetSink(RowSink):
+    """RowSink that writes each flush as one row group in a new part file
+    under path (a directory). Everything else, thresholds, on_flush,
+    checkpoint, works the same.
+
+    Defaults to bigger flushes and no time limit, lots of tiny part files
+    make reading slow.
+    """
+
+    def __init__(self, path: str, columns: List[str],
+                 flush_rows: int = 1000, flush_secs: Optional[float] = None,
+                 on_flush=None) -> None:
+        require_pyarrow()
+        self.schema = get_schema(columns)
+        self._parts = 0
+        super().__init__(path, columns, flush_rows, flush_secs, on_flush)
+
+    def _open(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+
+    def _write_rows(self, rows: List[List]) -> None:
+        # name sorts by time, so reading the directory keeps row order
+        name = f'part-{time.time_ns()}-{os.getpid()}-{self._parts}.parquet'
+        self._parts += 1
+        write_table(rows, self.columns, self.schema,
+                    os.path.join(self.path, name))
+
+    def _sync(self) -> None:
+        # every part file is complete and closed as soon as it's written
+        pass
+
+    def _close_file(self) -> None:
+        pass
+
+
+def write_table(rows: List[List], columns: List[str], schema,
+                path: str) -> None:
+    """rows (lists in columns order) as a single row group parquet file,
+    written to a temp name first so readers never see half a file."""
+    kinds = [COLUMN_TYPES.get(column, 'str') for column in columns]
+    arrays = {column: [to_type(row[i], kinds[i]) for row in rows]
+              for i, column in enumerate(columns)}
+    table = pa.Table.from_pydict(arrays, schema=schema)
+    pq.write_table(table, path + '.tmp', row_group_size=len(rows))
+    os.replace(path + '.tmp', path)
+
+
+def guess_encoding(csv_path: str) -> str:
+    """data.csv was written in whatever the windows locale was, not
+    UTF-8 like the games csvs. Tries UTF-8, then this machine's locale,
+    then the locale the old rows were written in."""
+    with open(csv_path, 'rb') as file:
+        raw = file.read()
+    for encoding in ['UTF-8', locale.getpreferredencoding(False), 'gbk']:
+        try:
+            raw.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            pass
+    return 'latin-1'
+
+
+def convert_csv(csv_path: str, out_dir: str, chunk_rows: int = 10000) -> int:
+    """Converts one of our csvs (data.csv, games2.csv...) into a parquet
+    dataset in out_dir, chunk_rows rows per part file. Returns how many
+    rows it converted."""
+    require_pyarrow()
+    encoding = guess_encoding(csv_path)
+    with open(csv_path, 'r', newline='', encoding=encoding) as file:
+        reader = csv.reader(file)
+        columns = next(reader)
+        with ParquetSink(out_dir, columns, flush_rows=chunk_rows) as sink:
+            total = 0
+            for row in reader:
+                sink.write(row)
+                total += 1
+    return total
+
+
+def load(path: str, columns: Optional[Iterable[str]] = None):
+    """A parquet dataset (or file) as a DataFrame, only reading columns."""
+    require_pyarrow()
+    import pandas as pd
+    return pd.read_parquet(path, columns=list(columns) if columns else None)
+
+
+if __name__ == '__main__':
+    for name in ['data', 'games', 'games2', 'games3']:
+        count = convert_csv(name + '.csv', name + '_parquet')
+        print(f'{name}.csv: converted {count} rows to {name}_parquet/')
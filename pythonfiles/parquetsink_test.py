@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip('pyarrow')
+import parquetsink  # noqa: E402
+
+COLUMNS = ['gameid', 'ally_win', 'mastery_points', 'player_wr']
+
+
+def test_types_and_appends(tmp_path):
+    path = str(tmp_path / 'data_parquet')
+    with parquetsink.ParquetSink(path, COLUMNS, flush_rows=2) as sink:
+        sink.write(['NA1_1', 'TRUE', '58294', '0.5'])
+        sink.write(['NA1_2', 'False', 62947, None])
+        sink.write_dict({'gameid': 'NA1_3', 'ally_win': True})
+    df = parquetsink.load(path)
+    assert df['gameid'].tolist() == ['NA1_1', 'NA1_2', 'NA1_3']
+    assert df['ally_win'].tolist() == [True, False, True]
+    assert df['mastery_points'].tolist()[:2] == [58294, 62947]
+    assert str(parquetsink.load(path, ['player_wr'])['player_wr'].dtype) == 'float64'
+
+
+def test_convert_csv(tmp_path):
+    csv_path = tmp_path / 'data.csv'
+    csv_path.write_bytes('gameid,player,ally_win\nNA1_1,Bénadryl,TRUE\n'
+                         .encode('gbk'))
+    out = str(tmp_path / 'out')
+    assert parquetsink.convert_csv(str(csv_path), out) == 1
+    assert parquetsink.load(out)['player'].tolist() == ['Bénadryl']
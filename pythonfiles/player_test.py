@@ -0,0 +1,116 @@
+"""main.Player's match picking, against a fake client (main_test.py needs
+a real key)."""
+import main
+
+SR = {400, 420, 440}
+# co-op vs ai, CLASSIC but not in SR_QUEUES
+BOTS = 830
+
+
+def game(gameid, queue):
+    return {'metadata': {'matchId': gameid, 'participants': ['p']},
+            'info': {'gameMode': 'CLASSIC' if queue in SR | {BOTS} else 'ARAM',
+                     'queueId': queue, 'gameCreation': 0,
+                     'participants': [{
+                         'puuid': 'p', 'summonerName': 'A', 'teamId': 100,
+                         'championName': 'Ahri', 'kills': 1, 'deaths': 1,
+                         'assists': 1, 'win': True, 'timePlayed': 1800,
+                         'totalTimeSpentDead': 10}]}}
+
+
+class FakeClient:
+    """history is (gameid, queue) newest first, the game they're in right
+    now included. newer is games played since, that only the per queue
+    lists know about yet."""
+    platform = 'na1'
+
+    def __init__(self, history, newer=()):
+        self.history = list(history)
+        self.newer = list(newer)
+        self.asked = []
+        self.downloaded = []
+
+    def recent_match_ids(self, puuid, start=0, count=20, region=None,
+                         **filters):
+        queue = filters.get('queue')
+        self.asked.append((queue, count))
+        if queue is None:
+            ids = [gameid for gameid, q in self.history]
+        else:
+            ids = [gameid for gameid, q in self.newer + self.history
+                   if q == queue]
+        return ids[start:start + count]
+
+    def match(self, gameid):
+        self.downloaded.append(gameid)
+        return game(gameid, dict(self.newer + self.history)[gameid])
+
+
+def player(monkeypatch, client, n=5):
+    monkeypatch.setattr(main, 'clients', {'fake': client})
+    guy = main.Player.from_data('fake', 'A', n, {'id': 's', 'puuid': 'p'},
+                                [])
+    guy.match_info, guy.match_info_all = guy.get_match_infos('p')
+    return guy
+
+
+def ids(stats):
+    return [s.match_id for s in stats]
+
+
+def test_sr_games_from_queue_lists(monkeypatch):
+    # 21 games, 121 is the one they're in now, so the window is 120-101.
+    # Mostly ARAM, a few SR games spread out, and one older than the
+    # window that mustn't be picked.
+    sr_games = {'NA1_113': 420, 'NA1_109': 400, 'NA1_107': 440,
+                'NA1_104': 420, 'NA1_102': 420}
+    history = [(f'NA1_{i}', sr_games.get(f'NA1_{i}', 450))
+               for i in range(121, 100, -1)] + [('NA1_99', 420)]
+    client = FakeClient(history)
+    guy = player(monkeypatch, client)
+    assert ids(guy.all_stats) == ['NA1_120', 'NA1_119', 'NA1_118',
+                                  'NA1_117', 'NA1_116']
+    assert ids(guy.sr_stats) == ['NA1_113', 'NA1_109', 'NA1_107',
+                                 'NA1_104', 'NA1_102']
+    # the first 5, then only the SR games, instead of the whole window
+    assert client.downloaded == ids(guy.all_stats) + ids(guy.sr_stats)
+    assert sorted(q for q, count in client.asked if q is not None) == \
+        sorted(main.SR_QUEUES)
+
+
+def test_mostly_sr_goes_down_the_list(monkeypatch):
+    history = [(f'NA1_{i}', 450 if i % 3 == 0 else 420)
+               for i in range(121, 100, -1)]
+    client = FakeClient(history)
+    guy = player(monkeypatch, client)
+    assert ids(guy.sr_stats) == ['NA1_119', 'NA1_118', 'NA1_116',
+                                 'NA1_115', 'NA1_113']
+    assert ids(guy.all_stats) == ['NA1_120', 'NA1_119', 'NA1_118',
+                                  'NA1_117', 'NA1_116']
+    # SR games are common enough that the queue lists aren't worth it
+    assert client.asked == [(None, 20)]
+
+
+def test_queue_lists_get_deeper(monkeypatch):
+    # 10 solo/duo games played since the window, so the first 8 of that
+    # list are all too new and it has to be asked for again, deeper
+    history = [(f'NA1_{i}', 420 if i in (110, 105) else 450)
+               for i in range(121, 100, -1)]
+    newer = [(f'NA1_{i}', 420) for i in range(140, 130, -1)]
+    client = FakeClient(history, newer)
+    guy = player(monkeypatch, client)
+    assert ids(guy.sr_stats) == ['NA1_110', 'NA1_105']
+    assert [count for q, count in client.asked if q == 420] == [10, 20]
+    # the empty ones are all there is, they aren't asked for again
+    assert [count for q, count in client.asked if q == 400] == [10]
+
+
+def test_bot_games_never_count(monkeypatch):
+    # the queue lists can't see bot games, so going down the list mustn't
+    # count them either
+    history = [(f'NA1_{i}', BOTS if i in (120, 118) else 420)
+               for i in range(121, 100, -1)]
+    guy = player(monkeypatch, FakeClient(history))
+    assert ids(guy.sr_stats) == ['NA1_119', 'NA1_117', 'NA1_116',
+                                 'NA1_115', 'NA1_114']
+    assert ids(guy.all_stats)[:2] == ['NA1_120', 'NA1_119']
@@ -1,13 +1,52 @@
-import csv
+import atexit
+import threading
 
+from dedup import SEEN_FILE, SeenIndex
+from sink import RowSink
+
+# games crawler.py finds, for jobs.run_csv
 GAME_CSV = 'games3.csv'
+# gameids already in GAME_CSV
+game_index = None
+game_sink = None
+# gameids written to game_sink that haven't reached GAME_CSV (or
+# game_index) yet
+pending = set()
+pending_lock = threading.Lock()
+
+
+def get_game_index() -> SeenIndex:
+    global game_index
+    if game_index is None:
+        game_index = SeenIndex(SEEN_FILE, 'discovered')
+        game_index.seed_from_csv(GAME_CSV)
+    return game_index
+
+
+def get_game_sink() -> RowSink:
+    global game_sink
+    if game_sink is None:
+        game_sink = RowSink(GAME_CSV, ['gameid', 'player'], encoding='UTF-8',
+                            on_flush=mark_written)
+        atexit.register(game_sink.close)
+    return game_sink
+
+
+def mark_written(rows):
+    # they're in GAME_CSV now, so they can go in the index. Marking them
+    # any earlier and a crash before the flush would lose them for good.
+    with pending_lock:
+        get_game_index().add_many(row[0] for row in rows)
+        pending.difference_update(row[0] for row in rows)
 
 
 def write_games(games):
     # games is a list of tuples for gameid, whatever
-    file = open(GAME_CSV, 'a', newline='', encoding='UTF-8')
-    writist = csv.writer(file, lineterminator='\n')
-    for row in games:
-        # row is gonna be a tuple
-        writist.writerow(list(row))
-    file.close()
+    # only the ones we've never written (or buffered) before
+    index = get_game_index()
+    with pending_lock:
+        games = [row for row in games
+                 if row[0] not in index and row[0] not in pending]
+        pending.update(row[0] for row in games)
+    if games:
+        get_game_sink().write_many(games)
@@ -0,0 +1,21 @@
+import randomclasses
+
+
+def test_games_only_count_once_flushed(monkeypatch, tmp_path):
+    monkeypatch.setattr(randomclasses, 'GAME_CSV', str(tmp_path / 'g.csv'))
+    monkeypatch.setattr(randomclasses, 'SEEN_FILE', str(tmp_path / 's.sqlite'))
+    monkeypatch.setattr(randomclasses, 'game_index', None)
+    monkeypatch.setattr(randomclasses, 'game_sink', None)
+    monkeypatch.setattr(randomclasses, 'pending', set())
+    randomclasses.write_games([('NA1_1', 'a'), ('NA1_2', 'b')])
+    randomclasses.write_games([('NA1_2', 'b')])
+    # still buffered, a crash now mustn't leave them marked
+    assert 'NA1_1' not in randomclasses.get_game_index()
+    sink = randomclasses.get_game_sink()
+    sink.flush()
+    assert 'NA1_1' in randomclasses.get_game_index()
+    randomclasses.write_games([('NA1_1', 'a'), ('NA1_3', 'c')])
+    sink.close()
+    with open(randomclasses.GAME_CSV, encoding='UTF-8') as f:
+        assert f.read().split() == ['gameid,player', 'NA1_1,a', 'NA1_2,b',
+                                    'NA1_3,c']
@@ -0,0 +1,193 @@
+"""Builds the dataset again from snapshots (see snapshots.py) and the match
+cache, without a single request. Change a threshold or add a column and
+rerun this instead of collecting everything again.
+
+    python refeaturize.py data_v2.csv --smurf-kda 5 --binter-wr 0.4
+    python refeaturize.py data_v2_parquet --processes 8
+
+Every output remembers how far through the snapshots it got, so running it
+again only does the games analyzed since. --restart starts it over (delete
+the old output first, rows get appended).
+
+New columns can be added from python, each one is a function of the
+loaded main.Game (they have to be top level functions, for the processes).
+The match cache has every match the way riot sent it and a.all_data is
+that whole JSON, so any field riot sends (teamPosition, lane...) can be
+used. A player's match_info is slimmed (see matchparse), get their other
+games whole with main.get_match_cache().get(match_id):
+
+    def lane_count(a): ...
+    refeaturize('data_v2.csv', extra={'lane_count': lane_count})
+"""
+import argparse
+import multiprocessing
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import features
+import main
+import run
+from features import Thresholds
+from riotclient import mastery_map
+from sink import RowSink
+from snapshots import SNAPSHOT_FILE, SnapshotStore
+
+# goes into the Players and Games we make, but nothing here sends requests
+OFFLINE_KEY = 'offline'
+COUNTS = ('recorded', 'missing', 'invalid', 'other')
+# per worker process, see init_worker
+store = None
+
+
+class MissingMatchError(Exception):
+    """A snapshot needs a match JSON that isn't in the match cache anymore
+    (it was evicted, or the cache was deleted)."""
+    pass
+
+
+def load_game(snapshot: Dict) -> main.Game:
+    """The main.Game a snapshot was taken of, match JSONs from the match
+    cache. Raises MissingMatchError if one of them is gone."""
+    cache = main.get_match_cache()
+    matches = {}
+
+    def get(match_id: str) -> Dict:
+        if match_id not in matches:
+            game = cache.get(match_id)
+            if game is None:
+                raise MissingMatchError(match_id)
+            matches[match_id] = game
+        return matches[match_id]
+
+    players = {}
+    for name, info in snapshot['players'].items():
+        guy = main.Player.from_snapshot(OFFLINE_KEY, name, snapshot['n'],
+                                        info, get)
+        players[guy.name] = guy
+    # no masteries back then means 0 points, not go ask for them now. The
+    # first snapshots have riot's list instead of a map, mastery_map takes
+    # either.
+    players[snapshot['player'].replace(' ', '')].mastery_points = \
+        mastery_map(snapshot['mastery']) or {}
+    return main.Game.from_data(OFFLINE_KEY, get(snapshot['gameid']),
+                               snapshot['player'], players)
+
+
+def featurize(snaps: List[Tuple[int, Dict]], columns: List[str],
+              thresholds: Thresholds = Thresholds(),
+              extra: Optional[Dict[str, Callable[[main.Game], Any]]] = None) \
+        -> Tuple[List[List], Dict[str, int]]:
+    """Rows (in columns order) for every snapshot that can still be loaded
+    and gives valid stats, and how many were recorded/missing/invalid/other.
+    """
+    counts = dict.fromkeys(COUNTS, 0)
+    games = []
+    inputs = []
+    for seq, snapshot in snaps:
+        try:
+            a = load_game(snapshot)
+            inputs.append(features.from_game(
+                a, (snapshot['gameid'], snapshot['player'])))
+            games.append(a)
+        except MissingMatchError:
+            counts['missing'] += 1
+        except Exception as e:
+            counts['other'] += 1
+            print(f'[refeaturize] Something went wrong on '
+                  f'{snapshot["gameid"]}: {e!r}')
+    ret_lst = []
+    rows = features.compute_rows(
+        inputs, main.get_static_data().name_to_info, thresholds)
+    for a, row in zip(games, rows):
+        if row is None:
+            counts['invalid'] += 1
+            continue
+        for name, func in (extra or {}).items():
+            row[name] = func(a)
+        ret_lst.append([row.get(column) for column in columns])
+        counts['recorded'] += 1
+    return ret_lst, counts
+
+
+def init_worker(snapshot_file: str) -> None:
+    """Opens this process's own connection to the snapshots."""
+    global store
+    store = SnapshotStore(snapshot_file)
+
+
+def featurize_range(job: Tuple[Tuple[int, int], List[str], Thresholds,
+                               Optional[Dict]]) \
+        -> Tuple[int, List[List], Dict[str, int]]:
+    """featurize for one of SnapshotStore.batches' ranges, in a worker.
+    Returns the range's last seq with the results."""
+    (after, last), columns, thresholds, extra = job
+    rows, counts = featurize(store.between(after, last), columns, thresholds,
+                             extra)
+    return last, rows, counts
+
+
+def make_sink(out: str, columns: List[str]) -> RowSink:
+    """A csv sink if out ends in .csv, a parquet dataset otherwise."""
+    if out.endswith('.csv'):
+        return RowSink(out, columns, flush_rows=1000, flush_secs=None)
+    from parquetsink import ParquetSink
+    return ParquetSink(out, columns)
+
+
+def refeaturize(out: str, thresholds: Thresholds = Thresholds(),
+                extra: Optional[Dict[str, Callable[[main.Game], Any]]] = None,
+                processes: Optional[int] = None, batch: int = 500,
+                restart: bool = False,
+                snapshot_file: str = SNAPSHOT_FILE) -> Dict[str, int]:
+    """Appends a row to out for every snapshot it doesn't have yet, with
+    run.VARIABLES plus the extra columns. processes defaults to one per
+    core. Returns the recorded/missing/invalid/other counts.
+
+    Progress is saved after every batch is on disk, so stopping it halfway
+    only loses the batch in progress.
+    """
+    snaps = SnapshotStore(snapshot_file)
+    key = os.path.abspath(out)
+    start = 0 if restart else snaps.progress(key)
+    jobs = snaps.batches(start, batch)
+    print(f'[refeaturize] {len(jobs)} batches of up to {batch} new snapshots')
+    columns = run.VARIABLES + list(extra or {})
+    totals = dict.fromkeys(COUNTS, 0)
+    args = [(job, columns, thresholds, extra) for job in jobs]
+    pool = None
+    if processes == 1:
+        init_worker(snapshot_file)
+        results = map(featurize_range, args)
+    else:
+        pool = multiprocessing.Pool(processes, init_worker, (snapshot_file,))
+        # imap keeps the order, so progress only ever moves forward
+        results = pool.imap(featurize_range, args)
+    try:
+        with make_sink(out, columns) as sink:
+            for last, rows, counts in results:
+                sink.write_many(rows)
+                sink.checkpoint()
+                snaps.set_progress(key, last)
+                for name in COUNTS:
+                    totals[name] += counts[name]
+    finally:
+        if pool is not None:
+            pool.terminate()
+    print(f'[refeaturize] recorded {totals["recorded"]}, match JSON missing '
+          f'{totals["missing"]}, no SR games {totals["invalid"]}, '
+          f'other errors {totals["other"]}')
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('out', help='a .csv, or a directory for parquet')
+    for field, default in Thresholds._field_defaults.items():
+        parser.add_argument('--' + field.replace('_', '-'), type=float,
+                            default=default)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--restart', action='store_true')
+    cmd = parser.parse_args()
+    refeaturize(cmd.out, Thresholds(*(getattr(cmd, field)
+                                      for field in Thresholds._fields)),
+                processes=cmd.processes, restart=cmd.restart)
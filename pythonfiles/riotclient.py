@@ -0,0 +1,478 @@
+"""Talks to the riot games API for us.
+
+One RiotClient owns a pooled requests.Session per routing value (na1,
+americas...) and waits on rate limit buckets built from the
+X-App-Rate-Limit / X-Method-Rate-Limit headers riot sends back, instead of
+sleeping a fixed amount after every request.
+
+It can have several api keys. Riot counts every key separately, so each
+one gets its own buckets and every request goes out on whichever key can
+send it soonest. The keys have to belong to the same app though: riot
+encrypts puuids and summoner ids per app, so ids one app got back mean
+nothing to another.
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from history import MatchHistory
+from matchcache import MatchCache
+from matchparse import parse_match
+from metrics import Metrics
+from ttlcache import TTLCache
+
+# What a development key gets. The headers correct this after the first
+# response, so a production key speeds up on its own.
+DEFAULT_APP_LIMITS = '20:1,100:120'
+HOST = 'https://{routing}.api.riotgames.com'
+# Status codes that are worth waiting out and trying again.
+RETRY_CODES = (429, 500, 502, 503, 504)
+# cache: the method it saves requests to, so metrics can put hits and
+# requests side by side
+CACHED_METHODS = {'summoner': 'summoner-v4.by-name',
+                  'league': 'league-v4.by-summoner',
+                  'mastery_points': 'champion-mastery-v4.by-summoner',
+                  'match': 'match-v5.by-id',
+                  'history': 'match-v5.ids-by-puuid'}
+# platform routing value: the regional one match-v5 for its games is on
+PLATFORM_TO_REGION = {'na1': 'americas', 'br1': 'americas',
+                      'la1': 'americas', 'la2': 'americas',
+                      'kr': 'asia', 'jp1': 'asia',
+                      'euw1': 'europe', 'eun1': 'europe', 'tr1': 'europe',
+                      'ru': 'europe',
+                      'oc1': 'sea', 'ph2': 'sea', 'sg2': 'sea', 'th2': 'sea',
+                      'tw2': 'sea', 'vn2': 'sea'}
+
+
+class RiotTransientError(requests.RequestException):
+    """Riot kept answering 429 or 5xx until we ran out of retries. Like a
+    timeout, it says nothing about what we asked for, so it's worth trying
+    again later instead of deciding the summoner or match is bad."""
+
+
+class TokenBucket:
+    """limit tokens, each of which comes back per seconds after it was spent.
+
+    This is how riot counts ('20 requests every 1 second'), so as long as
+    we only send when there's a token we never go over, even right at the
+    edge of one of their windows.
+    """
+
+    def __init__(self, limit: int, per: float) -> None:
+        self.limit = limit
+        self.per = per
+        self.spent = deque()
+
+    def wait_time(self, now: float) -> float:
+        """How long until a token is free. 0 if one is free right now."""
+        while self.spent and now - self.spent[0] >= self.per:
+            self.spent.popleft()
+        if len(self.spent) < self.limit:
+            return 0.0
+        return self.per - (now - self.spent[0])
+
+    def take(self, now: float) -> None:
+        self.spent.append(now)
+
+    def sync(self, count: int, now: float) -> None:
+        """Riot says count requests were made in this window. If that's more
+        than we know about (another process using the key?) assume they
+        were all just now."""
+        while len(self.spent) < min(count, self.limit):
+            self.spent.append(now)
+
+
+class RateLimit:
+    """All the buckets for one rate limit header, like '20:1,100:120'.
+    Also remembers a Retry-After if riot told us to back off."""
+
+    def __init__(self, spec: Optional[str] = None) -> None:
+        self.spec = None
+        self.buckets = {}
+        self.blocked_until = 0.0
+        if spec is not None:
+            self.update(spec)
+
+    def update(self, spec: str, counts: Optional[str] = None,
+               now: Optional[float] = None) -> None:
+        """Rebuilds the buckets if the limits changed, then syncs them with
+        the matching X-...-Rate-Limit-Count header."""
+        now = time.monotonic() if now is None else now
+        if spec != self.spec:
+            old = self.buckets
+            self.buckets = {}
+            for limit, per in parse_limits(spec):
+                bucket = TokenBucket(limit, per)
+                if per in old:
+                    bucket.spent = old[per].spent
+                self.buckets[per] = bucket
+            self.spec = spec
+        if counts:
+            for count, per in parse_limits(counts):
+                if per in self.buckets:
+                    self.buckets[per].sync(count, now)
+
+    def wait_time(self, now: float) -> float:
+        wait = self.blocked_until - now
+        for bucket in self.buckets.values():
+            wait = max(wait, bucket.wait_time(now))
+        return max(wait, 0.0)
+
+    def take(self, now: float) -> None:
+        for bucket in self.buckets.values():
+            bucket.take(now)
+
+    def block(self, seconds: float, now: float) -> None:
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RiotClient:
+    """Everything that talks to api.riotgames.com goes through here.
+
+    ===== Public Attributes =====
+    api_keys: the api keys requests are spread over
+    api_key: the first of them
+    platform: routing value for summoner/league/mastery (na1), unless a
+        call asks for another one
+    region: routing value for match-v5 (americas), unless a call asks for
+        another one. Matches go to the region their id's platform is in.
+    max_retries: how many times a 429 or 5xx gets retried
+    pool_size: connections kept open per routing value. Only matters when
+        several threads share the client (see main.AsyncGameAnalysis).
+    match_cache: a MatchCache that match() checks before asking riot, or
+        None to always ask.
+    lookup_caches: 'summoner', 'league' and/or 'mastery_points': the
+        TTLCache summoner_by_name, league_entries and mastery_points check
+        first. Missing ones always ask riot.
+    history: a MatchHistory recent_match_ids keeps up to date, or None to
+        always ask for the whole list.
+    metrics: the Metrics every request (and cache hit) gets counted in
+    slim_matches: whether match() returns matchparse's slim matches
+        instead of everything riot sent. match_cache always gets the
+        whole response.
+
+    === Useful Methods ===
+    summoner_by_name, league_entries, match_ids, match:
+        json for that endpoint, or None if riot said no. All but match
+        take a platform (or region, for match_ids) if it isn't ours.
+    recent_match_ids: match_ids, but through history.
+    mastery_points: a summoner's champion masteries as a championId:
+        points dict.
+    cache_stats: hits/misses of every cache, aka requests we didn't send.
+    get: a raw rate limited GET, if you need an endpoint not listed above.
+    """
+
+    def __init__(self, api_key: Union[str, Sequence[str]],
+                 platform: str = 'na1', region: Optional[str] = None,
+                 host: str = HOST,
+                 max_retries: int = 3, timeout: float = 10,
+                 pool_size: int = 32,
+                 match_cache: Optional[MatchCache] = None,
+                 lookup_caches: Optional[Dict[str, TTLCache]] = None,
+                 history: Optional[MatchHistory] = None,
+                 metrics: Optional[Metrics] = None,
+                 slim_matches: bool = True) -> None:
+        self.api_keys = [api_key] if isinstance(api_key, str) \
+            else list(api_key)
+        self.api_key = self.api_keys[0]
+        self.platform = platform
+        self.region = region if region is not None else region_for(platform)
+        self.host = host
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.match_cache = match_cache
+        self.lookup_caches = lookup_caches if lookup_caches is not None \
+            else {}
+        self.history = history
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.slim_matches = slim_matches
+        self._sessions = {}
+        # (key, routing): RateLimit, (key, routing, method): RateLimit
+        self._app_limits = {}
+        self._method_limits = {}
+        # which key to try first next time, so they take turns
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    # ENDPOINTS
+    def summoner_by_name(self, name: str,
+                         platform: Optional[str] = None) -> Optional[Dict]:
+        platform = platform or self.platform
+        return self._cached(
+            'summoner', self._cache_key(name, platform, self.platform),
+            lambda: error_or_json(self.get(
+                platform, '/lol/summoner/v4/summoners/by-name/' + quote(name),
+                'summoner-v4.by-name')))
+
+    def league_entries(self, summoner_id: str,
+                       platform: Optional[str] = None) -> Optional[List]:
+        platform = platform or self.platform
+        return self._cached(
+            'league', self._cache_key(summoner_id, platform, self.platform),
+            lambda: error_or_json(self.get(
+                platform, '/lol/league/v4/entries/by-summoner/' + summoner_id,
+                'league-v4.by-summoner')))
+
+    def mastery_points(self, summoner_id: str,
+                       platform: Optional[str] = None) \
+            -> Optional[Dict[int, int]]:
+        """championId: championPoints for every champion summoner_id has
+        played. One request per summoner (while it's cached), however many
+        champions get looked up."""
+        platform = platform or self.platform
+        return mastery_map(self._cached(
+            'mastery_points',
+            self._cache_key(summoner_id, platform, self.platform),
+            lambda: mastery_map(error_or_json(self.get(
+                platform, '/lol/champion-mastery/v4/champion-masteries'
+                          '/by-summoner/' + summoner_id,
+                'champion-mastery-v4.by-summoner')))))
+
+    def match_ids(self, puuid: str, start: int = 0, count: int = 20,
+                  region: Optional[str] = None,
+                  **filters) -> Optional[List[str]]:
+        """filters are passed straight through (queue, type, startTime...)"""
+        params = {'start': start, 'count': count}
+        params.update(filters)
+        return error_or_json(self.get(
+            region or self.region,
+            '/lol/match/v5/matches/by-puuid/' + puuid + '/ids',
+            'match-v5.ids-by-puuid', params))
+
+    def recent_match_ids(self, puuid: str, start: int = 0, count: int = 20,
+                         region: Optional[str] = None,
+                         **filters) -> Optional[List[str]]:
+        """match_ids(puuid, start, count, region, **filters), except the
+        list comes from history, which only asks riot for games played
+        since last time. Every combination of filters gets its own list."""
+        if self.history is None:
+            return self.match_ids(puuid, start, count, region, **filters)
+
+        def fetch(first: int, how_many: int,
+                  start_time: Optional[int]) -> Optional[List[str]]:
+            params = dict(filters)
+            if start_time is not None:
+                params['startTime'] = start_time
+            return self.match_ids(puuid, first, how_many, region, **params)
+
+        key = self._cache_key(puuid, region or self.region, self.region) + \
+            ''.join(f'&{name}={filters[name]}' for name in sorted(filters))
+        requests_before = self.history.requests
+        ids = self.history.sync(key, fetch, start + count)
+        if self.history.requests == requests_before:
+            self.metrics.cache_hit(CACHED_METHODS['history'])
+        return None if ids is None else ids[start:start + count]
+
+    def match(self, match_id: str) -> Optional[Dict]:
+        if self.match_cache is not None:
+            data = self.match_cache.get_raw(match_id)
+            if data is not None:
+                self.metrics.cache_hit(CACHED_METHODS['match'])
+                return parse_match(data) if self.slim_matches \
+                    else json.loads(data)
+        platform = platform_of(match_id)
+        region = self.region if platform is None \
+            else PLATFORM_TO_REGION[platform]
+        response = self.get(region, '/lol/match/v5/matches/' + match_id,
+                            'match-v5.by-id')
+        if not response.ok:
+            return error_or_json(response)
+        if self.match_cache is not None:
+            self.match_cache.put_raw(match_id, response.content)
+        return parse_match(response.content) if self.slim_matches \
+            else response.json()
+
+    def cache_stats(self) -> Dict[str, Dict]:
+        ret_dict = {endpoint: cache.stats()
+                    for endpoint, cache in self.lookup_caches.items()}
+        if self.match_cache is not None:
+            ret_dict['match'] = self.match_cache.stats()
+        if self.history is not None:
+            ret_dict['history'] = self.history.stats()
+        return ret_dict
+
+    @staticmethod
+    def _cache_key(key: str, routing: str, default: str) -> str:
+        """key, with routing in front if it isn't the default one. Names
+        are only unique per platform, and everything cached before there
+        were other platforms is keyed without one."""
+        return key if routing == default else f'{routing}:{key}'
+
+    def _cached(self, endpoint: str, key: str, fetch):
+        """fetch() unless lookup_caches[endpoint] already has key.
+        Errors (None) aren't cached, they might go away."""
+        cache = self.lookup_caches.get(endpoint)
+        if cache is not None:
+            value = cache.get(key)
+            if value is not None:
+                self.metrics.cache_hit(CACHED_METHODS[endpoint])
+                return value
+        value = fetch()
+        if value is not None and cache is not None:
+            cache.put(key, value)
+        return value
+
+    # THE ACTUAL REQUESTING
+    def get(self, routing: str, path: str, method: str,
+            params: Optional[Dict] = None) -> requests.Response:
+        """GETs path on the routing host once the app and method limits for
+        it allow. 429s and 5xxs are retried, honouring Retry-After, and
+        raise a RiotTransientError once max_retries runs out.
+        method is just a name for the endpoint so it gets its own limits.
+        Each attempt goes out on whichever key has room first.
+        """
+        url = self.host.format(routing=routing) + path
+        session = self._session(routing)
+        response = None
+        for attempt in range(self.max_retries + 1):
+            key, waited = self._acquire(routing, method)
+            self.metrics.waited(method, waited)
+            sent = time.perf_counter()
+            try:
+                response = session.get(
+                    url, params=params, timeout=self.timeout,
+                    headers={'X-Riot-Token': key})
+            except requests.RequestException:
+                self.metrics.error(method)
+                raise
+            self.metrics.request(method, response.status_code,
+                                 time.perf_counter() - sent,
+                                 len(response.content))
+            self._update_limits(key, routing, method, response.headers)
+            if response.status_code not in RETRY_CODES \
+                    or attempt == self.max_retries:
+                break
+            self._back_off(key, routing, method, response, attempt)
+        if response.status_code in RETRY_CODES:
+            raise RiotTransientError(
+                f'{method} still got {response.status_code} after '
+                f'{self.max_retries} retries', response=response)
+        return response
+
+    def _session(self, routing: str) -> requests.Session:
+        with self._lock:
+            if routing not in self._sessions:
+                session = requests.Session()
+                session.mount('https://', HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.pool_size))
+                self._sessions[routing] = session
+            return self._sessions[routing]
+
+    def _limits(self, key: str, routing: str,
+                method: str) -> List[RateLimit]:
+        """Precondition: self._lock is held."""
+        if (key, routing) not in self._app_limits:
+            self._app_limits[(key, routing)] = RateLimit(DEFAULT_APP_LIMITS)
+        if (key, routing, method) not in self._method_limits:
+            self._method_limits[(key, routing, method)] = RateLimit()
+        return [self._app_limits[(key, routing)],
+                self._method_limits[(key, routing, method)]]
+
+    def _acquire(self, routing: str, method: str) -> Tuple[str, float]:
+        """Blocks until some key has a token in both its app and method
+        limit, and takes them. Keys take turns going first, so they all
+        get used even when none of them is near its limits. Returns the
+        key and how many seconds the wait took."""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = None
+                for i in range(len(self.api_keys)):
+                    turn = (self._next_key + i) % len(self.api_keys)
+                    key = self.api_keys[turn]
+                    limits = self._limits(key, routing, method)
+                    key_wait = max(limit.wait_time(now) for limit in limits)
+                    if key_wait <= 0:
+                        for limit in limits:
+                            limit.take(now)
+                        self._next_key = turn + 1
+                        return key, now - started
+                    wait = key_wait if wait is None else min(wait, key_wait)
+            time.sleep(wait)
+
+    def _update_limits(self, key: str, routing: str, method: str,
+                       headers) -> None:
+        with self._lock:
+            app, meth = self._limits(key, routing, method)
+            if 'X-App-Rate-Limit' in headers:
+                app.update(headers['X-App-Rate-Limit'],
+                           headers.get('X-App-Rate-Limit-Count'))
+            if 'X-Method-Rate-Limit' in headers:
+                meth.update(headers['X-Method-Rate-Limit'],
+                            headers.get('X-Method-Rate-Limit-Count'))
+
+    def _back_off(self, key: str, routing: str, method: str,
+                  response: requests.Response, attempt: int) -> None:
+        """Blocks whichever limit of key riot says we hit, for as long as it
+        says. The other keys can keep going.
+        With no Retry-After (5xx, or 429 from the underlying service) we
+        just back off exponentially on this method."""
+        retry_after = response.headers.get('Retry-After')
+        wait = float(retry_after) if retry_after else 2 ** attempt
+        print(f'[RiotClient] got {response.status_code} on {method}, '
+              f'waiting {wait}s')
+        with self._lock:
+            app, meth = self._limits(key, routing, method)
+            if response.headers.get('X-Rate-Limit-Type') == 'application':
+                app.block(wait, time.monotonic())
+            else:
+                meth.block(wait, time.monotonic())
+
+
+def region_for(platform: str) -> str:
+    """The regional routing value for a platform one, like euw1 -> europe.
+    Raises ValueError for platforms we don't know."""
+    try:
+        return PLATFORM_TO_REGION[platform.lower()]
+    except KeyError:
+        raise ValueError(f'unknown platform {platform}') from None
+
+
+def platform_of(match_id: str) -> Optional[str]:
+    """The platform a match id is from: EUW1_5213 -> euw1. None if it
+    doesn't start with one we know."""
+    platform = match_id.split('_', 1)[0].lower()
+    return platform if platform in PLATFORM_TO_REGION else None
+
+
+def parse_limits(spec: str) -> List[tuple]:
+    """'20:1,100:120' -> [(20, 1), (100, 120)]"""
+    ret_lst = []
+    for part in spec.split(','):
+        if ':' in part:
+            a, b = part.split(':')
+            ret_lst.append((int(a), int(b)))
+    return ret_lst
+
+
+def error_or_json(thing: requests.Response) -> Optional[Union[Dict, List]]:
+    """
+    Returns none if the response code to the request was not 200, otherwise returns json from the riot games API
+    :param thing:
+    :return:
+    """
+    if not thing.ok:
+        print('Resource not found, code {code}'
+              .format(code=thing.status_code))
+        return None
+    return thing.json()
+
+
+def mastery_map(masteries: Union[List, Dict, None]) \
+        -> Optional[Dict[int, int]]:
+    """championId: championPoints out of a champion-mastery-v4 list. Also
+    takes one of these maps that's been through JSON (so its keys turned
+    into strings) and fixes the keys. None stays None."""
+    if masteries is None:
+        return None
+    if isinstance(masteries, dict):
+        return {int(champ_id): points for champ_id, points in masteries.items()}
+    return {a['championId']: a['championPoints'] for a in masteries}
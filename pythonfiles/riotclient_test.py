@@ -0,0 +1,171 @@
+import json
+import time
+
+import riotclient
+from matchcache import MatchCache
+from ttlcache import TTLCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.ok = status_code == 200
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+    @property
+    def content(self):
+        return json.dumps(self.body).encode()
+
+
+class FakeSession:
+    """Hands out the responses it was given, in order, and keeps the urls."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.urls = []
+
+    def get(self, url, params=None, timeout=None, headers=None):
+        self.urls.append(url)
+        return self.responses.pop(0)
+
+
+def test_parse_limits():
+    assert riotclient.parse_limits('20:1,100:120') == [(20, 1), (100, 120)]
+
+
+def test_bucket_waits_for_oldest_token():
+    bucket = riotclient.TokenBucket(2, 10)
+    bucket.take(0)
+    bucket.take(1)
+    assert bucket.wait_time(5) == 5
+    assert bucket.wait_time(10) == 0
+
+
+def test_rate_limit_syncs_counts():
+    limit = riotclient.RateLimit('20:1,100:120')
+    limit.update('20:1,100:120', '1:1,100:120', now=0)
+    # 100 of 100 used according to riot, so wait out the 2 minute window.
+    assert limit.wait_time(1) == 119
+
+
+def test_retry_after_429():
+    client = riotclient.RiotClient('key', max_retries=1)
+    headers = {'Retry-After': '0', 'X-Rate-Limit-Type': 'method'}
+    client._sessions['na1'] = FakeSession(
+        [FakeResponse(429, headers=headers), FakeResponse(200, {'id': 'a'})])
+    assert client.summoner_by_name('TL DaBaby') == {'id': 'a'}
+    assert client._sessions['na1'].urls[0] == \
+        'https://na1.api.riotgames.com/lol/summoner/v4/summoners/by-name/TL%20DaBaby'
+
+
+def test_method_limit_from_headers():
+    client = riotclient.RiotClient('key')
+    headers = {'X-App-Rate-Limit': '20:1,100:120',
+               'X-Method-Rate-Limit': '1:10',
+               'X-Method-Rate-Limit-Count': '1:10'}
+    client._sessions['americas'] = FakeSession(
+        [FakeResponse(200, {'info': {}}, headers)])
+    client.match('NA1_1')
+    meth = client._method_limits[('key', 'americas', 'match-v5.by-id')]
+    assert meth.wait_time(meth.buckets[10].spent[0]) == 10
+
+
+def test_mastery_points_one_request(tmp_path):
+    path = str(tmp_path / 'lookups.sqlite')
+    cache = TTLCache(path=path, table='mastery_points')
+    client = riotclient.RiotClient(
+        'key', lookup_caches={'mastery_points': cache})
+    client._sessions['na1'] = FakeSession([FakeResponse(200, [
+        {'championId': 103, 'championPoints': 5000},
+        {'championId': 1, 'championPoints': 20}])])
+    assert client.mastery_points('sid') == {103: 5000, 1: 20}
+    assert client.mastery_points('sid')[103] == 5000
+    assert len(client._sessions['na1'].urls) == 1
+    # from the file the keys come back as strings, they still work
+    client.lookup_caches['mastery_points'] = TTLCache(
+        path=path, table='mastery_points')
+    assert client.mastery_points('sid') == {103: 5000, 1: 20}
+
+
+def test_metrics_count_retries_and_hits():
+    client = riotclient.RiotClient(
+        'key', max_retries=1, lookup_caches={'summoner': TTLCache()})
+    headers = {'Retry-After': '0', 'X-Rate-Limit-Type': 'method'}
+    client._sessions['na1'] = FakeSession(
+        [FakeResponse(429, headers=headers), FakeResponse(200, {'id': 'a'})])
+    client.summoner_by_name('a')
+    client.summoner_by_name('a')
+    stats = client.metrics.endpoints()['summoner-v4.by-name']
+    assert stats.requests == 2
+    assert stats.statuses == {429: 1, 200: 1}
+    assert stats.cache_hits == 1
+    assert stats.bytes == len(b'null') + len(b'{"id": "a"}')
+    assert stats.latency.count() == 2
+
+
+class KeySession(FakeSession):
+    """Answers everything with body, and keeps the key each request used."""
+
+    def __init__(self, body):
+        super().__init__([])
+        self.body = body
+        self.keys = []
+
+    def get(self, url, params=None, timeout=None, headers=None):
+        self.urls.append(url)
+        self.keys.append(headers['X-Riot-Token'])
+        return FakeResponse(200, self.body)
+
+
+def test_keys_take_turns_with_their_own_limits():
+    client = riotclient.RiotClient(['a', 'b'])
+    client._sessions['na1'] = KeySession({'id': 'x'})
+    for name in ('1', '2', '3', '4'):
+        client.summoner_by_name(name)
+    assert client._sessions['na1'].keys == ['a', 'b', 'a', 'b']
+    # a is out of tokens, so everything goes on b until it is too
+    client._app_limits[('a', 'na1')].block(60, time.monotonic())
+    client.summoner_by_name('5')
+    assert client._sessions['na1'].keys[-1] == 'b'
+    assert len(client._app_limits[('b', 'na1')].buckets[1].spent) == 3
+
+
+def test_routing_follows_platform():
+    assert riotclient.region_for('EUW1') == 'europe'
+    assert riotclient.platform_of('KR_5213') == 'kr'
+    assert riotclient.platform_of('5213') is None
+    client = riotclient.RiotClient('key', platform='euw1',
+                                   lookup_caches={'summoner': TTLCache()})
+    assert client.region == 'europe'
+    for routing in ('euw1', 'kr', 'asia', 'europe'):
+        client._sessions[routing] = KeySession({'id': routing})
+    client.summoner_by_name('a')
+    client.summoner_by_name('a', 'kr')
+    client.match_ids('pid', region='asia')
+    client.match('KR_1')
+    client.match('1')
+    assert [len(client._sessions[routing].urls)
+            for routing in ('euw1', 'kr', 'asia', 'europe')] == [1, 1, 2, 1]
+    # same name on another platform is someone else
+    assert client.summoner_by_name('a', 'kr') == {'id': 'kr'}
+    assert client.summoner_by_name('a') == {'id': 'euw1'}
+
+
+def test_match_cache_keeps_whole_response(tmp_path):
+    cache = MatchCache(str(tmp_path / 'matches.sqlite'))
+    client = riotclient.RiotClient('key', match_cache=cache)
+    game = {'metadata': {'matchId': 'NA1_1', 'participants': ['p']},
+            'info': {'gameMode': 'CLASSIC', 'participants': [
+                {'puuid': 'p', 'kills': 1, 'teamPosition': 'TOP'}]}}
+    client._sessions['americas'] = FakeSession([FakeResponse(200, game)])
+    assert 'teamPosition' not in \
+        client.match('NA1_1')['info']['participants'][0]
+    assert cache.get('NA1_1') == game
+    # and the hit is slimmed the same way
+    assert client.match('NA1_1')['info']['participants'] == \
+        [{'puuid': 'p', 'kills': 1}]
+    assert len(client._sessions['americas'].urls) == 1
@@ -1,12 +1,12 @@
 import main
-import csv
-import pandas as pd
+import atexit
+from typing import Dict, List
 
-# ALREADY RUN
-# TODO literally read the csv file and get the gameid column...
-df = pd.read_csv('data.csv')
-SEEN = df['gameid'].tolist()
-# continue this later
+from dedup import SEEN_FILE, SeenIndex
+from sink import RowSink
+
+# Nothing in here reads a file until it's needed, so importing run is free.
+# pandas is imported where it's used for the same reason, it's slow.
 
 VARIABLES = ['gameid', 'player', 'champion', 'ally_win', 'player_wr', 't_bint', 'is_main_h', 'mastery_points',
              'smurf_count_a', 'smurf_count_e', 'hotstreak_count_a', 'hotstreak_count_e', '4fun', 'veteran_count_a',
@@ -14,8 +14,68 @@ VARIABLES = ['gameid', 'player', 'champion', 'ally_win', 'player_wr', 't_bint',
              'a_sum_e', 'd_sum_a', 'd_sum_e', 'm_sum_a', 'm_sum_e', 'wr_med_a', 'wr_min_a', 'wr_max_a', 'wr_med_e',
              'wr_min_e', 'wr_max_e', 'max_med_kd_a', 'max_med_kd_e', '4fun_a', '4fun_e']
 
-cfg = main.load_config('res/config.json')
-API_KEY = cfg['api_key']
+CONFIG_FILE = 'res/config.json'
+config = None
+DATA_CSV = 'data.csv'
+# 'csv' appends to DATA_CSV, 'parquet' writes typed part files to
+# DATA_PARQUET (needs pyarrow, see parquetsink)
+OUTPUT_FORMAT = 'csv'
+DATA_PARQUET = 'data_parquet'
+data_sink = None
+# ALREADY RUN
+SEEN_TABLE = 'analyzed'
+seen_games = None
+
+
+def get_config() -> Dict:
+    """CONFIG_FILE, read the first time it's needed."""
+    global config
+    if config is None:
+        config = main.load_config(CONFIG_FILE)
+    return config
+
+
+def get_api_key() -> str:
+    return get_config()['api_key']
+
+
+def get_api_keys() -> List[str]:
+    """Every key in the config: 'api_keys' if there's a list of them,
+    otherwise just 'api_key'."""
+    cfg = get_config()
+    return cfg['api_keys'] if 'api_keys' in cfg else [cfg['api_key']]
+
+
+def get_seen() -> SeenIndex:
+    """Every gameid already in data.csv. Opened (and topped up with
+    whatever is in data.csv) the first time it's needed."""
+    global seen_games
+    if seen_games is None:
+        seen_games = SeenIndex(SEEN_FILE, SEEN_TABLE)
+        seen_games.seed_from_csv(DATA_CSV)
+    return seen_games
+
+
+def get_data_sink() -> RowSink:
+    """Where rows go, opened the first time we write to it. A game only
+    counts as seen once its row has actually been flushed to the file."""
+    global data_sink
+    if data_sink is None:
+        data_sink = make_data_sink(mark_seen)
+        atexit.register(data_sink.close)
+    return data_sink
+
+
+def make_data_sink(on_flush) -> RowSink:
+    """A new sink for OUTPUT_FORMAT."""
+    if OUTPUT_FORMAT == 'parquet':
+        from parquetsink import ParquetSink
+        return ParquetSink(DATA_PARQUET, VARIABLES, on_flush=on_flush)
+    return RowSink(DATA_CSV, VARIABLES, on_flush=on_flush)
+
+
+def mark_seen(rows: List[List]) -> None:
+    get_seen().add_many(row[0] for row in rows)
 
 
 def dict_to_list(dic):
@@ -29,15 +89,17 @@ def dict_to_list(dic):
 
 
 def write_to_csv(lst):
-    with open('data.csv', 'a', newline='') as file:
-        writist = csv.writer(file, lineterminator='\n')
-        writist.writerow(lst)
+    get_data_sink().write(lst)
 
 
 def run(game_list):
     """Runs the entire thing. gong is a list of (gameid, player) tuples"""
     print(f'about to check {len(game_list)} games')
-    seen_lst = []
+    SEEN = get_seen()
+    # every key, the client spreads the requests over them
+    API_KEY = get_api_keys()
+    # games tried this run, even the ones that failed
+    seen_lst = set()
     counter = 0
     seen = 0
     error_1 = 0
@@ -48,7 +110,7 @@ def run(game_list):
             print('already seen', game[0])
             seen += 1
             continue
-        seen_lst.append(game[0])
+        seen_lst.add(game[0])
         # game is a tuple
         try:
             analysis = main.GameAnalysis(API_KEY)
@@ -72,23 +134,34 @@ def run(game_list):
         except:
             error_1 += 1
             print('Something went wrong.\n\n\n')
+    if data_sink is not None:
+        data_sink.checkpoint()
     print(f'Entered {len(game_list)} games, already saw {seen}, recorded {counter}.')
     print(f'Random errors: {error_1}')
     print(f'Loading YouAreDumbOrSomethingError: {error_2}')
+    print('Requests saved by caching:')
+    for endpoint, stats in main.get_client(API_KEY).cache_stats().items():
+        print(f'    {endpoint}: {stats}')
+    report_metrics(recorded=counter, seen=seen, errors=error_1 + error_2 +
+                   error_3)
+
+
+def report_metrics(**extra) -> None:
+    """Prints what the requests so far cost, per endpoint, and adds it
+    (and extra) to main.METRICS_FILE."""
+    metrics = main.get_metrics()
+    print('Requests:')
+    for line in metrics.summary():
+        print('    ' + line)
+    metrics.write(main.METRICS_FILE, **extra)
 
 
 backup = [('NA1_3938838278', 'Blackbeard178'), ('NA1_3938822863', 'Blackbeard178'),
           ('NA1_3938717861', 'Blackbeard178'), ('NA1_3934823346', 'Blackbeard178'), ('NA1_3934677077', 'Blackbeard178')]
 
 
-# Script to get games. We will load only the first 1000 games of the csv, and manually restart the process.
-
-# TODO use games[], clear games[], change randomclasses[], get new api key[]j, start getting data again
-csv_to_write_to = 'games2.csv'
-to_run = []
-a = pd.read_csv(csv_to_write_to)
-a = a.loc[:1000, :]
-for index, row in a.iterrows():
-    to_run.append((str(row['gameid']), str(row['player'])))
-print(f'Loaded {len(to_run)} games')
-run(to_run)
+# Script to get games. Everything in the csv goes into the job manifest
+# (see jobs.py), so stopping it and starting it again picks up where it was.
+if __name__ == '__main__':
+    import jobs
+    jobs.run_csv('games2.csv')
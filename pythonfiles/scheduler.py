@@ -0,0 +1,168 @@
+"""Puts games in an order that gets more out of the caches.
+
+The games csvs are in the order we found the games, so two lobbies with the
+same people in them can be thousands of rows apart. By the time the second
+one comes up, those players are long gone from main.player_objects and
+their ranked info has gone stale, and we load them all over again.
+
+schedule() orders the games so the next one is always the one with the
+most players we loaded recently, falling back to file order when nothing
+overlaps. It can only go on the lobbies it knows: games whose match JSON
+is already in the match cache, and for the rest just the player we got
+the game from.
+
+projected_requests() plays an order through a rough model of our caches
+(see Estimate), so we can see what the new order saves before running it.
+"""
+import heapq
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, \
+    Tuple
+
+import main
+
+# (gameid, player)
+Job = Tuple[str, str]
+
+
+class Estimate(NamedTuple):
+    """How we think a run goes. Every time a player comes up they cost
+    nothing if they're still in main.player_objects, otherwise one request
+    for their match ids plus whatever LOOKUP_TTLS says has gone stale.
+    Match JSONs stay in the match cache for good, so they don't count.
+
+    ===== Public Attributes =====
+    window: players kept in memory (main.player_objects)
+    game_secs: how long a game takes to load, to tell when things go stale
+    ttls: seconds each lookup stays fresh, None for never
+    """
+    window: int = main.PLAYER_OBJECTS_MAX
+    game_secs: float = 5 * 60
+    ttls: Dict[str, Optional[float]] = main.LOOKUP_TTLS
+
+
+def rosters(games: Iterable[Job],
+            get_match: Optional[Callable[[str], Optional[Dict]]] = None) \
+        -> Dict[str, List[str]]:
+    """gameid: the names of everyone we know played in it. That's all ten
+    for games get_match (the match cache by default) has, otherwise just
+    the player we got it from. Names have no spaces, like player_objects.
+    """
+    get_match = get_match if get_match is not None else \
+        main.get_match_cache().get
+    ret_dict = {}
+    for gameid, player in games:
+        if gameid in ret_dict:
+            continue
+        game = get_match(gameid)
+        if game is None:
+            ret_dict[gameid] = [player.replace(' ', '')]
+        else:
+            ret_dict[gameid] = [man['summonerName'].replace(' ', '')
+                                for man in game['info']['participants']]
+    return ret_dict
+
+
+def schedule(games: List[Job], lobbies: Dict[str, List[str]],
+             window: int = main.PLAYER_OBJECTS_MAX) -> List[Job]:
+    """games reordered so each one shares as many players as possible with
+    the last window players loaded. Ties (and games that share nobody) keep
+    their file order. Duplicate gameids are kept, right after the first.
+    """
+    by_game = OrderedDict()
+    for job in games:
+        by_game.setdefault(job[0], []).append(job)
+    order = list(by_game)
+    # player: indexes into order of every game they're in
+    games_of = {}
+    for i, gameid in enumerate(order):
+        for name in set(lobbies.get(gameid, ())):
+            games_of.setdefault(name, []).append(i)
+    score = [0] * len(order)
+    done = [False] * len(order)
+    # (-score, index), the ones whose score has changed since are skipped
+    heap = []
+    warm = OrderedDict()
+
+    def change(name: str, by: int) -> None:
+        for i in games_of.get(name, ()):
+            if not done[i]:
+                score[i] += by
+                if score[i] > 0:
+                    heapq.heappush(heap, (-score[i], i))
+
+    ret_lst = []
+    next_in_file = 0
+    for _ in range(len(order)):
+        i = None
+        while heap:
+            neg, j = heapq.heappop(heap)
+            if not done[j] and -neg == score[j]:
+                i = j
+                break
+        if i is None:
+            while done[next_in_file]:
+                next_in_file += 1
+            i = next_in_file
+        done[i] = True
+        ret_lst.extend(by_game[order[i]])
+        for name in lobbies.get(order[i], ()):
+            if name in warm:
+                warm.move_to_end(name)
+                continue
+            warm[name] = None
+            change(name, 1)
+            if len(warm) > window:
+                change(warm.popitem(last=False)[0], -1)
+    return ret_lst
+
+
+def projected_requests(games: List[Job], lobbies: Dict[str, List[str]],
+                       estimate: Estimate = Estimate()) -> int:
+    """Roughly how many summoner/league/mastery/match id requests running
+    games in this order takes (see Estimate)."""
+    memory = OrderedDict()
+    # name: {endpoint: when it was last fetched}
+    fetched = {}
+    total = 0
+    seen_games = set()
+    for i, (gameid, player) in enumerate(games):
+        if gameid in seen_games:
+            continue
+        seen_games.add(gameid)
+        now = i * estimate.game_secs
+        for name in lobbies.get(gameid, [player.replace(' ', '')]):
+            if name in memory and now - memory[name] < \
+                    (estimate.ttls['league'] or float('inf')):
+                memory.move_to_end(name)
+                continue
+            times = fetched.setdefault(name, {})
+            # match ids
+            total += 1
+            for endpoint, ttl in estimate.ttls.items():
+                if endpoint not in times or \
+                        (ttl is not None and now - times[endpoint] >= ttl):
+                    times[endpoint] = now
+                    total += 1
+            memory[name] = now
+            memory.move_to_end(name)
+            if len(memory) > estimate.window:
+                memory.popitem(last=False)
+    return total
+
+
+def plan(games: List[Job],
+         get_match: Optional[Callable[[str], Optional[Dict]]] = None,
+         estimate: Estimate = Estimate()) -> List[Job]:
+    """schedule()s games and prints what it should save. Returns the new
+    order."""
+    lobbies = rosters(games, get_match)
+    known = sum(len(names) > 1 for names in lobbies.values())
+    ordered = schedule(games, lobbies, estimate.window)
+    before = projected_requests(games, lobbies, estimate)
+    after = projected_requests(ordered, lobbies, estimate)
+    print(f'[scheduler] {len(lobbies)} games, {known} with a known lobby')
+    print(f'[scheduler] projected player requests: {before} in file order, '
+          f'{after} scheduled ({before - after} saved, '
+          f'{(before - after) / max(before, 1):.0%})')
+    return ordered
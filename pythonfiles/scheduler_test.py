@@ -0,0 +1,35 @@
+from scheduler import Estimate, projected_requests, rosters, schedule
+
+
+def test_rosters_fall_back_to_the_player():
+    matches = {'NA1_1': {'info': {'participants': [
+        {'summonerName': 'a b'}, {'summonerName': 'c'}]}}}
+    assert rosters([('NA1_1', 'c'), ('NA1_2', 'some one')], matches.get) == \
+        {'NA1_1': ['ab', 'c'], 'NA1_2': ['someone']}
+
+
+def test_overlapping_lobbies_run_together():
+    games = [('1', 'a'), ('2', 'x'), ('3', 'a'), ('4', 'y'), ('5', 'x')]
+    lobbies = {'1': ['a', 'b'], '2': ['x'], '3': ['a', 'b', 'c'],
+               '4': ['y'], '5': ['x', 'c']}
+    order = schedule(games, lobbies, window=10)
+    assert [g[0] for g in order] == ['1', '3', '5', '2', '4']
+
+
+def test_nothing_in_common_keeps_file_order():
+    games = [(str(i), str(i)) for i in range(5)] + [('0', 'again')]
+    lobbies = {str(i): [str(i)] for i in range(5)}
+    assert schedule(games, lobbies) == \
+        [('0', '0'), ('0', 'again')] + games[1:5]
+
+
+def test_projected_requests_counts_reloads():
+    lobbies = {'1': ['a'], '2': ['b'], '3': ['a']}
+    games = [('1', 'a'), ('2', 'b'), ('3', 'a')]
+    ttls = {'summoner': None, 'league': 100}
+    # a is still in memory the second time
+    assert projected_requests(games, lobbies, Estimate(2, 1, ttls)) == 6
+    # a fell out, match ids again, league is still fresh
+    assert projected_requests(games, lobbies, Estimate(1, 1, ttls)) == 7
+    # and now league is stale too
+    assert projected_requests(games, lobbies, Estimate(1, 60, ttls)) == 8
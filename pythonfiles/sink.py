@@ -0,0 +1,128 @@
+"""A csv file we keep open and append rows to in batches, instead of
+opening, writing one row and closing it every time.
+"""
+import csv
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class RowSink:
+    """Buffers rows and appends them to path once there are flush_rows of
+    them or the oldest has waited flush_secs, whichever comes first.
+    Safe to share between threads. Between processes, have one process own
+    the sink and send it rows (like parallel.writer does).
+
+    ===== Public Attributes =====
+    path: the csv
+    columns: the header. write_dict puts values in this order, and it's
+        written as the first line if the file is new.
+    flush_rows: buffer size that triggers a flush
+    flush_secs: how long a row can sit in the buffer, None for forever
+    on_flush: called with the rows every time some reach the file, e.g. to
+        only mark a game as done once its row is really written
+    """
+
+    def __init__(self, path: str, columns: Optional[List[str]] = None,
+                 flush_rows: int = 50, flush_secs: Optional[float] = 5.0,
+                 on_flush: Optional[Callable[[List[List]], None]] = None,
+                 encoding: Optional[str] = None) -> None:
+        self.path = path
+        self.columns = columns
+        self.flush_rows = flush_rows
+        self.flush_secs = flush_secs
+        self.on_flush = on_flush
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._oldest = None
+        self._open()
+        self._closed = threading.Event()
+        if flush_secs is not None:
+            # flushes rows that would otherwise sit there while we wait on
+            # the rate limiter
+            threading.Thread(target=self._flush_loop, daemon=True).start()
+
+    def write(self, row: List) -> None:
+        self.write_many([row])
+
+    def write_many(self, rows: List[List]) -> None:
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.extend(list(row) for row in rows)
+            if len(self._buffer) >= self.flush_rows or self._too_old():
+                self._flush()
+
+    def write_dict(self, dic: Dict) -> None:
+        """Writes dic as a row, each value under its column. Missing ones
+        are left empty."""
+        self.write([dic.get(column) for column in self.columns])
+
+    def flush(self) -> None:
+        """Writes out whatever is buffered."""
+        with self._lock:
+            self._flush()
+
+    def checkpoint(self) -> None:
+        """Flushes and makes sure the OS actually put it on disk."""
+        with self._lock:
+            self._flush()
+            self._sync()
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self.checkpoint()
+        self._closed.set()
+        with self._lock:
+            self._close_file()
+
+    def __enter__(self) -> 'RowSink':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    # THE FILE ITSELF, what a sink for another format overrides
+    def _open(self) -> None:
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        # raises PermissionError right away if excel has the file open
+        self._file = open(self.path, 'a', newline='', encoding=self.encoding)
+        self._writer = csv.writer(self._file, lineterminator='\n')
+        if new and self.columns is not None:
+            self._writer.writerow(self.columns)
+            self._file.flush()
+
+    def _write_rows(self, rows: List[List]) -> None:
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+
+    def _close_file(self) -> None:
+        self._file.close()
+
+    # HELPERS
+    def _too_old(self) -> bool:
+        return self.flush_secs is not None and self._oldest is not None \
+            and time.monotonic() - self._oldest >= self.flush_secs
+
+    def _flush(self) -> None:
+        """Precondition: self._lock is held."""
+        if not self._buffer:
+            return
+        rows, self._buffer, self._oldest = self._buffer, [], None
+        self._write_rows(rows)
+        if self.on_flush is not None:
+            self.on_flush(rows)
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_secs / 2):
+            with self._lock:
+                if self._closed.is_set():
+                    return
+                if self._too_old():
+                    self._flush()
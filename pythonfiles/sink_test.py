@@ -0,0 +1,22 @@
+from sink import RowSink
+
+
+def test_buffers_until_flush_rows(tmp_path):
+    path = tmp_path / 'data.csv'
+    flushed = []
+    sink = RowSink(str(path), ['gameid', 'player'], flush_rows=2,
+                   flush_secs=None, on_flush=flushed.extend)
+    sink.write(['NA1_1', 'a'])
+    assert path.read_text() == 'gameid,player\n'
+    sink.write(['NA1_2', 'b'])
+    assert path.read_text() == 'gameid,player\nNA1_1,a\nNA1_2,b\n'
+    assert flushed == [['NA1_1', 'a'], ['NA1_2', 'b']]
+    sink.close()
+
+
+def test_write_dict_keeps_column_order(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('gameid,player,champion\n')
+    with RowSink(str(path), ['gameid', 'player', 'champion']) as sink:
+        sink.write_dict({'champion': 'Bard', 'gameid': 'NA1_1'})
+    assert path.read_text() == 'gameid,player,champion\nNA1_1,,Bard\n'
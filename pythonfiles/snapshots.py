@@ -0,0 +1,141 @@
+"""What every analyzed game looked like when we analyzed it, so the
+features can be worked out again later without asking riot for anything.
+
+A snapshot is the game id, the main player, and for each of the ten
+players their summoner and league JSONs and which match ids were their
+recent SR / all games (plus the main player's mastery points). The match JSONs
+themselves aren't copied, they're already in the match cache.
+
+    {'gameid': ..., 'player': ..., 'n': 5, 'mastery': {championId: points},
+     'players': {name: {'sum_info': {...}, 'ranked_info': [...],
+                        'sr_ids': [...], 'all_ids': [...],
+                        'mastery_points': {...} or None,
+                        'platform': 'na1'}}}
+
+See refeaturize.py for what they're for.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+SNAPSHOT_FILE = 'res/snapshots.sqlite'
+
+
+def match_ids(stats: Optional[List]) -> Optional[List[str]]:
+    """The match ids of a Player's sr_stats / all_stats (so of
+    match_info / match_info_all, without loading them)."""
+    if stats is None:
+        return None
+    return [s.match_id for s in stats]
+
+
+def player_snapshot(x) -> Dict:
+    """What a main.Player's features are worked out from, see
+    main.Player.from_snapshot for getting it back."""
+    return {'sum_info': x.sum_info, 'ranked_info': x.ranked_info,
+            'sr_ids': match_ids(x.sr_stats),
+            'all_ids': match_ids(x.all_stats),
+            'mastery_points': x.mastery_points, 'platform': x.platform}
+
+
+def take_snapshot(a, game: Tuple[str, str]) -> Dict:
+    """The snapshot of a main.Game that's been analyzed. game is the
+    (gameid, summoner name) tuple it was analyzed for."""
+    players = {x.name: player_snapshot(x) for x in a.ally + a.enemy}
+    return {'gameid': game[0], 'player': game[1], 'n': a.man.n,
+            'mastery': a.man.mastery_points, 'players': players}
+
+
+class SnapshotStore:
+    """Snapshots in a SQLite file, zlib compressed JSON, one per gameid
+    (the newest one wins). Every put gets a bigger seq than anything
+    before it, so 'everything new since last time' is seq > what we got to.
+
+    ===== Public Attributes =====
+    path: the SQLite file
+    """
+
+    def __init__(self, path: str = SNAPSHOT_FILE) -> None:
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS snapshots ('
+                         'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+                         'gameid TEXT UNIQUE, player TEXT, stored REAL, '
+                         'data BLOB)')
+        # name of an output: the seq it's up to date with
+        self._db.execute('CREATE TABLE IF NOT EXISTS progress ('
+                         'output TEXT PRIMARY KEY, seq INTEGER)')
+        self._db.commit()
+
+    def put(self, snapshot: Dict) -> None:
+        data = zlib.compress(json.dumps(snapshot,
+                                        separators=(',', ':')).encode())
+        with self._lock:
+            # delete + insert instead of replace so it gets a new seq and
+            # shows up as new again
+            self._db.execute('DELETE FROM snapshots WHERE gameid = ?',
+                             (snapshot['gameid'],))
+            self._db.execute('INSERT INTO snapshots (gameid, player, stored, '
+                             'data) VALUES (?, ?, ?, ?)',
+                             (snapshot['gameid'], snapshot['player'],
+                              time.time(), data))
+            self._db.commit()
+
+    def get(self, gameid: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute('SELECT data FROM snapshots '
+                                   'WHERE gameid = ?', (gameid,)).fetchone()
+        return None if row is None else json.loads(zlib.decompress(row[0]))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM snapshots').fetchone()[0]
+
+    def batches(self, seq: int = 0,
+                batch: int = 500) -> List[Tuple[int, int]]:
+        """Splits every snapshot put after seq into (after, last) ranges of
+        up to batch snapshots each, oldest first. Only reads the seqs, so
+        it's cheap even for a huge store."""
+        with self._lock:
+            seqs = [row[0] for row in self._db.execute(
+                'SELECT seq FROM snapshots WHERE seq > ? ORDER BY seq',
+                (seq,))]
+        ret_lst = []
+        for i in range(0, len(seqs), batch):
+            ret_lst.append((seq, seqs[min(i + batch, len(seqs)) - 1]))
+            seq = ret_lst[-1][1]
+        return ret_lst
+
+    def between(self, after: int, last: int) -> List[Tuple[int, Dict]]:
+        """(seq, snapshot) for every snapshot with after < seq <= last,
+        oldest first."""
+        with self._lock:
+            rows = self._db.execute('SELECT seq, data FROM snapshots '
+                                    'WHERE seq > ? AND seq <= ? ORDER BY seq',
+                                    (after, last)).fetchall()
+        return [(row[0], json.loads(zlib.decompress(row[1]))) for row in rows]
+
+    def progress(self, output: str) -> int:
+        """The seq output has every snapshot up to, 0 for nothing yet."""
+        with self._lock:
+            row = self._db.execute('SELECT seq FROM progress WHERE output = ?',
+                                   (output,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def set_progress(self, output: str, seq: int) -> None:
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO progress VALUES (?, ?)',
+                             (output, seq))
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,45 @@
+from snapshots import SnapshotStore
+
+
+def snap(gameid, player='me'):
+    return {'gameid': gameid, 'player': player, 'n': 5, 'mastery': [],
+            'players': {}}
+
+
+def test_put_get(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snap.sqlite'))
+    store.put(snap('NA1_1'))
+    assert store.get('NA1_1') == snap('NA1_1')
+    assert store.get('NA1_2') is None
+    assert len(store) == 1
+
+
+def test_batches_cover_everything_once(tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snap.sqlite'))
+    for i in range(7):
+        store.put(snap(f'NA1_{i}'))
+    batches = store.batches(0, 3)
+    assert len(batches) == 3
+    got = [s['gameid'] for after, last in batches
+           for seq, s in store.between(after, last)]
+    assert got == [f'NA1_{i}' for i in range(7)]
+    assert store.batches(batches[-1][1]) == []
+
+
+def test_progress_and_updated_snapshots(tmp_path):
+    path = str(tmp_path / 'snap.sqlite')
+    store = SnapshotStore(path)
+    store.put(snap('NA1_1'))
+    store.put(snap('NA1_2'))
+    last = store.batches()[-1][1]
+    store.set_progress('out.csv', last)
+    store.close()
+    store = SnapshotStore(path)
+    assert store.progress('out.csv') == last
+    assert store.progress('other.csv') == 0
+    # analyzing a game again makes it new again
+    store.put(snap('NA1_1', 'someone else'))
+    new = [s for after, end in store.batches(last)
+           for seq, s in store.between(after, end)]
+    assert [s['player'] for s in new] == ['someone else']
+    assert len(store) == 2
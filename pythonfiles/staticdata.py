@@ -0,0 +1,89 @@
+"""Data Dragon files (champion.json and friends) for one patch.
+
+Each file is downloaded once per version, saved under cache_dir, and
+after that only ever read from disk or memory. The lookup tables the rest
+of the code wants are built once from it.
+"""
+import json
+import os
+from typing import Dict, Optional
+
+import requests
+
+DDRAGON = 'http://ddragon.leagueoflegends.com/cdn/{version}/data/en_US/{name}'
+
+
+class StaticData:
+    """The Data Dragon files for version.
+
+    ===== Public Attributes =====
+    version: the patch, like '11.11.1'
+    cache_dir: files go in cache_dir/version/. None to never save them.
+    url: where to download from, with {version} and {name} in it
+
+    === Useful Methods ===
+    get_file: the json of a ddragon file
+    name_to_id: championName: champion id
+    name_to_info: championName: {'attack', 'defense', 'magic', 'difficulty'}
+    """
+
+    def __init__(self, version: str, cache_dir: Optional[str] = 'res/ddragon',
+                 url: str = DDRAGON) -> None:
+        self.version = version
+        self.cache_dir = cache_dir
+        self.url = url
+        # name: json
+        self._files = {}
+        self._name_to_id = None
+        self._name_to_info = None
+
+    @classmethod
+    def from_file(cls, version: str, path: str,
+                  name: str = 'champion.json') -> 'StaticData':
+        """StaticData that reads name from path instead of going anywhere
+        near the internet."""
+        data = cls(version, None)
+        with open(path, 'r', encoding='UTF-8') as file:
+            data._files[name] = json.load(file)
+        return data
+
+    def get_file(self, name: str = 'champion.json') -> Dict:
+        """Memory, then disk, then ddragon (saving it to disk)."""
+        if name in self._files:
+            return self._files[name]
+        path = None
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, self.version, name)
+        if path is not None and os.path.exists(path):
+            with open(path, 'r', encoding='UTF-8') as file:
+                self._files[name] = json.load(file)
+            return self._files[name]
+        response = requests.get(self.url.format(version=self.version,
+                                                name=name))
+        response.raise_for_status()
+        self._files[name] = response.json()
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write then rename so a crash can't leave half a file behind
+            with open(path + '.tmp', 'w', encoding='UTF-8') as file:
+                json.dump(self._files[name], file)
+            os.replace(path + '.tmp', path)
+        return self._files[name]
+
+    @property
+    def name_to_id(self) -> Dict[str, int]:
+        """Returns a dictionary of championName: ChampionID pairs"""
+        if self._name_to_id is None:
+            champ_data = self.get_file('champion.json')['data']
+            self._name_to_id = {champ['id']: int(champ['key'])
+                                for champ in champ_data.values()}
+        return self._name_to_id
+
+    @property
+    def name_to_info(self) -> Dict[str, Dict]:
+        """championName: the champion's attack/defense/magic/difficulty"""
+        if self._name_to_info is None:
+            champ_data = self.get_file('champion.json')['data']
+            self._name_to_info = {name: champ['info']
+                                  for name, champ in champ_data.items()}
+        return self._name_to_info
@@ -0,0 +1,24 @@
+import json
+
+from staticdata import StaticData
+
+CHAMPIONS = {'data': {'MonkeyKing': {'id': 'MonkeyKing', 'key': '62',
+                                     'info': {'attack': 8, 'defense': 5,
+                                              'magic': 2, 'difficulty': 3}}}}
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / 'champion.json'
+    path.write_text(json.dumps(CHAMPIONS))
+    data = StaticData.from_file('11.11.1', str(path))
+    assert data.name_to_id == {'MonkeyKing': 62}
+    assert data.name_to_info['MonkeyKing']['attack'] == 8
+
+
+def test_reads_saved_version(tmp_path):
+    saved = tmp_path / '11.11.1' / 'champion.json'
+    saved.parent.mkdir()
+    saved.write_text(json.dumps(CHAMPIONS))
+    # a url that can't work, so this only passes if nothing is downloaded
+    data = StaticData('11.11.1', str(tmp_path), url='http://localhost:0/{name}')
+    assert data.get_file() == CHAMPIONS
@@ -0,0 +1,128 @@
+"""A least-recently-used cache where entries also go stale after a while.
+
+Used for the summoner/league/mastery lookups (see RiotClient) and for
+main.player_objects. Can keep a copy of everything in a SQLite file so the
+next run starts warm; anything kept on disk has to be JSON.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """At most maxsize entries in memory, each good for ttl seconds.
+
+    ===== Public Attributes =====
+    maxsize: entries kept in memory before the least recently used goes
+    ttl: seconds an entry is good for, None if it never goes stale
+    path: SQLite file every entry is also written to, or None
+    table: table in path to use, so a few caches can share one file
+    hits: gets that found a fresh entry (in memory or on disk)
+    misses: gets that didn't, including ones that found a stale entry
+    expired: entries thrown out for being stale
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = None,
+                 path: Optional[str] = None, table: str = 'cache') -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        # key: (time stored, value), oldest use first
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=30,
+                                       check_same_thread=False)
+            self._db.execute(f'CREATE TABLE IF NOT EXISTS {table} ('
+                             f'key TEXT PRIMARY KEY, value TEXT, stored REAL)')
+            if ttl is not None:
+                self._db.execute(f'DELETE FROM {table} WHERE stored < ?',
+                                 (time.time() - ttl,))
+            self._db.commit()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """The value for key if it's there and fresh, otherwise default."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None and self._db is not None:
+                entry = self._load(key)
+            if entry is not None and self._is_stale(entry[0]):
+                self._drop(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._remember(key, entry)
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            entry = (time.time(), value)
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(f'INSERT OR REPLACE INTO {self.table} '
+                                 f'VALUES (?, ?, ?)',
+                                 (str(key), json.dumps(value), entry[0]))
+                self._db.commit()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._is_stale(entry[0])
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._is_stale(entry[0]):
+                raise KeyError(key)
+            return entry[1]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.put(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        """Empties memory. Whatever is on disk stays."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses,
+                'expired': self.expired, 'size': len(self._data)}
+
+    # HELPERS, all of these expect self._lock to be held
+    def _is_stale(self, stored: float) -> bool:
+        return self.ttl is not None and time.time() - stored > self.ttl
+
+    def _remember(self, key: Hashable, entry: tuple) -> None:
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _load(self, key: Hashable) -> Optional[tuple]:
+        row = self._db.execute(f'SELECT stored, value FROM {self.table} '
+                               f'WHERE key = ?', (str(key),)).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def _drop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+        if self._db is not None:
+            self._db.execute(f'DELETE FROM {self.table} WHERE key = ?',
+                             (str(key),))
+            self._db.commit()
@@ -0,0 +1,31 @@
+import time
+
+from ttlcache import TTLCache
+
+
+def test_lru_bound():
+    cache = TTLCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_goes_stale():
+    cache = TTLCache(ttl=60)
+    cache.put('a', [1])
+    assert cache.get('a') == [1]
+    cache._data['a'] = (time.time() - 61, [1])
+    assert cache.get('a') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'expired': 1, 'size': 0}
+
+
+def test_disk(tmp_path):
+    path = str(tmp_path / 'lookups.sqlite')
+    TTLCache(path=path, table='league').put('sid', [{'wins': 4}])
+    cache = TTLCache(path=path, table='league')
+    assert len(cache) == 0
+    assert cache.get('sid') == [{'wins': 4}]
+    assert 'sid' in cache